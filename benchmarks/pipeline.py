@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-stage timing of the synthesis pipeline on a tiny CSM (CPU)
+
+Runs the stages a /clone-voice request goes through, each timed on its
+own: text chunking, reference preprocessing, chat template, generate,
+codec decode, post-processing (silence compaction and normalization) and
+WAV encoding. A second, streamed pass measures time to first audio the way
+/clone-voice-stream produces it. The model is a tiny random CSM (see
+benchmarks/tiny_csm.py), so absolute numbers are only comparable between
+runs of this benchmark, not with CSM-1B.
+
+Usage:
+    python -m benchmarks.pipeline --cases 5 --repeats 3 --output results.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+import soundfile as sf
+
+from benchmarks.quantization import load_test_texts
+from benchmarks.silence_compaction import synthetic_speech
+
+SAMPLE_RATE = 24000
+STAGES = ("chunk_text", "reference_preprocessing", "chat_template", "generate",
+          "codec_decode", "postprocess", "encode")
+REFERENCE_TRANSCRIPT = "Hola, esta es la voz de referencia que se usa para clonar."
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Count, mean and tail percentiles of timings in milliseconds"""
+    if not samples:
+        return {"count": 0}
+    ms = np.asarray(samples) * 1000
+    return {
+        "count": len(samples),
+        "mean_ms": float(np.mean(ms)),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(np.max(ms)),
+    }
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def planned_frames(text: str) -> int:
+    """Frames generated for a text, from the speaking-rate estimate"""
+    from voice_cloning.voice_clone import CHARS_PER_SECOND, CODEC_FRAME_RATE
+
+    return int(len(text) / CHARS_PER_SECOND * CODEC_FRAME_RATE) + 1
+
+
+def decode_codes(model, codes):
+    """Decode one row of generate(output_audio=False) codes like generate(output_audio=True)"""
+    import torch
+
+    eos = (codes == model.config.codebook_eos_token_id).all(dim=-1).nonzero()
+    if eos.numel():
+        codes = codes[:eos.min()]
+    with torch.no_grad():
+        decoded = model.codec_model.decode(codes.transpose(0, 1).unsqueeze(0))
+    return decoded.audio_values[0, 0].float().numpy()
+
+
+class PipelineBenchmark:
+    """Times every synthesis stage on a tiny CSM"""
+
+    def __init__(self, model, processor, reference_path: str, chunk_size: int = 100,
+                 temperature: float = 0.7, frames_per_chunk: int = 2):
+        from voice_cloning_api import AudioProcessor, TextChunker
+
+        self.model = model
+        self.processor = processor
+        self.reference_path = reference_path
+        self.chunk_size = chunk_size
+        self.temperature = temperature
+        self.frames_per_chunk = frames_per_chunk
+        self.chunker = TextChunker()
+        self.audio_processor = AudioProcessor()
+        self.stage_times: Dict[str, List[float]] = defaultdict(list)
+        self.rtf: List[float] = []
+        self.ttfb: List[float] = []
+
+    def _timed(self, stage: str, fn, *args, **kwargs):
+        started = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.stage_times[stage].append(time.perf_counter() - started)
+        return result
+
+    def _reference(self) -> np.ndarray:
+        from voice_cloning.codec_cache import normalize_reference_pcm
+
+        audio, sr = sf.read(self.reference_path, dtype="float32")
+        return normalize_reference_pcm(audio, sr, SAMPLE_RATE)
+
+    def _inputs(self, text: str, reference: np.ndarray):
+        conversation = [
+            {"role": "0", "content": [{"type": "text", "text": REFERENCE_TRANSCRIPT},
+                                      {"type": "audio", "path": reference}]},
+            {"role": "0", "content": [{"type": "text", "text": text}]},
+        ]
+        return self.processor.apply_chat_template(conversation, tokenize=True, return_dict=True)
+
+    def _generate(self, inputs, frames: int, **kwargs):
+        import torch
+
+        with torch.no_grad():
+            return self.model.generate(
+                **inputs, output_audio=False, max_new_tokens=frames,
+                temperature=self.temperature, do_sample=self.temperature > 0, **kwargs
+            )
+
+    def _encode(self, audio: np.ndarray) -> bytes:
+        buffer = io.BytesIO()
+        sf.write(buffer, audio, SAMPLE_RATE, format="WAV")
+        return buffer.getvalue()
+
+    def run_case(self, text: str):
+        """One non-streamed synthesis, stage by stage"""
+        started = time.perf_counter()
+        chunks = self._timed("chunk_text", self.chunker.chunk_text, text, self.chunk_size)
+        reference = self._timed("reference_preprocessing", self._reference)
+
+        pieces = []
+        for chunk in chunks:
+            inputs = self._timed("chat_template", self._inputs, chunk, reference)
+            codes = self._timed("generate", self._generate, inputs, planned_frames(chunk))
+            pieces.append(self._timed("codec_decode", decode_codes, self.model, codes[0]))
+
+        def postprocess(audio):
+            audio = self.audio_processor.remove_silence(audio, SAMPLE_RATE)
+            return self.audio_processor.normalize_audio(audio)
+
+        audio = self._timed("postprocess", postprocess, np.concatenate(pieces))
+        self._timed("encode", self._encode, audio)
+        elapsed = time.perf_counter() - started
+        self.rtf.append(elapsed / max(len(audio) / SAMPLE_RATE, 1e-6))
+
+    def run_stream_case(self, text: str):
+        """One streamed synthesis; records the time to the first audio chunk"""
+        from voice_cloning.streaming import CodecFrameStreamer
+
+        started = time.perf_counter()
+        first_audio: List[float] = []
+
+        def on_audio(audio: np.ndarray):
+            if not first_audio:
+                first_audio.append(time.perf_counter())
+
+        chunks = self.chunker.chunk_text(text, self.chunk_size)
+        inputs = self._inputs(chunks[0], self._reference())
+        streamer = CodecFrameStreamer(self.model, on_audio, self.frames_per_chunk)
+        self._generate(inputs, planned_frames(chunks[0]), streamer=streamer)
+        if first_audio:
+            self.ttfb.append(first_audio[0] - started)
+
+    def results(self) -> Dict[str, object]:
+        """Machine-readable summary of everything measured so far"""
+        rtf = np.asarray(self.rtf)
+        return {
+            "stages": {stage: summarize(self.stage_times[stage]) for stage in STAGES},
+            "rtf": {
+                "mean": float(rtf.mean()) if rtf.size else None,
+                "p50": float(np.percentile(rtf, 50)) if rtf.size else None,
+                "p95": float(np.percentile(rtf, 95)) if rtf.size else None,
+                "p99": float(np.percentile(rtf, 99)) if rtf.size else None,
+            },
+            "ttfb": summarize(self.ttfb),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+
+def environment() -> Dict[str, object]:
+    """Hardware and library versions the numbers were measured on"""
+    import torch
+    import transformers
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "torch": torch.__version__,
+        "transformers": transformers.__version__,
+        "torch_threads": torch.get_num_threads(),
+    }
+
+
+def run(cases: Optional[int] = 5, repeats: int = 3, threads: Optional[int] = None,
+        processor_path: Optional[str] = None, config_path: Optional[str] = None,
+        chunk_size: int = 100, reference_seconds: float = 5.0, stream: bool = True,
+        seed: int = 0) -> Dict[str, object]:
+    """
+    Benchmark the pipeline on the elise_analysis texts
+
+    Returns:
+        Environment, settings and per-stage / end-to-end statistics
+    """
+    import torch
+
+    from benchmarks.tiny_csm import build_tiny_csm
+
+    if threads:
+        torch.set_num_threads(threads)
+    load_started = time.perf_counter()
+    model, processor = build_tiny_csm(processor_path, config_path, seed)
+    load_seconds = time.perf_counter() - load_started
+
+    texts = load_test_texts(cases)
+    with tempfile.TemporaryDirectory() as tmp:
+        # 44.1kHz stereo, so preprocessing downmixes and resamples like real uploads
+        reference_path = os.path.join(tmp, "reference.wav")
+        reference = synthetic_speech(reference_seconds, 44100, seed)
+        sf.write(reference_path, np.stack([reference, reference], axis=1), 44100)
+
+        bench = PipelineBenchmark(model, processor, reference_path, chunk_size)
+        bench.run_case(texts[0])  # Warm up allocator and kernels
+        bench.stage_times.clear()
+        bench.rtf.clear()
+
+        for _ in range(repeats):
+            for text in texts:
+                bench.run_case(text)
+                if stream:
+                    bench.run_stream_case(text)
+
+    return {
+        "benchmark": "pipeline",
+        "environment": environment(),
+        "settings": {
+            "cases": len(texts), "repeats": repeats, "chunk_size": chunk_size,
+            "reference_seconds": reference_seconds, "seed": seed,
+            "model_config": str(config_path or "benchmarks/tiny_csm_config.json"),
+            "model_load_seconds": load_seconds,
+        },
+        **bench.results(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthesis pipeline benchmark on a tiny CSM (CPU)")
+    parser.add_argument("--cases", type=int, default=5, help="Number of elise_analysis test cases")
+    parser.add_argument("--repeats", type=int, default=3, help="Passes over the test cases")
+    parser.add_argument("--threads", type=int, default=None, help="torch threads")
+    parser.add_argument("--processor", default=None,
+                        help="CSM processor directory or Hub id (default: ./models/sesame-csm-1b, else sesame/csm-1b)")
+    parser.add_argument("--config", default=None, help="Reduced CSM config.json (default: benchmarks/tiny_csm_config.json)")
+    parser.add_argument("--chunk-size", type=int, default=100, help="TextChunker chunk size")
+    parser.add_argument("--no-stream", action="store_true", help="Skip the streamed time-to-first-audio pass")
+    parser.add_argument("--output", default=None, help="Write the JSON results to this file")
+    args = parser.parse_args()
+
+    results = run(args.cases, args.repeats, args.threads, args.processor, args.config,
+                  args.chunk_size, stream=not args.no_stream)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    print(f"{'stage':<24} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for stage, stats in results["stages"].items():
+        if stats["count"]:
+            print(f"{stage:<24} {stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} {stats['p99_ms']:9.2f}")
+    ttfb = results["ttfb"]
+    print(f"RTF p50 {results['rtf']['p50']:.3f}  "
+          f"TTFB p50 {ttfb.get('p50_ms', float('nan')):.1f} ms  "
+          f"peak RSS {results['peak_rss_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
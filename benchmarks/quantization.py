@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark: int8 / int4 quantized CSM against float32 on CPU
+
+Every mode is loaded in a fresh process so resident memory is measured
+per mode. Generation is greedy (temperature 0) so the quantized output
+can be compared with the float32 output for the same text.
+
+Usage:
+    python -m benchmarks.quantization --modes fp32 int8 --cases 3
+"""
+
+import argparse
+import json
+import multiprocessing
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+SAMPLE_RATE = 24000
+TEST_CASES = Path(__file__).resolve().parent.parent / "elise_analysis" / "elise_emotional_analysis.json"
+
+
+def load_test_texts(limit: Optional[int] = None) -> List[str]:
+    """Texts of the elise_analysis test cases"""
+    with open(TEST_CASES, encoding="utf-8") as f:
+        cases = json.load(f)["test_cases"]
+    return [case["text"] for case in cases[:limit]]
+
+
+def log_spectrum(audio: np.ndarray, n_fft: int = 1024) -> np.ndarray:
+    """Mean log-magnitude spectrum, a timing-insensitive timbre summary"""
+    hop = n_fft // 4
+    if len(audio) < n_fft:
+        audio = np.pad(audio, (0, n_fft - len(audio)))
+    frames = np.lib.stride_tricks.sliding_window_view(audio, n_fft)[::hop] * np.hanning(n_fft)
+    return np.log1p(np.abs(np.fft.rfft(frames, axis=1))).mean(axis=0)
+
+
+def similarity(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    """Spectral cosine similarity and duration ratio of two takes"""
+    a, b = log_spectrum(reference), log_spectrum(candidate)
+    return {
+        "spectral_cosine": float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-12)),
+        "duration_ratio": len(candidate) / max(len(reference), 1),
+    }
+
+
+def _run_mode(model_path: str, mode: str, texts: List[str], threads: int) -> Dict[str, object]:
+    """Load one mode and synthesize every text (runs in its own process)"""
+    import psutil
+    import torch
+
+    from voice_cloning.voice_clone import VoiceCloner
+
+    torch.set_num_threads(threads)
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+
+    started = time.perf_counter()
+    cloner = VoiceCloner(model_path=model_path, device="cpu",
+                         quantization=None if mode == "fp32" else mode)
+    load_seconds = time.perf_counter() - started
+    rss_loaded = process.memory_info().rss
+
+    outputs, generation_seconds, audio_seconds = [], 0.0, 0.0
+    peak_rss = rss_loaded
+    for text in texts:
+        started = time.perf_counter()
+        audio = cloner.synthesize(text, temperature=0.0).numpy()
+        generation_seconds += time.perf_counter() - started
+        audio_seconds += len(audio) / SAMPLE_RATE
+        peak_rss = max(peak_rss, process.memory_info().rss)
+        outputs.append(audio)
+
+    return {
+        "load_seconds": load_seconds,
+        "model_rss_mb": (rss_loaded - rss_before) / 1024**2,
+        "peak_rss_mb": peak_rss / 1024**2,
+        "realtime_factor": generation_seconds / audio_seconds if audio_seconds else float("inf"),
+        "outputs": outputs,
+    }
+
+
+def run(model_path: str = "./models/sesame-csm-1b", modes: List[str] = ("fp32", "int8"),
+        cases: Optional[int] = None, threads: int = 4) -> Dict[str, Dict[str, float]]:
+    """
+    Benchmark every mode on the elise_analysis texts
+
+    Returns:
+        Per mode: load time, resident memory, real-time factor and, for
+        quantized modes, mean similarity to the float32 takes
+    """
+    texts = load_test_texts(cases)
+    context = multiprocessing.get_context("spawn")
+    raw = {}
+    for mode in modes:
+        with context.Pool(1) as pool:
+            raw[mode] = pool.apply(_run_mode, (model_path, mode, texts, threads))
+
+    results = {}
+    reference = raw.get("fp32")
+    for mode, data in raw.items():
+        outputs = data.pop("outputs")
+        if reference is not None and mode != "fp32":
+            scores = [similarity(ref, out) for ref, out in zip(reference["outputs"], outputs)]
+            data["spectral_cosine"] = float(np.mean([s["spectral_cosine"] for s in scores]))
+            data["duration_ratio"] = float(np.mean([s["duration_ratio"] for s in scores]))
+        results[mode] = data
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSM quantization benchmark (CPU)")
+    parser.add_argument("--model-path", default="./models/sesame-csm-1b", help="CSM model directory")
+    parser.add_argument("--modes", nargs="+", default=["fp32", "int8"], choices=["fp32", "int8", "int4"],
+                        help="Modes to compare (fp32 is the similarity reference)")
+    parser.add_argument("--cases", type=int, default=None, help="Number of elise_analysis test cases")
+    parser.add_argument("--threads", type=int, default=4, help="torch threads")
+    args = parser.parse_args()
+
+    results = run(args.model_path, args.modes, args.cases, args.threads)
+    print(f"{'mode':<6} {'load s':>8} {'model MB':>10} {'peak MB':>10} {'RTF':>7} {'spec cos':>9} {'dur ratio':>10}")
+    for mode, data in results.items():
+        cosine = f"{data['spectral_cosine']:.4f}" if "spectral_cosine" in data else "-"
+        ratio = f"{data['duration_ratio']:.2f}" if "duration_ratio" in data else "-"
+        print(f"{mode:<6} {data['load_seconds']:8.1f} {data['model_rss_mb']:10.0f} {data['peak_rss_mb']:10.0f} "
+              f"{data['realtime_factor']:7.2f} {cosine:>9} {ratio:>10}")
+
+
+if __name__ == "__main__":
+    main()
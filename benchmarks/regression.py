@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Performance regression gate for the voice cloning service
+
+Replays a fixed corpus (the elise_analysis test cases plus the long-form
+samples in benchmarks/corpus) through VoiceCloneService, the layer the API
+endpoints call, and compares RTF, time to first audio, peak memory and
+throughput with a baseline stored for this machine. Baselines are keyed by
+a fingerprint of the hardware, the torch build and the model, so numbers
+from different machines are never compared.
+
+Usage:
+    python -m benchmarks.regression --update-baseline   # record a baseline
+    python -m benchmarks.regression                     # exit 1 on regression
+
+Exit codes: 0 within thresholds, 1 regression, 2 no comparable baseline.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmarks.pipeline import peak_rss_mb
+
+ROOT = Path(__file__).resolve().parent.parent
+ELISE_DIR = ROOT / "elise_analysis"
+CORPUS_DIR = Path(__file__).resolve().parent / "corpus"
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+# Metric -> (which direction is better, allowed relative change)
+METRICS: Dict[str, Tuple[str, float]] = {
+    "rtf_p50": ("lower", 0.10),
+    "rtf_p95": ("lower", 0.15),
+    "ttfb_p50_ms": ("lower", 0.10),
+    "ttfb_p95_ms": ("lower", 0.15),
+    "peak_rss_mb": ("lower", 0.05),
+    "peak_gpu_mb": ("lower", 0.05),
+    "throughput_audio_s_per_s": ("higher", 0.10),
+}
+
+
+def parse_test_case(path: Path) -> str:
+    """Text of an elise_analysis test_case_*.txt file (the block after 'Texto:')"""
+    content = path.read_text(encoding="utf-8")
+    match = re.search(r"^Texto:\s*\n(.+?)(?:\n\s*\n|\Z)", content, re.MULTILINE | re.DOTALL)
+    if not match:
+        raise ValueError(f"No 'Texto:' block in {path}")
+    return " ".join(match.group(1).split())
+
+
+def load_corpus() -> List[Dict[str, str]]:
+    """The fixed replay corpus: short test cases first, then long-form samples"""
+    corpus = [{"id": path.stem, "text": parse_test_case(path)}
+              for path in sorted(ELISE_DIR.glob("test_case_*.txt"))]
+    corpus += [{"id": path.stem, "text": " ".join(path.read_text(encoding="utf-8").split())}
+               for path in sorted(CORPUS_DIR.glob("*.txt"))]
+    return corpus
+
+
+def corpus_digest(corpus: List[Dict[str, str]]) -> str:
+    return hashlib.sha256(json.dumps(corpus, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def _cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def machine_fingerprint(model_kind: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Identify the machine and setup a baseline is valid for
+
+    Returns:
+        (short fingerprint id, the details it was computed from)
+    """
+    import psutil
+    import torch
+
+    details = {
+        "cpu": _cpu_model(),
+        "cpu_count": os.cpu_count(),
+        "ram_gb": round(psutil.virtual_memory().total / 1024**3),
+        "gpu": torch.cuda.get_device_name(0) if torch.cuda.is_available() else None,
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "python": platform.python_version(),
+        "model": model_kind,
+    }
+    digest = hashlib.sha256(json.dumps(details, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    return digest, details
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    return float(np.percentile(values, q)) if values else None
+
+
+def _remove_output(path: Optional[str]):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+async def start_service(model_kind: str, processor_path: Optional[str] = None):
+    """Initialize the API's service object with the real or the tiny model"""
+    from voice_cloning.voice_clone import VoiceCloner
+    from voice_cloning_api import voice_service
+
+    # Every replayed request has to synthesize
+    voice_service.result_cache.enabled = False
+    if model_kind == "tiny":
+        from benchmarks.tiny_csm import build_tiny_csm
+        model, processor = build_tiny_csm(processor_path)
+        voice_service.cloner = VoiceCloner.from_loaded(model, processor)
+
+    await voice_service.initialize()
+    await voice_service.scheduler.start()
+    await voice_service.warmup()
+    return voice_service
+
+
+async def stop_service(service):
+    await service.scheduler.stop()
+    service.worker.stop()
+    service.audio_pool.shutdown()
+
+
+async def replay(service, corpus: List[Dict[str, str]], voice: Optional[str],
+                 repeats: int, concurrency: int, temperature: float) -> Dict[str, Optional[float]]:
+    """
+    Replay the corpus and measure the gated metrics
+
+    Sequential passes give per-request RTF and streamed time to first
+    audio; a final concurrent pass gives throughput.
+    """
+    import torch
+
+    from voice_cloning_api import VoiceCloneRequest
+
+    def request(text: str, **kwargs) -> VoiceCloneRequest:
+        return VoiceCloneRequest(text=text, voice_name=voice, temperature=temperature, **kwargs)
+
+    rtf, ttfb = [], []
+    for _ in range(repeats):
+        for case in corpus:
+            result = await service.clone_voice(request(case["text"]))
+            if not result.success:
+                raise RuntimeError(f"{case['id']} failed: {result.error}")
+            rtf.append(result.performance_metrics["realtime_factor"])
+            _remove_output(result.audio_url)
+
+            # pcm streams have no header, so the first bytes are audio
+            started = time.perf_counter()
+            first_audio = None
+            async for data in service.stream_voice_clone(request(case["text"], streaming=True, stream_format="pcm")):
+                if first_audio is None and data:
+                    first_audio = time.perf_counter() - started
+            if first_audio is not None:
+                ttfb.append(first_audio * 1000)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(case: Dict[str, str]) -> float:
+        async with semaphore:
+            result = await service.clone_voice(request(case["text"]))
+            if not result.success:
+                raise RuntimeError(f"{case['id']} failed: {result.error}")
+            _remove_output(result.audio_url)
+            return result.processing_info["total_audio_duration"]
+
+    started = time.perf_counter()
+    audio_seconds = sum(await asyncio.gather(*(timed(case) for case in corpus)))
+    wall = time.perf_counter() - started
+
+    return {
+        "rtf_p50": _percentile(rtf, 50),
+        "rtf_p95": _percentile(rtf, 95),
+        "ttfb_p50_ms": _percentile(ttfb, 50),
+        "ttfb_p95_ms": _percentile(ttfb, 95),
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_gpu_mb": torch.cuda.max_memory_allocated() / 1024**2 if torch.cuda.is_available() else None,
+        "throughput_audio_s_per_s": audio_seconds / wall if wall > 0 else None,
+    }
+
+
+def compare(baseline: Dict[str, Optional[float]], current: Dict[str, Optional[float]],
+            threshold: Optional[float] = None) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Compare current metrics with a baseline
+
+    Args:
+        baseline: Baseline metrics
+        current: Metrics of this run
+        threshold: Allowed relative change for every metric (defaults per metric)
+
+    Returns:
+        (one row per metric, whether any metric regressed)
+    """
+    rows, regressed = [], False
+    for metric, (better, default_threshold) in METRICS.items():
+        old, new = baseline.get(metric), current.get(metric)
+        allowed = default_threshold if threshold is None else threshold
+        row = {"metric": metric, "baseline": old, "current": new, "change": None,
+               "allowed": allowed, "status": "n/a"}
+        if old is not None and new is not None and old > 0:
+            change = (new - old) / old
+            worse = change if better == "lower" else -change
+            row["change"] = change
+            if worse > allowed:
+                row["status"] = "REGRESSED"
+                regressed = True
+            elif worse < -allowed:
+                row["status"] = "improved"
+            else:
+                row["status"] = "ok"
+        rows.append(row)
+    return rows, regressed
+
+
+def format_diff(rows: List[Dict[str, Any]]) -> str:
+    """Human-readable comparison table"""
+    def number(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:.3f}" if abs(value) < 10 else f"{value:.1f}"
+
+    lines = [f"{'metric':<26} {'baseline':>10} {'current':>10} {'change':>9} {'allowed':>8}  status"]
+    for row in rows:
+        change = "-" if row["change"] is None else f"{row['change'] * 100:+.1f}%"
+        lines.append(f"{row['metric']:<26} {number(row['baseline']):>10} {number(row['current']):>10} "
+                     f"{change:>9} {row['allowed'] * 100:>7.0f}%  {row['status']}")
+    return "\n".join(lines)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> int:
+    corpus = load_corpus()
+    fingerprint, machine = machine_fingerprint(args.model)
+    settings = {
+        "model": args.model, "voice": args.voice, "repeats": args.repeats,
+        "concurrency": args.concurrency, "temperature": args.temperature,
+        "corpus": corpus_digest(corpus), "corpus_cases": len(corpus),
+    }
+    baseline_path = Path(args.baseline_dir) / f"{fingerprint}.json"
+
+    if not args.update_baseline and not baseline_path.exists():
+        print(f"No baseline for machine {fingerprint} ({machine['cpu']}, {machine['model']} model); "
+              f"record one with --update-baseline")
+        return 2
+
+    service = await start_service(args.model, args.processor)
+    try:
+        metrics = await replay(service, corpus, args.voice, args.repeats, args.concurrency, args.temperature)
+    finally:
+        await stop_service(service)
+
+    report = {
+        "fingerprint": fingerprint,
+        "machine": machine,
+        "settings": settings,
+        "git_commit": _git_commit(),
+        "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "metrics": metrics,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline for machine {fingerprint} written to {baseline_path}")
+        print(format_diff(compare(metrics, metrics)[0]))
+        return 0
+
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline["settings"] != settings:
+        print(f"Baseline {baseline_path} was recorded with different settings:\n"
+              f"  baseline: {baseline['settings']}\n  current:  {settings}\n"
+              f"Re-record it with --update-baseline")
+        return 2
+
+    rows, regressed = compare(baseline["metrics"], metrics, args.threshold)
+    print(f"Machine {fingerprint}, baseline from commit {baseline.get('git_commit')} "
+          f"({baseline.get('recorded_at')}), current commit {report['git_commit']}")
+    print(format_diff(rows))
+    if regressed:
+        print("\nPerformance regression: see the REGRESSED rows above")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Performance regression gate for the voice cloning service")
+    parser.add_argument("--model", choices=["tiny", "full"], default="tiny",
+                        help="tiny: random CPU model (benchmarks/tiny_csm.py); full: ./models/sesame-csm-1b")
+    parser.add_argument("--processor", default=None, help="CSM processor for the tiny model")
+    parser.add_argument("--voice", default=None, help="Voice profile to clone (default: no reference)")
+    parser.add_argument("--repeats", type=int, default=2, help="Sequential passes over the corpus")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent requests in the throughput pass")
+    parser.add_argument("--temperature", type=float, default=0.7, help="Generation temperature")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help="Allowed relative change for every metric (default: per metric, 5-15%%)")
+    parser.add_argument("--baseline-dir", default=str(BASELINE_DIR), help="Directory of per-machine baselines")
+    parser.add_argument("--update-baseline", action="store_true", help="Record this run as the baseline")
+    parser.add_argument("--output", default=None, help="Also write this run's report to a JSON file")
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
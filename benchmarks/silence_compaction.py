@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark: vectorized silence compaction vs the original per-sample removal
+
+Usage:
+    python -m benchmarks.silence_compaction --seconds 60 --repeats 5
+"""
+
+import argparse
+import time
+from typing import Callable, Dict
+
+import numpy as np
+
+from voice_cloning.silence import SilenceCompactor, compact_silence
+
+
+def legacy_remove_silence(audio: np.ndarray, sample_rate: int = 24000) -> np.ndarray:
+    """The original AudioProcessor.remove_silence, kept for comparison"""
+    import librosa
+
+    silence_threshold = 0.01
+    frame_length = int(sample_rate * 0.025)
+    hop_length = frame_length // 4
+
+    rms = librosa.feature.rms(y=audio, frame_length=frame_length, hop_length=hop_length)[0]
+    non_silent_frames = rms > silence_threshold
+
+    non_silent_samples = []
+    for i, is_sound in enumerate(non_silent_frames):
+        start_sample = i * hop_length
+        end_sample = min(start_sample + hop_length, len(audio))
+        if is_sound:
+            non_silent_samples.extend(range(start_sample, end_sample))
+
+    if not non_silent_samples:
+        return audio
+    return audio[non_silent_samples]
+
+
+def synthetic_speech(seconds: float, sample_rate: int = 24000, seed: int = 0) -> np.ndarray:
+    """Alternating tone bursts and noise-floor pauses of random length"""
+    rng = np.random.default_rng(seed)
+    total = int(seconds * sample_rate)
+    pieces = []
+    length = 0
+    while length < total:
+        burst = int(rng.uniform(0.2, 1.5) * sample_rate)
+        t = np.arange(burst) / sample_rate
+        pieces.append(0.3 * np.sin(2 * np.pi * rng.uniform(120, 300) * t))
+        pause = int(rng.uniform(0.05, 2.0) * sample_rate)
+        pieces.append(rng.standard_normal(pause) * 0.001)
+        length += burst + pause
+    return np.concatenate(pieces)[:total].astype(np.float32)
+
+
+def _time(fn: Callable, repeats: int) -> float:
+    fn()  # warm up
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(seconds: float = 60.0, repeats: int = 5, sample_rate: int = 24000,
+        chunk_seconds: float = 2.0) -> Dict[str, float]:
+    """
+    Time every implementation on the same synthetic signal
+
+    Returns:
+        Best-of-N wall time in seconds per implementation
+    """
+    audio = synthetic_speech(seconds, sample_rate)
+    chunk = int(chunk_seconds * sample_rate)
+
+    def streaming():
+        compactor = SilenceCompactor(sample_rate, 0.5)
+        for start in range(0, len(audio), chunk):
+            compactor.process(audio[start:start + chunk])
+        compactor.flush()
+
+    results = {
+        "compact_silence": _time(lambda: compact_silence(audio, sample_rate, 0.5), repeats),
+        "SilenceCompactor (streaming)": _time(streaming, repeats),
+    }
+    try:
+        results["legacy remove_silence"] = _time(lambda: legacy_remove_silence(audio, sample_rate), repeats)
+    except ImportError:
+        pass
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Silence compaction benchmark")
+    parser.add_argument("--seconds", type=float, default=60.0, help="Length of the test signal")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed repetitions (best is reported)")
+    args = parser.parse_args()
+
+    results = run(args.seconds, args.repeats)
+    baseline = results.get("legacy remove_silence")
+    print(f"Signal: {args.seconds:.0f}s at 24kHz, best of {args.repeats}")
+    for name, seconds in results.items():
+        speedup = f"  ({baseline / seconds:,.0f}x)" if baseline and name != "legacy remove_silence" else ""
+        print(f"  {name:<30} {seconds * 1000:10.2f} ms{speedup}")
+
+
+if __name__ == "__main__":
+    main()
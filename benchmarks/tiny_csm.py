@@ -0,0 +1,59 @@
+"""
+Tiny randomly initialised CSM for CPU benchmarks
+
+Keeps CSM-1B's vocabularies, 32 Mimi codebooks and 12.5 Hz frame rate, so
+every pipeline stage does the same kind of work on the same shapes, but with
+widths and depths small enough to run on a laptop CPU. Only the processor
+(tokenizer and chat template) comes from the real model; the weights are
+random, so the audio is noise and only timings are meaningful.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+TINY_CONFIG = Path(__file__).resolve().parent / "tiny_csm_config.json"
+DEFAULT_PROCESSOR = "./models/sesame-csm-1b"
+HUB_PROCESSOR = "sesame/csm-1b"
+
+
+def default_processor_path() -> str:
+    """Local CSM-1B directory when downloaded, otherwise the Hub repository"""
+    return DEFAULT_PROCESSOR if os.path.isdir(DEFAULT_PROCESSOR) else HUB_PROCESSOR
+
+
+def load_tiny_config(config_path: Optional[str] = None):
+    """CsmConfig from the reduced config.json (CSM-1B defaults for the rest)"""
+    from transformers import CsmConfig
+
+    with open(config_path or TINY_CONFIG, encoding="utf-8") as f:
+        overrides = {k: v for k, v in json.load(f).items() if not k.startswith("_")}
+    return CsmConfig(**overrides)
+
+
+def build_tiny_csm(processor_path: Optional[str] = None, config_path: Optional[str] = None,
+                   seed: int = 0, max_length: int = 2048) -> Tuple[object, object]:
+    """
+    Build a tiny CSM on CPU with the CSM-1B processor
+
+    Args:
+        processor_path: Directory or Hub id of the CSM processor
+        config_path: Reduced config.json (defaults to tiny_csm_config.json)
+        seed: Seed of the random initialisation
+        max_length: Generation max_length, as set by load_csm_model
+
+    Returns:
+        (model, processor)
+    """
+    import torch
+    from transformers import AutoProcessor, CsmForConditionalGeneration
+
+    from voice_cloning.models import configure_precision
+
+    processor = AutoProcessor.from_pretrained(processor_path or default_processor_path())
+    torch.manual_seed(seed)
+    model = CsmForConditionalGeneration(load_tiny_config(config_path)).eval()
+    model.generation_config.max_length = max_length
+    configure_precision(model)
+    return model, processor
@@ -4,6 +4,7 @@ Voice Cloning API usando CSM-1B nativo de Transformers
 Configurado para máximo rendimiento en NVIDIA A100
 """
 
+import io
 import os
 import sys
 import logging
@@ -23,6 +24,10 @@ from fastapi.middleware.cors import CORSMiddleware
 import aiofiles
 from transformers import CsmForConditionalGeneration, AutoProcessor
 import numpy as np
+import soundfile as sf
+
+from voice_cloning.models import configure_precision, cpu_supports_bf16, default_component_dtypes
+from voice_cloning_worker import AudioWorkerPool, get_inference_worker
 
 # Configuración de logging
 logging.basicConfig(
@@ -36,24 +41,14 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Configuración del entorno
-os.environ.setdefault('NO_TORCH_COMPILE', '1')
 os.environ.setdefault('PYTORCH_ENABLE_MPS_FALLBACK', '1')
 os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
 os.environ.setdefault('HF_TOKEN', '|==>REMOVED')
 
-# Fix for torch.compiler compatibility issues
-import torch
-if hasattr(torch, 'compiler'):
-    if not hasattr(torch.compiler, 'is_compiling'):
-        torch.compiler.is_compiling = lambda: False
-
 class CSMVoiceCloner:
     """Clonador de voz usando CSM-1B nativo"""
     
     def __init__(self, model_path: str = "./models/sesame-csm-1b"):
-        # Apply torch.compiler compatibility patch
-        self._apply_compatibility_patches()
-        
         self.model_path = model_path
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self.model = None
@@ -76,23 +71,6 @@ class CSMVoiceCloner:
         self._load_model()
         self._load_voice_profiles()
     
-    def _apply_compatibility_patches(self):
-        """Apply compatibility patches for PyTorch and transformers"""
-        try:
-            # Patch torch.compiler if needed
-            import torch
-            if hasattr(torch, 'compiler'):
-                if not hasattr(torch.compiler, 'is_compiling'):
-                    torch.compiler.is_compiling = lambda: False
-                    logger.info("✅ Applied torch.compiler compatibility patch")
-            
-            # Set compilation flags
-            if hasattr(torch, '_dynamo'):
-                torch._dynamo.config.suppress_errors = True
-                
-        except Exception as e:
-            logger.warning(f"⚠️ Could not apply all compatibility patches: {e}")
-    
     def _load_model(self):
         """Carga el modelo y processor CSM-1B"""
         try:
@@ -118,6 +96,16 @@ class CSMVoiceCloner:
             if not torch.cuda.is_available() or self.device == "cpu":
                 self.model = self.model.to(self.device)
             
+            # Se carga en float32 y luego se baja la precisión por componente:
+            # backbone y depth decoder en bf16, codec Mimi en fp32 (CSM_MIXED_PRECISION=0 lo desactiva)
+            mixed_precision = os.environ.get('CSM_MIXED_PRECISION', '1') == '1'
+            configure_precision(
+                self.model,
+                default_component_dtypes(self.device, mixed_precision),
+                autocast=mixed_precision and self.device == "cpu" and cpu_supports_bf16()
+            )
+            logger.info(f"🎚️ Precision: {self.model.precision['components']}")
+            
             logger.info("✅ CSM model loaded successfully")
             
             if torch.cuda.is_available():
@@ -313,6 +301,10 @@ class CSMVoiceCloner:
 # Inicializar clonador global
 cloner = None
 
+# El modelo vive en el hilo de inferencia; el audio se procesa en un pool aparte
+inference_worker = get_inference_worker()
+audio_pool = AudioWorkerPool(int(os.environ.get('AUDIO_PREPROCESSING_THREADS', '2')))
+
 def get_cloner():
     """Obtiene la instancia global del clonador"""
     global cloner
@@ -344,9 +336,9 @@ async def startup_event():
     for directory in ['outputs', 'temp', 'logs']:
         Path(directory).mkdir(exist_ok=True)
     
-    # Inicializar clonador
+    # Inicializar clonador en el hilo que lo va a usar
     try:
-        get_cloner()
+        await inference_worker.submit(get_cloner)
         logger.info("✅ Voice Cloning API ready")
     except Exception as e:
         logger.error(f"❌ Failed to initialize cloner: {e}")
@@ -448,6 +440,25 @@ async def list_voices():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list voices: {str(e)}")
 
+def decode_context_audio(content: bytes) -> np.ndarray:
+    """Decodifica audio de contexto subido a un array mono de 24kHz"""
+    waveform, sample_rate = torchaudio.load(io.BytesIO(content))
+    
+    if sample_rate != 24000:
+        resampler = torchaudio.transforms.Resample(sample_rate, 24000)
+        waveform = resampler(waveform)
+    
+    if waveform.shape[0] > 1:
+        waveform = waveform.mean(dim=0, keepdim=True)
+    
+    return waveform.squeeze().numpy()
+
+def save_audio(audio, output_path: Path, sample_rate: int = 24000):
+    """Guarda el audio generado como WAV (float32, mono)"""
+    if isinstance(audio, torch.Tensor):
+        audio = audio.detach().float().cpu().numpy()
+    sf.write(output_path, np.asarray(audio, dtype=np.float32).squeeze(), sample_rate)
+
 @app.post("/clone-voice")
 async def clone_voice_endpoint(
     text: str = Form(..., description="Text to synthesize"),
@@ -464,33 +475,13 @@ async def clone_voice_endpoint(
         # Procesar audio de contexto si se proporciona
         context_audio_array = None
         if context_audio:
-            # Guardar archivo temporal
-            temp_path = Path("temp") / f"context_{context_audio.filename}"
-            
-            async with aiofiles.open(temp_path, 'wb') as f:
-                content = await context_audio.read()
-                await f.write(content)
-            
-            try:
-                # Cargar y procesar audio
-                waveform, sample_rate = torchaudio.load(temp_path)
-                
-                if sample_rate != 24000:
-                    resampler = torchaudio.transforms.Resample(sample_rate, 24000)
-                    waveform = resampler(waveform)
-                
-                if waveform.shape[0] > 1:
-                    waveform = waveform.mean(dim=0, keepdim=True)
-                
-                context_audio_array = waveform.squeeze().numpy()
-                
-            finally:
-                # Limpiar archivo temporal
-                if temp_path.exists():
-                    temp_path.unlink()
+            # Decodificar en memoria, sin archivo temporal
+            content = await context_audio.read()
+            context_audio_array = await audio_pool.run(decode_context_audio, content)
         
-        # Generar audio
-        audio = cloner.clone_voice(
+        # Generar audio en el hilo de inferencia (no bloquea el event loop)
+        audio = await inference_worker.submit(
+            cloner.clone_voice,
             text=text,
             voice_name=voice_name,
             context_audio=context_audio_array,
@@ -502,22 +493,7 @@ async def clone_voice_endpoint(
         # Guardar audio
         output_path = Path("outputs") / f"cloned_{hash(text + str(voice_name))}_{np.random.randint(1000, 9999)}.wav"
         
-        # Convertir audio a tensor y guardar
-        if isinstance(audio, np.ndarray):
-            # Asegurar que el audio está en float32
-            audio = audio.astype(np.float32)
-            audio_tensor = torch.from_numpy(audio)
-        else:
-            audio_tensor = audio.float()  # Convertir a float32
-        
-        # Asegurar que tiene la forma correcta (1, N) para torchaudio
-        if len(audio_tensor.shape) == 1:
-            audio_tensor = audio_tensor.unsqueeze(0)
-        
-        # Guardar con soundfile para evitar errores de backend
-        audio_numpy = audio_tensor.squeeze().numpy() if isinstance(audio_tensor, torch.Tensor) else audio_tensor
-        import soundfile as sf
-        sf.write(output_path, audio_numpy, 24000)
+        await audio_pool.run(save_audio, audio, output_path)
         
         logger.info(f"✅ Generated audio: {output_path}")
         
@@ -561,7 +537,7 @@ async def upload_voice_profile(
         
         # Recargar perfiles
         cloner = get_cloner()
-        cloner._load_voice_profiles()
+        await inference_worker.submit(cloner._load_voice_profiles)
         
         logger.info(f"✅ Uploaded voice profile: {name}")
         
@@ -11,12 +11,13 @@ import asyncio
 import signal
 import uvicorn
 from pathlib import Path
+from typing import Optional
 
 # Add project root to path
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
-from voice_cloning_optimizer import OptimizationConfig, get_optimizer
+from voice_cloning_optimizer import OptimizationConfig, configure_optimizer, get_optimizer
 
 # Configure logging
 logging.basicConfig(
@@ -67,6 +68,10 @@ class VoiceAPIServer:
     
     def setup_optimization(self, gpu_optimization: bool = True, 
                          max_cache_mb: int = 4096,
+                         cache_storage: str = "float32",
+                         quantization: Optional[str] = None,
+                         torch_compile: bool = False,
+                         warmup: bool = True,
                          adaptive_chunking: bool = True,
                          max_concurrent: int = 2,
                          production: bool = False,
@@ -83,20 +88,28 @@ class VoiceAPIServer:
         self.optimization_config = OptimizationConfig(
             enable_gpu_optimization=gpu_optimization,
             max_cache_size_mb=max_cache_mb,
+            cache_storage=cache_storage,
+            quantization=quantization,
             adaptive_chunk_sizing=adaptive_chunking,
             enable_mixed_precision=True,
-            enable_torch_compile=False if production else True,  # Disable torch compile in production for stability
+            enable_torch_compile=torch_compile,
+            enable_warmup=warmup,
             audio_preprocessing_threads=4 if production else 2,
             max_concurrent_requests=max_concurrent,
             max_gpu_memory_fraction=gpu_memory_fraction
         )
+        # The API service reads the global optimizer when it is imported
+        configure_optimizer(self.optimization_config)
         
         # Log optimization settings
         logger.info(f"GPU Optimization: {gpu_optimization}")
-        logger.info(f"Max Cache Size: {max_cache_mb} MB")
+        logger.info(f"Max Cache Size: {max_cache_mb} MB ({cache_storage})")
         logger.info(f"Adaptive Chunking: {adaptive_chunking}")
         logger.info(f"Max Concurrent Requests: {max_concurrent}")
         logger.info(f"GPU Memory Fraction: {gpu_memory_fraction}")
+        logger.info(f"Quantization: {quantization or 'none'}")
+        logger.info(f"Compiled generation: {torch_compile}")
+        logger.info(f"Warmup before ready: {warmup}")
         logger.info(f"Production Mode: {production}")
         
         # Set environment variables for optimal performance
@@ -150,10 +163,19 @@ class VoiceAPIServer:
         signal.signal(signal.SIGTERM, signal_handler)
     
     def run_server(self, host: str = "0.0.0.0", port: int = 8000, 
-                   workers: int = 1, reload: bool = False):
+                   workers: int = 1, reload: bool = False,
+                   prefork_workers: int = 0, threads_per_worker: Optional[int] = None):
         """Run the API server"""
         logger.info(f"Starting Voice Cloning API server on {host}:{port}")
         
+        if prefork_workers > 0:
+            # Load the weights once and fork the inference processes before
+            # uvicorn starts its event loop; the API process dispatches to them
+            if workers > 1 or reload:
+                raise ValueError("--prefork-workers requires a single uvicorn worker without reload")
+            from voice_cloning_api import voice_service
+            voice_service.preload_and_fork(prefork_workers, threads_per_worker)
+        
         # Configure uvicorn
         config = uvicorn.Config(
             "voice_cloning_api:app",
@@ -187,10 +209,23 @@ def main():
     parser.add_argument("--port", type=int, default=7860, help="Port number")
     parser.add_argument("--workers", type=int, default=1, help="Number of workers")
     parser.add_argument("--reload", action="store_true", help="Enable auto-reload")
+    parser.add_argument("--prefork-workers", type=int, default=0,
+                        help="Serve a CPU model from N forked inference processes sharing one copy of the weights")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="torch threads per prefork process (default: cores / workers)")
     
     # Optimization configuration - Tuned for production
     parser.add_argument("--no-gpu", action="store_true", help="Disable GPU optimization")
     parser.add_argument("--cache-size", type=int, default=4096, help="Cache size in MB (default: 4096)")
+    parser.add_argument("--cache-storage", choices=["float32", "int16", "flac"], default="float32",
+                        help="Encoding of cached reference audio (default: float32)")
+    parser.add_argument("--quantization", choices=["int8", "int4"], default=None,
+                        help="Quantize the backbone and depth decoder (int8: CPU dynamic, runs the model "
+                             "on the CPU even on GPU hosts; int4: torchao weight-only)")
+    parser.add_argument("--torch-compile", action="store_true",
+                        help="Compiled static-cache generation, warmed up at startup (cached in TORCH_COMPILE_CACHE_DIR)")
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="Report ready (/ready) without a warmup synthesis per voice")
     parser.add_argument("--no-adaptive", action="store_true", help="Disable adaptive chunking")
     parser.add_argument("--max-concurrent", type=int, default=2, help="Max concurrent requests")
     
@@ -226,6 +261,10 @@ def main():
         server.setup_optimization(
             gpu_optimization=not args.no_gpu,
             max_cache_mb=args.cache_size,
+            cache_storage=args.cache_storage,
+            quantization=args.quantization,
+            torch_compile=args.torch_compile,
+            warmup=not args.no_warmup,
             adaptive_chunking=not args.no_adaptive,
             max_concurrent=args.max_concurrent,
             production=args.production,
@@ -241,8 +280,11 @@ def main():
         logger.info("=" * 60)
         logger.info(f"Server URL: http://{args.host}:{args.port}")
         logger.info(f"Health Check: http://{args.host}:{args.port}/health")
+        logger.info(f"Readiness: http://{args.host}:{args.port}/ready")
         logger.info(f"API Docs: http://{args.host}:{args.port}/docs")
         logger.info(f"Workers: {args.workers}")
+        if args.prefork_workers:
+            logger.info(f"Prefork inference processes: {args.prefork_workers}")
         logger.info(f"Reload: {args.reload}")
         logger.info("=" * 60)
         
@@ -251,7 +293,9 @@ def main():
             host=args.host,
             port=args.port,
             workers=args.workers,
-            reload=args.reload
+            reload=args.reload,
+            prefork_workers=args.prefork_workers,
+            threads_per_worker=args.threads_per_worker
         )
         
     except KeyboardInterrupt:
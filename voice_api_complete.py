@@ -25,12 +25,15 @@ from fastapi.middleware.cors import CORSMiddleware
 import aiofiles
 from transformers import CsmForConditionalGeneration, AutoProcessor
 import numpy as np
+import soundfile as sf
 from pydantic import BaseModel
 
-# Fix for torch.compiler compatibility issues
-# Some PyTorch versions don't have torch.compiler.is_compiling
-if not hasattr(torch.compiler, 'is_compiling'):
-    torch.compiler.is_compiling = lambda: False
+from voice_cloning.codec_cache import codec_version, load_reference_pcm, prepare_cached_inputs
+from voice_cloning.compilation import compile_csm_model, warmup_compiled_model
+from voice_cloning.models import configure_precision, cpu_supports_bf16, default_component_dtypes
+from voice_cloning.prefix_cache import get_prefix_cache
+from voice_cloning.result_cache import CACHE_BYPASS, CACHE_HIT, CACHE_MISS, get_result_cache
+from voice_cloning_worker import AudioWorkerPool, get_inference_worker
 
 # Configuración de logging
 logging.basicConfig(
@@ -44,7 +47,6 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Configuración del entorno
-os.environ.setdefault('NO_TORCH_COMPILE', '1')
 os.environ.setdefault('HF_TOKEN', '|==>REMOVED')
 
 # Modelos Pydantic para respuestas
@@ -108,6 +110,26 @@ class CSMVoiceManager:
                 device_map=self.device,
                 torch_dtype=torch.float32
             )
+
+            # Precisión por componente: backbone y depth decoder en bf16 donde el
+            # hardware lo soporta, codec Mimi siempre en fp32 (CSM_MIXED_PRECISION=0 fuerza fp32)
+            mixed_precision = os.environ.get('CSM_MIXED_PRECISION', '1') == '1'
+            configure_precision(
+                self.model,
+                default_component_dtypes(self.device, mixed_precision),
+                autocast=mixed_precision and self.device == "cpu" and cpu_supports_bf16()
+            )
+            logger.info(f"🎚️ Precision: {self.model.precision['components']} (autocast: {self.model.precision['autocast']})")
+            
+            # Generación compilada con KV cache estático (opt-in con CSM_TORCH_COMPILE=1);
+            # si la compilación falla se vuelve a la generación eager
+            self.compiled = False
+            if os.environ.get('CSM_TORCH_COMPILE', '0') == '1':
+                tag = "-".join(self.model.precision['components'].values())
+                compile_csm_model(self.model, tag=tag)
+                status = warmup_compiled_model(self.model, self.processor, tag=tag)
+                self.compiled = status['status'] in ('compiled', 'partial')
+                logger.info(f"⚙️ torch.compile: {status['status']} (warmup: {status['warmup_seconds']})")
             
             logger.info("✅ CSM model loaded successfully")
             
@@ -209,6 +231,64 @@ class CSMVoiceManager:
         with open(profiles_file, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
     
+    def _normalize_sample(self, temp_path: Path, audio_path: Path) -> tuple:
+        """Valida y normaliza una muestra (WAV 24kHz mono); se ejecuta en el pool de audio"""
+        try:
+            waveform, sample_rate = torchaudio.load(temp_path)
+            original_duration = waveform.shape[1] / sample_rate
+            
+            logger.info(f"📊 Original audio: {original_duration:.2f}s, {sample_rate}Hz, {waveform.shape[0]} channels")
+            
+            # VALIDAR DURACIÓN (3-9 segundos)
+            if original_duration < 3.0:
+                raise ValueError(f"Audio demasiado corto: {original_duration:.2f}s. Mínimo requerido: 3.0s")
+            elif original_duration > 9.0:
+                raise ValueError(f"Audio demasiado largo: {original_duration:.2f}s. Máximo permitido: 9.0s")
+            
+            # NORMALIZAR AUDIO
+            # 1. Convertir a mono si es estéreo
+            if waveform.shape[0] > 1:
+                waveform = waveform.mean(dim=0, keepdim=True)
+                logger.info("🔄 Converted to mono")
+            
+            # 2. Resample a 24kHz si es necesario
+            if sample_rate != 24000:
+                resampler = torchaudio.transforms.Resample(sample_rate, 24000)
+                waveform = resampler(waveform)
+                logger.info(f"🔄 Resampled from {sample_rate}Hz to 24000Hz")
+                sample_rate = 24000
+            
+            # 3. Normalizar amplitud (RMS normalization)
+            rms = torch.sqrt(torch.mean(waveform**2))
+            if rms > 0:
+                target_rms = 0.1  # Nivel de normalización
+                waveform = waveform * (target_rms / rms)
+                logger.info(f"🔄 Normalized RMS from {rms:.4f} to {target_rms:.4f}")
+            
+            # 4. Aplicar fade in/out suave para evitar clicks
+            fade_samples = int(0.01 * sample_rate)  # 10ms fade
+            if waveform.shape[1] > fade_samples * 2:
+                # Fade in
+                fade_in = torch.linspace(0, 1, fade_samples)
+                waveform[0, :fade_samples] *= fade_in
+                # Fade out
+                fade_out = torch.linspace(1, 0, fade_samples)
+                waveform[0, -fade_samples:] *= fade_out
+                logger.info("🔄 Applied fade in/out")
+            
+            # 5. Recalcular duración final
+            duration = waveform.shape[1] / sample_rate
+            
+            # Guardar archivo normalizado en formato WAV 24kHz
+            torchaudio.save(audio_path, waveform, sample_rate)
+            logger.info(f"✅ Saved normalized audio: {duration:.2f}s, 24000Hz, mono")
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to process audio: {e}")
+            raise ValueError(f"Error procesando audio: {str(e)}")
+        
+        return duration, sample_rate
+    
     async def upload_voice_sample(
         self, 
         voice_id: str, 
@@ -241,60 +321,8 @@ class CSMVoiceManager:
                 content = await audio_file.read()
                 await f.write(content)
             
-            # Cargar y analizar audio
-            try:
-                waveform, sample_rate = torchaudio.load(temp_path)
-                original_duration = waveform.shape[1] / sample_rate
-                
-                logger.info(f"📊 Original audio: {original_duration:.2f}s, {sample_rate}Hz, {waveform.shape[0]} channels")
-                
-                # VALIDAR DURACIÓN (3-9 segundos)
-                if original_duration < 3.0:
-                    raise ValueError(f"Audio demasiado corto: {original_duration:.2f}s. Mínimo requerido: 3.0s")
-                elif original_duration > 9.0:
-                    raise ValueError(f"Audio demasiado largo: {original_duration:.2f}s. Máximo permitido: 9.0s")
-                
-                # NORMALIZAR AUDIO
-                # 1. Convertir a mono si es estéreo
-                if waveform.shape[0] > 1:
-                    waveform = waveform.mean(dim=0, keepdim=True)
-                    logger.info("🔄 Converted to mono")
-                
-                # 2. Resample a 24kHz si es necesario
-                if sample_rate != 24000:
-                    resampler = torchaudio.transforms.Resample(sample_rate, 24000)
-                    waveform = resampler(waveform)
-                    logger.info(f"🔄 Resampled from {sample_rate}Hz to 24000Hz")
-                    sample_rate = 24000
-                
-                # 3. Normalizar amplitud (RMS normalization)
-                rms = torch.sqrt(torch.mean(waveform**2))
-                if rms > 0:
-                    target_rms = 0.1  # Nivel de normalización
-                    waveform = waveform * (target_rms / rms)
-                    logger.info(f"🔄 Normalized RMS from {rms:.4f} to {target_rms:.4f}")
-                
-                # 4. Aplicar fade in/out suave para evitar clicks
-                fade_samples = int(0.01 * sample_rate)  # 10ms fade
-                if waveform.shape[1] > fade_samples * 2:
-                    # Fade in
-                    fade_in = torch.linspace(0, 1, fade_samples)
-                    waveform[0, :fade_samples] *= fade_in
-                    # Fade out
-                    fade_out = torch.linspace(1, 0, fade_samples)
-                    waveform[0, -fade_samples:] *= fade_out
-                    logger.info("🔄 Applied fade in/out")
-                
-                # 5. Recalcular duración final
-                duration = waveform.shape[1] / sample_rate
-                
-                # Guardar archivo normalizado en formato WAV 24kHz
-                torchaudio.save(audio_path, waveform, sample_rate)
-                logger.info(f"✅ Saved normalized audio: {duration:.2f}s, 24000Hz, mono")
-                
-            except Exception as e:
-                logger.error(f"❌ Failed to process audio: {e}")
-                raise ValueError(f"Error procesando audio: {str(e)}")
+            # Cargar, validar y normalizar fuera del event loop
+            duration, sample_rate = await audio_pool.run(self._normalize_sample, temp_path, audio_path)
                 
         finally:
             # Limpiar archivo temporal
@@ -338,6 +366,35 @@ class CSMVoiceManager:
         logger.info(f"✅ Added voice sample to {voice_id}: {safe_name}")
         return profile
     
+    def get_reference_profile(self, voice_id: str = None, sample_name: str = None) -> Optional[VoiceProfile]:
+        """Muestra de referencia para una voz: la indicada o la primera de la colección"""
+        if not voice_id or voice_id not in self.voice_collections:
+            return None
+        collection = self.voice_collections[voice_id]
+        
+        target_profile = None
+        if sample_name:
+            target_profile = next((p for p in collection.profiles if p.name == sample_name), None)
+        
+        if not target_profile and collection.profiles:
+            target_profile = collection.profiles[0]  # Usar la primera muestra
+        return target_profile
+    
+    def result_cache_key(self, text: str, voice_id: str = None, sample_name: str = None,
+                         temperature: float = 0.8, max_tokens: int = 512) -> str:
+        """Clave de caché de un resultado: texto, muestra (incluida su versión en disco), parámetros y modelo"""
+        voice = None
+        target_profile = self.get_reference_profile(voice_id, sample_name)
+        if target_profile:
+            # Re-subir una muestra con el mismo nombre cambia su mtime y por tanto la clave
+            voice = f"{voice_id}/{target_profile.name}:{os.stat(target_profile.audio_path).st_mtime_ns}"
+        
+        return get_result_cache().make_key(
+            text, voice, temperature,
+            model_version=f"{codec_version(self.model, self.processor)}:{'/'.join(self.model.precision['components'].values())}",
+            max_tokens=max_tokens
+        )
+    
     def clone_voice(
         self, 
         text: str, 
@@ -350,44 +407,29 @@ class CSMVoiceManager:
         try:
             conversation = []
             
-            # Buscar muestra de referencia
-            if voice_id and voice_id in self.voice_collections:
-                collection = self.voice_collections[voice_id]
-                
-                # Buscar muestra específica o usar la primera
-                target_profile = None
-                if sample_name:
-                    target_profile = next((p for p in collection.profiles if p.name == sample_name), None)
-                
-                if not target_profile and collection.profiles:
-                    target_profile = collection.profiles[0]  # Usar la primera muestra
-                
-                if target_profile:
-                    # Cargar audio de referencia
-                    try:
-                        waveform, sample_rate = torchaudio.load(target_profile.audio_path)
-                        
-                        # Resample a 24kHz si es necesario
-                        if sample_rate != 24000:
-                            resampler = torchaudio.transforms.Resample(sample_rate, 24000)
-                            waveform = resampler(waveform)
-                        
-                        # Convertir a mono si es estéreo
-                        if waveform.shape[0] > 1:
-                            waveform = waveform.mean(dim=0, keepdim=True)
-                        
-                        conversation.append({
-                            "role": "0",
-                            "content": [
-                                {"type": "text", "text": target_profile.transcription},
-                                {"type": "audio", "path": waveform.squeeze().numpy()}
-                            ]
-                        })
-                        
-                        logger.info(f"🎯 Using voice reference: {voice_id}/{target_profile.name}")
-                        
-                    except Exception as e:
-                        logger.error(f"❌ Failed to load reference audio: {e}")
+            # Buscar muestra específica o usar la primera
+            target_profile = self.get_reference_profile(voice_id, sample_name)
+            
+            if target_profile:
+                # Cargar audio de referencia
+                try:
+                    # Audio ya normalizado en el upload: se decodifica una sola vez y se comparte
+                    reference_audio = load_reference_pcm(
+                        target_profile.audio_path, 24000, normalize=False
+                    )
+                    
+                    conversation.append({
+                        "role": "0",
+                        "content": [
+                            {"type": "text", "text": target_profile.transcription},
+                            {"type": "audio", "path": reference_audio}
+                        ]
+                    })
+                    
+                    logger.info(f"🎯 Using voice reference: {voice_id}/{target_profile.name}")
+                    
+                except Exception as e:
+                    logger.error(f"❌ Failed to load reference audio: {e}")
             
             # Agregar texto a sintetizar
             conversation.append({
@@ -397,11 +439,11 @@ class CSMVoiceManager:
             
             # Procesar entrada
             if conversation:
-                inputs = self.processor.apply_chat_template(
-                    conversation,
-                    tokenize=True,
-                    return_dict=True,
-                ).to(self.device)
+                # Los tokens Mimi y el KV-cache del prefijo de la voz se reutilizan desde la caché
+                inputs = prepare_cached_inputs(
+                    self.model, self.processor, conversation, self.device,
+                    prefix_cache=None if self.compiled else get_prefix_cache()
+                )
             else:
                 # Sin contexto, usar formato simple
                 formatted_text = f"[0]{text}"
@@ -460,6 +502,10 @@ class CSMVoiceManager:
 # Inicializar manager global
 voice_manager = None
 
+# El modelo vive en el hilo de inferencia; el audio se procesa en un pool aparte
+inference_worker = get_inference_worker()
+audio_pool = AudioWorkerPool(int(os.environ.get('AUDIO_PREPROCESSING_THREADS', '2')))
+
 def get_voice_manager():
     """Obtiene la instancia global del manager"""
     global voice_manager
@@ -488,7 +534,8 @@ async def startup_event():
     logger.info("🚀 Starting Voice Cloning API Complete...")
     
     try:
-        get_voice_manager()
+        # Cargar el modelo en el hilo que lo va a usar
+        await inference_worker.submit(get_voice_manager)
         logger.info("✅ Voice Cloning API Complete ready")
     except Exception as e:
         logger.error(f"❌ Failed to initialize voice manager: {e}")
@@ -725,6 +772,12 @@ async def upload_voice_sample(
         logger.error(f"❌ Voice upload failed: {e}")
         raise HTTPException(status_code=500, detail=f"Voice upload failed: {str(e)}")
 
+def save_audio(audio, output_path: Path, sample_rate: int = 24000):
+    """Guarda el audio generado como WAV (float32, mono)"""
+    if isinstance(audio, torch.Tensor):
+        audio = audio.detach().float().cpu().numpy()
+    sf.write(output_path, np.asarray(audio, dtype=np.float32).squeeze(), sample_rate)
+
 @app.post("/clone")
 async def clone_voice_endpoint(
     text: str = Form(..., description="Text to synthesize"),
@@ -742,14 +795,30 @@ async def clone_voice_endpoint(
         if voice_id and voice_id not in manager.voice_collections:
             raise HTTPException(status_code=404, detail=f"Voice collection '{voice_id}' not found")
         
-        # Generar audio
-        audio = manager.clone_voice(
-            text=text,
-            voice_id=voice_id,
-            sample_name=sample_name,
-            temperature=temperature,
-            max_tokens=max_tokens
-        )
+        # Peticiones repetidas se sirven desde la caché de resultados (opcional)
+        result_cache = get_result_cache()
+        cache_status = CACHE_BYPASS
+        cache_key = None
+        audio = None
+        if result_cache.enabled:
+            cache_key = manager.result_cache_key(text, voice_id, sample_name, temperature, max_tokens)
+            audio, tier = await audio_pool.run(result_cache.get, cache_key)
+            cache_status = CACHE_HIT if audio is not None else CACHE_MISS
+            if audio is not None:
+                logger.info(f"⚡ Result cache hit ({tier})")
+        
+        if audio is None:
+            # Generar audio en el hilo de inferencia (no bloquea el event loop)
+            audio = await inference_worker.submit(
+                manager.clone_voice,
+                text=text,
+                voice_id=voice_id,
+                sample_name=sample_name,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            if cache_key is not None:
+                await audio_pool.run(result_cache.put, cache_key, audio)
         
         # Crear nombre de archivo único
         text_hash = hashlib.md5(text.encode()).hexdigest()[:8]
@@ -759,27 +828,16 @@ async def clone_voice_endpoint(
         
         output_path = Path("outputs") / filename
         
-        # Guardar audio
-        if isinstance(audio, np.ndarray):
-            audio = audio.astype(np.float32)
-            audio_tensor = torch.from_numpy(audio)
-        else:
-            audio_tensor = audio.float()
-        
-        if len(audio_tensor.shape) == 1:
-            audio_tensor = audio_tensor.unsqueeze(0)
-        
-        # Use soundfile instead of torchaudio for better compatibility
-        audio_numpy = audio_tensor.squeeze().numpy() if isinstance(audio_tensor, torch.Tensor) else audio_tensor
-        import soundfile as sf
-        sf.write(output_path, audio_numpy, 24000)
+        # Guardar audio en el pool de audio
+        await audio_pool.run(save_audio, audio, output_path)
         
         logger.info(f"✅ Generated audio: {output_path}")
         
         return FileResponse(
             path=output_path,
             media_type="audio/wav",
-            filename=filename
+            filename=filename,
+            headers={"X-Cache": cache_status}
         )
         
     except HTTPException:
@@ -0,0 +1,552 @@
+"""
+Content-addressed cache of Mimi codec tokens for voice reference audio
+
+CSM re-encodes the reference clip with the Mimi codec on every generate call.
+The codes only depend on the normalized PCM and on the codec weights, so they
+are cached in memory and on disk and shared by every loader in the process.
+"""
+
+import hashlib
+import io
+import logging
+import os
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+import soundfile as sf
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.environ.get("CODEC_CACHE_DIR", "cache/codec_tokens")
+DEFAULT_REFERENCE_DIR = os.environ.get("REFERENCE_PCM_DIR", "cache/reference_pcm")
+
+
+class CodecTokenCache:
+    """
+    Two-tier (memory + disk) cache of encoded reference audio tokens
+
+    Entries are keyed by the SHA-256 of the normalized PCM plus a version
+    string identifying the processor and codec, so a model upgrade never
+    reuses stale codes.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                 max_memory_items: int = 256):
+        """
+        Args:
+            cache_dir: Directory for the on-disk tier (None disables it)
+            max_memory_items: Number of entries kept in memory
+        """
+        self.cache_dir = cache_dir
+        self.max_memory_items = max_memory_items
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(pcm: np.ndarray, version: str) -> str:
+        """
+        Build the content address of a reference clip
+
+        Args:
+            pcm: Normalized mono float32 PCM at the codec sample rate
+            version: Processor/codec version string
+
+        Returns:
+            Hex digest identifying the clip for this codec
+        """
+        digest = hashlib.sha256()
+        digest.update(version.encode("utf-8"))
+        digest.update(np.ascontiguousarray(pcm, dtype=np.float32).tobytes())
+        return digest.hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def _remember(self, key: str, codes: np.ndarray):
+        self._memory[key] = codes
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """
+        Look up codes for a key, falling back to the disk tier
+
+        Returns:
+            Array of shape (frames, num_codebooks) or None
+        """
+        with self._lock:
+            codes = self._memory.get(key)
+            if codes is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return codes
+
+        if self.cache_dir and os.path.exists(self._disk_path(key)):
+            try:
+                codes = np.load(self._disk_path(key))
+            except Exception as e:
+                logger.warning(f"Corrupt codec cache entry {key}: {e}")
+                return None
+            with self._lock:
+                self._remember(key, codes)
+                self.disk_hits += 1
+            return codes
+
+        return None
+
+    def put(self, key: str, codes: np.ndarray) -> np.ndarray:
+        """Store codes in memory and persist them to disk"""
+        # Codebook ids fit comfortably in int16 (vocab size 2051)
+        codes = np.ascontiguousarray(codes, dtype=np.int16)
+        with self._lock:
+            self._remember(key, codes)
+
+        if self.cache_dir:
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(tmp_path, "wb") as f:
+                    np.save(f, codes)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Could not persist codec cache entry {key}: {e}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+        return codes
+
+    def get_or_encode(self, pcm: np.ndarray, version: str,
+                      encode_fn: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+        """
+        Return cached codes for a clip, encoding it once on a miss
+
+        Args:
+            pcm: Normalized mono float32 PCM
+            version: Processor/codec version string
+            encode_fn: Callable mapping PCM to (frames, num_codebooks) codes
+
+        Returns:
+            Codes array of shape (frames, num_codebooks)
+        """
+        key = self.make_key(pcm, version)
+        codes = self.get(key)
+        if codes is not None:
+            return codes
+
+        with self._lock:
+            self.misses += 1
+        codes = self.put(key, encode_fn(pcm))
+        logger.info(f"Encoded reference audio to {codes.shape[0]} codec frames ({key[:12]})")
+        return codes
+
+    def clear(self):
+        """Drop the in-memory tier (disk entries stay valid)"""
+        with self._lock:
+            self._memory.clear()
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get cache statistics"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "memory_items": len(self._memory),
+                "memory_hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+# Reference PCM is memoized by file identity so chunks of one request (and
+# later requests) don't decode and resample the same clip again.
+_pcm_memo: "OrderedDict[Tuple[str, int, int, int, bool], np.ndarray]" = OrderedDict()
+_pcm_memo_lock = Lock()
+_PCM_MEMO_SIZE = 64
+
+
+def load_reference_pcm(audio_path: str, target_sample_rate: int = 24000,
+                       normalize: bool = True) -> np.ndarray:
+    """
+    Load, resample and peak-normalize a reference clip, memoized per file
+
+    Args:
+        audio_path: Path to the audio file
+        target_sample_rate: Codec sample rate (CSM uses 24kHz)
+        normalize: Peak-normalize the clip to [-1, 1]
+
+    Returns:
+        Read-only float32 mono PCM array
+    """
+    stat = os.stat(audio_path)
+    memo_key = (os.path.abspath(audio_path), stat.st_mtime_ns, stat.st_size,
+                target_sample_rate, normalize)
+
+    with _pcm_memo_lock:
+        audio = _pcm_memo.get(memo_key)
+        if audio is not None:
+            _pcm_memo.move_to_end(memo_key)
+            return audio
+
+    import librosa  # Imported on first decode to keep it off the startup path
+    
+    audio, sr = librosa.load(audio_path, sr=None, dtype=np.float32)
+    audio = normalize_reference_pcm(audio, sr, target_sample_rate, normalize)
+
+    with _pcm_memo_lock:
+        _pcm_memo[memo_key] = audio
+        while len(_pcm_memo) > _PCM_MEMO_SIZE:
+            _pcm_memo.popitem(last=False)
+
+    return audio
+
+
+def normalize_reference_pcm(audio: np.ndarray, sample_rate: int,
+                            target_sample_rate: int = 24000,
+                            normalize: bool = True) -> np.ndarray:
+    """
+    Downmix, resample and peak-normalize in-memory reference audio
+
+    Args:
+        audio: Mono or multi-channel PCM (channels on the shorter axis)
+        sample_rate: Sample rate of audio
+        target_sample_rate: Codec sample rate (CSM uses 24kHz)
+        normalize: Peak-normalize the clip to [-1, 1]
+
+    Returns:
+        Read-only float32 mono PCM array
+    """
+    audio = np.asarray(audio, dtype=np.float32)
+    if audio.ndim > 1:
+        audio = audio.mean(axis=int(np.argmin(audio.shape)))
+
+    if sample_rate != target_sample_rate:
+        import librosa
+        audio = librosa.resample(audio, orig_sr=sample_rate, target_sr=target_sample_rate)
+
+    peak = np.max(np.abs(audio)) if audio.size else 0.0
+    if normalize and peak > 0:
+        audio = audio / peak
+
+    audio = np.ascontiguousarray(audio, dtype=np.float32)
+    audio.setflags(write=False)
+    return audio
+
+
+def decode_reference_bytes(data: bytes, target_sample_rate: int = 24000,
+                           normalize: bool = True) -> np.ndarray:
+    """
+    Decode an uploaded reference clip without touching the filesystem
+
+    Args:
+        data: Encoded audio (any format libsndfile reads)
+        target_sample_rate: Codec sample rate (CSM uses 24kHz)
+        normalize: Peak-normalize the clip to [-1, 1]
+
+    Returns:
+        Read-only float32 mono PCM array
+    """
+    audio, sr = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+    return normalize_reference_pcm(audio.T, sr, target_sample_rate, normalize)
+
+
+class ReferencePCMStore:
+    """
+    Content-addressed disk store of decoded reference uploads
+
+    Uploads are keyed by the SHA-256 of their encoded bytes, so the same clip
+    maps to the same entry in every worker process and across restarts. The
+    decoded, 24kHz-normalized PCM is saved as .npy and memory-mapped on
+    reuse; concurrent processes share the pages through the OS page cache.
+    """
+
+    HASH_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, store_dir: Optional[str] = DEFAULT_REFERENCE_DIR,
+                 target_sample_rate: int = 24000):
+        """
+        Args:
+            store_dir: Directory holding the .npy entries (None disables persistence)
+            target_sample_rate: Sample rate entries are normalized to
+        """
+        self.store_dir = store_dir
+        self.target_sample_rate = target_sample_rate
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def hash_upload(self, fileobj) -> str:
+        """
+        Content address of an upload, read in chunks from its start
+
+        Args:
+            fileobj: Binary file object (e.g. UploadFile.file)
+
+        Returns:
+            Key of the upload for this store's sample rate
+        """
+        digest = hashlib.sha256()
+        fileobj.seek(0)
+        for block in iter(lambda: fileobj.read(self.HASH_CHUNK_SIZE), b""):
+            digest.update(block)
+        fileobj.seek(0)
+        return f"{digest.hexdigest()}_{self.target_sample_rate}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.store_dir, f"{key}.npy")
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """
+        Memory-map a stored entry
+
+        Returns:
+            Read-only float32 PCM backed by the .npy file, or None
+        """
+        if not self.store_dir or not os.path.exists(self._path(key)):
+            return None
+        try:
+            return np.load(self._path(key), mmap_mode="r")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Corrupt reference store entry {key}: {e}")
+            return None
+
+    def put(self, key: str, pcm: np.ndarray):
+        """Persist PCM atomically; concurrent writers of one key are harmless"""
+        if not self.store_dir:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.store_dir, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.ascontiguousarray(pcm, dtype=np.float32))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not persist reference store entry {key}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def load_upload(self, key: str, fileobj) -> Tuple[np.ndarray, bool]:
+        """
+        Stored PCM for an upload, decoding and storing it on a miss
+
+        Args:
+            key: Key returned by hash_upload
+            fileobj: The upload, decoded straight from the file on a miss
+
+        Returns:
+            (read-only float32 PCM, hit)
+        """
+        pcm = self.get(key)
+        with self._lock:
+            if pcm is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if pcm is not None:
+            return pcm, True
+
+        fileobj.seek(0)
+        audio, sr = sf.read(fileobj, dtype="float32", always_2d=True)
+        pcm = normalize_reference_pcm(audio.T, sr, self.target_sample_rate)
+        self.put(key, pcm)
+        return pcm, False
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get store statistics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def codec_version(model, processor) -> str:
+    """
+    Identify the processor/codec pair that produced a set of codes
+
+    Args:
+        model: Loaded CsmForConditionalGeneration
+        processor: Matching processor
+
+    Returns:
+        Short version string used as part of the cache key
+    """
+    cached = getattr(model, "_codec_cache_version", None)
+    if cached is not None:
+        return cached
+
+    import transformers
+
+    digest = hashlib.sha256()
+    digest.update(transformers.__version__.encode("utf-8"))
+    digest.update(type(processor).__name__.encode("utf-8"))
+    codec_config = getattr(getattr(model, "codec_model", None), "config", None)
+    if codec_config is not None:
+        digest.update(codec_config.to_json_string(use_diff=False).encode("utf-8"))
+    digest.update(str(getattr(model.config, "_name_or_path", "")).encode("utf-8"))
+    model._codec_cache_version = digest.hexdigest()[:16]
+    return model._codec_cache_version
+
+
+def encode_reference_audio(model, pcm: np.ndarray) -> np.ndarray:
+    """
+    Encode a reference clip with the model's Mimi codec
+
+    Args:
+        model: Loaded CsmForConditionalGeneration
+        pcm: Normalized mono float32 PCM at 24kHz
+
+    Returns:
+        Codes array of shape (frames, num_codebooks)
+    """
+    codec = model.codec_model
+    codec_param = next(codec.parameters())
+    audio = torch.from_numpy(np.array(pcm, dtype=np.float32)).to(
+        device=codec_param.device, dtype=codec_param.dtype
+    ).view(1, 1, -1)
+
+    with torch.no_grad():
+        codec_outputs = codec.encode(audio)
+
+    # (1, num_codebooks, frames) -> (frames, num_codebooks)
+    return codec_outputs.audio_codes[0].transpose(0, 1).cpu().numpy()
+
+
+def _audio_segments(conversation: List[dict]) -> List[np.ndarray]:
+    """Collect the audio arrays of a conversation in template order"""
+    segments = []
+    for message in conversation:
+        for content in message.get("content", []):
+            if content.get("type") == "audio" and isinstance(content.get("path"), np.ndarray):
+                segments.append(content["path"])
+    return segments
+
+
+def embed_with_cached_codes(model, input_ids: torch.Tensor,
+                            audio_codes: List[torch.Tensor]) -> torch.Tensor:
+    """
+    Build backbone input embeddings using pre-encoded reference audio
+
+    Mirrors CsmForConditionalGeneration._merge_input_ids_with_input_values but
+    takes the codec tokens from the cache instead of running the codec.
+
+    Args:
+        model: Loaded CsmForConditionalGeneration
+        input_ids: Text/audio-placeholder ids of shape (1, seq_len)
+        audio_codes: One (frames, num_codebooks) tensor per audio segment
+
+    Returns:
+        inputs_embeds of shape (1, seq_len, hidden_size)
+    """
+    config = model.config
+    inputs_embeds = model.embed_text_tokens(input_ids)
+
+    positions = (input_ids[0] == config.audio_token_id).nonzero().squeeze(-1)
+    if positions.numel():
+        # One contiguous run of audio placeholders per audio segment
+        breaks = (positions.diff() != 1).nonzero().squeeze(-1) + 1
+        runs = torch.tensor_split(positions, breaks.cpu())
+        if len(runs) != len(audio_codes):
+            raise ValueError(f"Expected {len(runs)} audio segments, got {len(audio_codes)}")
+
+        for run, codes in zip(runs, audio_codes):
+            codes = codes[: run.numel()]
+            if codes.shape[0] < run.numel():
+                codes = torch.nn.functional.pad(codes, (0, 0, 0, run.numel() - codes.shape[0]))
+            audio_embeds = model.backbone_model.embed_tokens(codes.unsqueeze(0))[0]
+            inputs_embeds[0, run] = audio_embeds.to(inputs_embeds.dtype)
+
+    eos_mask = input_ids == config.audio_eos_token_id
+    if eos_mask.any():
+        eos_frame = torch.full((1, 1, config.num_codebooks), config.codebook_eos_token_id,
+                               dtype=torch.long, device=input_ids.device)
+        eos_embeds = model.backbone_model.embed_tokens(eos_frame).squeeze(1)
+        inputs_embeds[eos_mask] = eos_embeds.to(inputs_embeds.dtype).repeat(int(eos_mask.sum()), 1)
+
+    return inputs_embeds
+
+
+def prepare_cached_inputs(model, processor, conversation: List[dict], device,
+                          cache: Optional["CodecTokenCache"] = None,
+                          prefix_cache=None) -> Dict[str, torch.Tensor]:
+    """
+    Tokenize a conversation and embed its reference audio from the cache
+
+    Falls back to the processor's own inputs (codec runs inside generate)
+    when the model does not expose the expected CSM internals.
+
+    Args:
+        model: Loaded CsmForConditionalGeneration
+        processor: Matching processor
+        conversation: Conversation in CSM chat format
+        device: Device the model runs on
+        cache: Codec token cache (defaults to the global one)
+        prefix_cache: Optional PrefixKVCache reusing the voice prompt's
+            past_key_values across calls
+
+    Returns:
+        Keyword arguments for model.generate
+    """
+    inputs = processor.apply_chat_template(
+        conversation,
+        tokenize=True,
+        return_dict=True,
+    ).to(device)
+
+    if not hasattr(model, "codec_model"):
+        return dict(inputs)
+
+    cache = cache or get_codec_cache()
+    try:
+        audio_codes = []
+        segments = _audio_segments(conversation)
+        if segments:
+            version = codec_version(model, processor)
+            audio_codes = [
+                torch.from_numpy(
+                    cache.get_or_encode(segment, version, lambda pcm: encode_reference_audio(model, pcm))
+                ).to(device=inputs["input_ids"].device, dtype=torch.long)
+                for segment in segments
+            ]
+        with torch.no_grad():
+            inputs_embeds = embed_with_cached_codes(model, inputs["input_ids"], audio_codes)
+    except (AttributeError, ValueError) as e:
+        logger.warning(f"Codec token cache unavailable for this model, encoding inline: {e}")
+        return dict(inputs)
+
+    gen_inputs = {
+        "inputs_embeds": inputs_embeds,
+        "attention_mask": inputs["attention_mask"],
+    }
+    if prefix_cache is not None:
+        gen_inputs = prefix_cache.attach(model, processor, conversation,
+                                         inputs["input_ids"], gen_inputs)
+    return gen_inputs
+
+
+# Global codec token cache instance
+codec_cache = CodecTokenCache()
+
+
+def get_codec_cache() -> CodecTokenCache:
+    """Get the global codec token cache instance"""
+    return codec_cache
+
+
+# Global reference upload store instance
+reference_store = ReferencePCMStore()
+
+
+def get_reference_store() -> ReferencePCMStore:
+    """Get the global reference upload store instance"""
+    return reference_store
@@ -0,0 +1,226 @@
+"""
+Compiled, static-cache generation for CSM
+
+Opt-in (OptimizationConfig.enable_torch_compile). The backbone and depth
+decoder forwards are wrapped with torch.compile and both generate loops use
+a static KV cache, so every decode step has the same shapes and reuses one
+graph. Prompt lengths still vary; a warmup over a few prompt-length buckets
+compiles those graphs at startup instead of on the first requests. Compiled
+artifacts are kept on disk so a restart loads them instead of recompiling.
+
+Any compilation failure falls back to the eager forward, at load time or on
+a later recompile.
+"""
+
+import logging
+import os
+import time
+from typing import Any, Dict, Optional, Sequence
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COMPILE_CACHE_DIR = os.environ.get("TORCH_COMPILE_CACHE_DIR", "cache/torch_compile")
+
+# Approximate prompt lengths (in tokens) compiled during warmup
+WARMUP_BUCKETS = (32, 128, 384)
+
+# Submodules whose forward runs once per generated frame / codebook
+COMPILED_COMPONENTS = ("backbone_model", "depth_decoder")
+
+
+def _describe(exc: BaseException) -> str:
+    return f"{type(exc).__name__}: {exc}"
+
+
+class CompiledForward:
+    """
+    A module's forward compiled with torch.compile, with eager fallback
+
+    The first failure (graph break with fullgraph, backend error, failed
+    recompile for a new shape) switches the module back to its eager
+    forward for good.
+    """
+
+    def __init__(self, module: torch.nn.Module, name: str, mode: str):
+        self.name = name
+        self.eager = module.forward
+        self.compiled = torch.compile(self.eager, mode=mode, dynamic=None)
+        self.error: Optional[str] = None
+
+    def __call__(self, *args, **kwargs):
+        if self.error is None:
+            try:
+                return self.compiled(*args, **kwargs)
+            except Exception as e:
+                self.error = _describe(e)
+                logger.warning(f"Compiled {self.name} failed, using eager forward: {self.error}")
+        return self.eager(*args, **kwargs)
+
+
+def enable_compile_cache(cache_dir: str = DEFAULT_COMPILE_CACHE_DIR) -> str:
+    """
+    Keep inductor's compiled artifacts under cache_dir across restarts
+
+    Returns:
+        The inductor cache directory
+    """
+    inductor_dir = os.path.abspath(os.path.join(cache_dir, "inductor"))
+    os.makedirs(inductor_dir, exist_ok=True)
+    os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", inductor_dir)
+    os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+    os.environ.setdefault("TORCHINDUCTOR_AUTOGRAD_CACHE", "1")
+    try:
+        import torch._inductor.config as inductor_config
+        inductor_config.fx_graph_cache = True
+    except (ImportError, AttributeError):
+        pass
+    return os.environ["TORCHINDUCTOR_CACHE_DIR"]
+
+
+def _artifacts_path(cache_dir: str, tag: str) -> str:
+    # Artifacts are only valid for the torch build and model setup that made them
+    version = torch.__version__.replace("+", "_")
+    return os.path.join(cache_dir, f"artifacts-{version}-{tag}.bin")
+
+
+def load_compile_artifacts(cache_dir: str, tag: str) -> bool:
+    """Preload saved compile artifacts (torch >= 2.7); True when some were loaded"""
+    path = _artifacts_path(cache_dir, tag)
+    if not hasattr(torch.compiler, "load_cache_artifacts") or not os.path.exists(path):
+        return False
+    try:
+        with open(path, "rb") as f:
+            torch.compiler.load_cache_artifacts(f.read())
+        return True
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable compile artifacts {path}: {_describe(e)}")
+        return False
+
+
+def save_compile_artifacts(cache_dir: str, tag: str) -> Optional[str]:
+    """Persist the compile artifacts produced so far (torch >= 2.7)"""
+    if not hasattr(torch.compiler, "save_cache_artifacts"):
+        return None
+    saved = torch.compiler.save_cache_artifacts()
+    if not saved:
+        return None
+    path = _artifacts_path(cache_dir, tag)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(saved[0])
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not save compile artifacts: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+    return path
+
+
+def _set_static_cache(model, enabled: bool):
+    """Use a static KV cache in the backbone and depth decoder generate loops"""
+    for generation_model in (model, getattr(model, "depth_decoder", None)):
+        config = getattr(generation_model, "generation_config", None)
+        if config is not None:
+            config.cache_implementation = "static" if enabled else None
+
+
+def uncompile_csm_model(model) -> None:
+    """Restore the eager forwards and the dynamic KV cache"""
+    for name in COMPILED_COMPONENTS:
+        module = getattr(model, name, None)
+        if module is not None and isinstance(module.__dict__.get("forward"), CompiledForward):
+            del module.forward
+    _set_static_cache(model, False)
+
+
+def compile_csm_model(model, cache_dir: str = DEFAULT_COMPILE_CACHE_DIR,
+                      tag: str = "csm", mode: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Compile the backbone and depth decoder steps and switch to a static KV cache
+
+    Args:
+        model: Loaded CSM model (after precision and quantization are set)
+        cache_dir: Directory of the persistent compile cache
+        tag: Identifies the model setup the saved artifacts belong to
+        mode: torch.compile mode (default: "reduce-overhead" on CUDA,
+            where it adds CUDA graphs, "default" on CPU)
+
+    Returns:
+        Compilation status, also stored as ``model.compilation``
+    """
+    device_type = next(model.parameters()).device.type
+    mode = mode or ("reduce-overhead" if device_type == "cuda" else "default")
+    status = {"enabled": True, "mode": mode, "status": "eager", "cache_dir": cache_dir,
+              "artifacts_loaded": False, "warmup_seconds": None, "warmup_buckets": [], "error": None}
+    model.compilation = status
+
+    try:
+        enable_compile_cache(cache_dir)
+        status["artifacts_loaded"] = load_compile_artifacts(cache_dir, tag)
+        _set_static_cache(model, True)
+        for name in COMPILED_COMPONENTS:
+            module = getattr(model, name, None)
+            if module is not None and not isinstance(module.__dict__.get("forward"), CompiledForward):
+                module.forward = CompiledForward(module, name, mode)
+        status["status"] = "compiled"
+    except Exception as e:
+        uncompile_csm_model(model)
+        status.update(status="failed", error=_describe(e))
+        logger.warning(f"torch.compile unavailable, generating eagerly: {status['error']}")
+    return status
+
+
+def compile_errors(model) -> Dict[str, str]:
+    """Components that fell back to eager after a compile failure"""
+    errors = {}
+    for name in COMPILED_COMPONENTS:
+        forward = getattr(getattr(model, name, None), "__dict__", {}).get("forward")
+        if isinstance(forward, CompiledForward) and forward.error:
+            errors[name] = forward.error
+    return errors
+
+
+def warmup_compiled_model(model, processor, buckets: Sequence[int] = WARMUP_BUCKETS,
+                          max_new_tokens: int = 4, tag: str = "csm") -> Dict[str, Any]:
+    """
+    Compile the graphs for a few prompt lengths before serving
+
+    Each bucket runs a short greedy generation on a text prompt of about
+    that many tokens. If compilation fails the model is restored to eager
+    generation; the saved artifacts let the next start skip the compile.
+
+    Returns:
+        The updated ``model.compilation`` status
+    """
+    status = getattr(model, "compilation", None)
+    if not status or status["status"] != "compiled":
+        return status or {"enabled": False}
+
+    device = next(model.parameters()).device
+    started = time.perf_counter()
+    try:
+        for bucket in buckets:
+            # About one token per short word
+            text = " ".join(["hello"] * max(1, bucket - 4))
+            inputs = processor(f"[0]{text}", add_special_tokens=True).to(device)
+            with torch.no_grad():
+                model.generate(**inputs, output_audio=True, max_new_tokens=max_new_tokens, do_sample=False)
+            status["warmup_buckets"].append(bucket)
+    except Exception as e:
+        uncompile_csm_model(model)
+        status.update(status="failed", error=_describe(e))
+        logger.warning(f"Compiled warmup failed, generating eagerly: {status['error']}")
+        return status
+    status["warmup_seconds"] = time.perf_counter() - started
+
+    errors = compile_errors(model)
+    if errors:
+        status.update(status="partial", error=errors)
+    elif not status["artifacts_loaded"]:
+        save_compile_artifacts(status["cache_dir"], tag)
+    logger.info(f"Compiled warmup over {status['warmup_buckets']} tokens took {status['warmup_seconds']:.1f}s")
+    return status
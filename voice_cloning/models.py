@@ -2,22 +2,255 @@
 Model loading utilities for Sesame CSM-1B Voice Cloning
 """
 
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import torch
 import os
 from transformers import CsmForConditionalGeneration, AutoProcessor
-from typing import Tuple, Optional
+from typing import Any, Callable, Dict, Tuple, Optional
+
+QUANTIZATION_MODES = ("int8", "int4")
+
+# Submodules whose Linear layers are quantized; the Mimi codec (codec_model)
+# stays in full precision. lm_head is the backbone's output projection.
+QUANTIZED_COMPONENTS = ("backbone_model", "lm_head", "depth_decoder")
+
+DTYPES = {
+    "float32": torch.float32, "fp32": torch.float32,
+    "bfloat16": torch.bfloat16, "bf16": torch.bfloat16,
+    "float16": torch.float16, "fp16": torch.float16,
+}
+
+# Precision of each model component; the Mimi codec is the most sensitive
+FP32_COMPONENTS = {"backbone": "float32", "depth_decoder": "float32", "codec": "float32"}
+MIXED_COMPONENTS = {"backbone": "bfloat16", "depth_decoder": "bfloat16", "codec": "float32"}
 
 class CSMModelConfig:
     """Configuration class for CSM model parameters"""
-    def __init__(self, max_length: int = 2048, temperature: float = 0.7):
+    def __init__(self, max_length: int = 2048, temperature: float = 0.7,
+                 quantization: Optional[str] = None,
+                 component_dtypes: Optional[Dict[str, str]] = None,
+                 autocast: bool = False, compile: bool = False):
+        """
+        Args:
+            max_length: Maximum sequence length
+            temperature: Default generation temperature
+            quantization: None, "int8" (dynamic, CPU) or "int4" (weight-only, needs torchao)
+            component_dtypes: dtype per component ("backbone", "depth_decoder",
+                "codec"); missing components stay float32
+            autocast: Run generation under bfloat16 autocast (codec excluded)
+            compile: torch.compile the backbone and depth decoder steps with a
+                static KV cache, warmed up at load time
+        """
+        if quantization is not None and quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization '{quantization}', expected one of {QUANTIZATION_MODES}")
         self.max_length = max_length
         self.temperature = temperature
+        self.quantization = quantization
+        self.component_dtypes = {**FP32_COMPONENTS, **(component_dtypes or {})}
+        for dtype in self.component_dtypes.values():
+            resolve_dtype(dtype)
+        self.autocast = autocast
+        self.compile = compile
+
+def resolve_dtype(name: str) -> torch.dtype:
+    """Map a dtype name ("bf16", "float32", ...) to a torch dtype"""
+    try:
+        return DTYPES[name]
+    except KeyError:
+        raise ValueError(f"Unknown dtype '{name}', expected one of {sorted(DTYPES)}")
+
+def cpu_supports_bf16() -> bool:
+    """True when the CPU has native bfloat16 matmul (AVX512-BF16 or AMX)"""
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+def default_component_dtypes(device: str, mixed_precision: bool = True) -> Dict[str, str]:
+    """
+    Component dtypes for a device
+    
+    bfloat16 backbone and depth decoder where the hardware computes bf16
+    natively, float32 everywhere else; the codec always stays float32.
+    """
+    if not mixed_precision:
+        return dict(FP32_COMPONENTS)
+    if str(device).startswith("cuda"):
+        supported = torch.cuda.is_available() and torch.cuda.is_bf16_supported()
+    else:
+        supported = cpu_supports_bf16()
+    return dict(MIXED_COMPONENTS if supported else FP32_COMPONENTS)
+
+def _cast_floating(value: Any, dtype: torch.dtype) -> Any:
+    if isinstance(value, torch.Tensor) and value.is_floating_point() and value.dtype != dtype:
+        return value.to(dtype)
+    return value
+
+def _cast_inputs_hook(module, args, kwargs):
+    """Forward pre-hook casting floating inputs to the module's compute_dtype"""
+    dtype = module.compute_dtype
+    return (tuple(_cast_floating(a, dtype) for a in args),
+            {k: _cast_floating(v, dtype) for k, v in kwargs.items()})
+
+def _set_component_dtype(module: torch.nn.Module, dtype: torch.dtype):
+    """Cast a component and cast its inputs at the boundary from now on"""
+    module.to(dtype)
+    if not hasattr(module, "compute_dtype"):
+        module.register_forward_pre_hook(_cast_inputs_hook, with_kwargs=True)
+    module.compute_dtype = dtype
+
+def _with_autocast(fn: Callable, device_type: str, enabled: bool,
+                   cast_to: Optional[torch.dtype] = None) -> Callable:
+    """Wrap a method to run with autocast on/off, optionally casting its first input"""
+    fn = getattr(fn, "_unwrapped", fn)  # Re-configuring replaces, never stacks, wrappers
+    
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if cast_to is not None and args:
+            args = (_cast_floating(args[0], cast_to),) + args[1:]
+        with torch.autocast(device_type=device_type, dtype=torch.bfloat16, enabled=enabled):
+            return fn(*args, **kwargs)
+    wrapper._unwrapped = fn
+    return wrapper
+
+def configure_precision(model: CsmForConditionalGeneration,
+                        component_dtypes: Optional[Dict[str, str]] = None,
+                        autocast: bool = False) -> CsmForConditionalGeneration:
+    """
+    Give each CSM component its own dtype and fix the seams between them
+    
+    Loading everything in one reduced dtype fails where components hand
+    tensors to each other (backbone hidden state into the depth decoder,
+    float32 processor audio into the codec), which is why the loaders used
+    to force float32. Here every component is cast separately and inputs
+    are cast at its boundary instead.
+    
+    Args:
+        model: Model loaded in float32
+        component_dtypes: dtype per component ("backbone", "depth_decoder", "codec")
+        autocast: Run generate under bfloat16 autocast; the codec always runs
+            without it
+        
+    Returns:
+        The same model
+    """
+    dtypes = {name: resolve_dtype(dtype) for name, dtype in {**FP32_COMPONENTS, **(component_dtypes or {})}.items()}
+    device_type = next(model.parameters()).device.type
+    
+    for name in ("embed_text_tokens", "lm_head"):
+        if hasattr(model, name):
+            getattr(model, name).to(dtypes["backbone"])
+    if hasattr(model, "backbone_model"):
+        _set_component_dtype(model.backbone_model, dtypes["backbone"])
+    if hasattr(model, "depth_decoder"):
+        _set_component_dtype(model.depth_decoder, dtypes["depth_decoder"])
+    if hasattr(model, "codec_model"):
+        codec = model.codec_model
+        codec.to(dtypes["codec"])
+        # encode/decode are called directly (no forward hooks), so wrap them
+        codec.encode = _with_autocast(codec.encode, device_type, enabled=False, cast_to=dtypes["codec"])
+        codec.decode = _with_autocast(codec.decode, device_type, enabled=False)
+    
+    if autocast:
+        model.generate = _with_autocast(model.generate, device_type, enabled=True)
+    elif hasattr(model.generate, "_unwrapped"):
+        model.generate = model.generate._unwrapped
+    
+    model.precision = {
+        "components": {name: str(dtype).replace("torch.", "") for name, dtype in dtypes.items()},
+        "autocast": autocast,
+    }
+    return model
+
+def _state_bytes(value: Any) -> int:
+    if isinstance(value, torch.Tensor):
+        return value.numel() * value.element_size()
+    if isinstance(value, (tuple, list)):  # Packed quantized weights
+        return sum(_state_bytes(v) for v in value)
+    return 0
+
+def component_memory_mb(model: torch.nn.Module) -> Dict[str, float]:
+    """Weight memory of each top-level component in MB (quantized weights included)"""
+    return {
+        name: sum(_state_bytes(value) for value in module.state_dict().values()) / 1024**2
+        for name, module in model.named_children()
+    }
+
+def quantize_csm_model(model: CsmForConditionalGeneration, mode: str) -> CsmForConditionalGeneration:
+    """
+    Quantize the Linear layers of the backbone and depth decoder in place
+    
+    int8 uses PyTorch dynamic quantization (int8 weights, activations
+    quantized on the fly), which targets CPU inference. int4 packs weights
+    with torchao's weight-only int4 kernels, which compute in bfloat16, so
+    the backbone and depth decoder are cast to bfloat16 first. The Mimi
+    codec is left in float32 either way.
+    
+    Args:
+        model: Loaded CSM model
+        mode: "int8" or "int4"
+        
+    Returns:
+        The same model, quantized
+    """
+    components = [name for name in QUANTIZED_COMPONENTS if hasattr(model, name)]
+    on_cuda = any(parameter.is_cuda for parameter in model.parameters())
+    
+    if mode == "int8":
+        if on_cuda:
+            raise ValueError("int8 dynamic quantization runs on CPU; load the model on CPU")
+        # Naming the components limits quantization to their Linear layers
+        torch.ao.quantization.quantize_dynamic(
+            model,
+            {name: torch.ao.quantization.default_dynamic_qconfig for name in components},
+            inplace=True
+        )
+    elif mode == "int4":
+        try:
+            from torchao.quantization import int4_weight_only, quantize_
+        except ImportError as e:
+            raise ImportError("int4 quantization requires torchao (pip install torchao)") from e
+        
+        configure_precision(model, MIXED_COMPONENTS, getattr(model, "precision", {}).get("autocast", False))
+        
+        layout_kwargs = {}
+        if not on_cuda:
+            # CPU kernels need their own packing layout
+            from torchao.dtypes import Int4CPULayout
+            layout_kwargs["layout"] = Int4CPULayout()
+        quantize_(
+            model, int4_weight_only(group_size=128, **layout_kwargs),
+            filter_fn=lambda module, fqn: isinstance(module, torch.nn.Linear) and fqn.split(".")[0] in components
+        )
+    else:
+        raise ValueError(f"Unknown quantization '{mode}', expected one of {QUANTIZATION_MODES}")
+    
+    model.quantization = mode
+    return model
+
+@contextmanager
+def _timed(phases: Dict[str, Tuple[float, float]], name: str):
+    """Record (wall-clock start, seconds) of the enclosed block under name"""
+    started = time.time()
+    try:
+        yield
+    finally:
+        phases[name] = (started, time.time() - started)
 
 def load_csm_model(model_path: str = "./models/sesame-csm-1b", 
                    config: Optional[CSMModelConfig] = None) -> Tuple[CsmForConditionalGeneration, AutoProcessor]:
     """
     Load the Sesame CSM-1B model from local path
     
+    The processor (tokenizer and feature extractor) loads on a helper
+    thread while the safetensors weights are memory-mapped into the model.
+    Each phase's (wall-clock start, seconds) is stored in ``model.load_phases``.
+    
     Args:
         model_path: Path to the locally downloaded model
         config: Model configuration parameters
@@ -33,22 +266,35 @@ def load_csm_model(model_path: str = "./models/sesame-csm-1b",
         raise FileNotFoundError(f"Model not found at: {model_path}")
     
     print(f"Loading CSM-1B model from: {model_path}")
+    started = time.perf_counter()
+    phases = {}
+    
+    def load_processor():
+        with _timed(phases, "processor"):
+            return AutoProcessor.from_pretrained(
+                model_path,
+                trust_remote_code=True,
+                local_files_only=True
+            )
     
-    # Load processor
-    processor = AutoProcessor.from_pretrained(
-        model_path,
-        trust_remote_code=True,
-        local_files_only=True
-    )
-    
-    # Load model with consistent float32 to avoid type mismatches
-    model = CsmForConditionalGeneration.from_pretrained(
-        model_path,
-        torch_dtype=torch.float32,  # Use float32 instead of float16 to avoid type mismatches
-        device_map="auto",
-        trust_remote_code=True,
-        local_files_only=True
-    )
+    # The executor is joined before returning, so no helper thread outlives
+    # the load (preload-then-fork forks right after)
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="processor-load") as executor:
+        processor_future = executor.submit(load_processor)
+        
+        # Load in float32 and cast per component below, so the codec keeps
+        # its full-precision weights
+        with _timed(phases, "weights"):
+            model = CsmForConditionalGeneration.from_pretrained(
+                model_path,
+                torch_dtype=torch.float32,
+                device_map="cpu" if config.quantization == "int8" else "auto",  # int8 kernels are CPU-only
+                use_safetensors=True,
+                low_cpu_mem_usage=True,
+                trust_remote_code=True,
+                local_files_only=True
+            )
+        processor = processor_future.result()
     
     # Configure generation settings
     model.generation_config.max_length = config.max_length
@@ -57,7 +303,37 @@ def load_csm_model(model_path: str = "./models/sesame-csm-1b",
     # Set model to evaluation mode
     model.eval()
     
-    print("CSM-1B model loaded successfully!")
+    component_dtypes = config.component_dtypes
+    autocast = config.autocast
+    if config.quantization == "int8":
+        # Dynamic int8 kernels take float32 activations, so no bf16 autocast
+        # around them; model.precision reports the effective setting
+        if component_dtypes != FP32_COMPONENTS:
+            print("int8 quantization keeps the backbone and depth decoder in float32")
+            component_dtypes = {**component_dtypes, "backbone": "float32", "depth_decoder": "float32"}
+        if autocast:
+            print("int8 quantization disables bfloat16 autocast")
+            autocast = False
+    with _timed(phases, "precision"):
+        configure_precision(model, component_dtypes, autocast)
+    
+    if config.quantization:
+        print(f"Quantizing backbone and depth decoder: {config.quantization}")
+        with _timed(phases, "quantization"):
+            quantize_csm_model(model, config.quantization)
+    
+    if config.compile:
+        from .compilation import compile_csm_model, warmup_compiled_model
+        tag = "-".join([*model.precision["components"].values(), config.quantization or "none"])
+        with _timed(phases, "compile_warmup"):
+            compile_csm_model(model, tag=tag)
+            print(f"Compiling and warming up generation: {model.compilation['mode']}")
+            warmup_compiled_model(model, processor, tag=tag)
+    
+    model.load_phases = phases
+    model.precision["load_seconds"] = time.perf_counter() - started
+    model.precision["memory_mb"] = component_memory_mb(model)
+    print(f"CSM-1B model loaded successfully! ({model.precision['components']})")
     return model, processor
 
 def get_model_info(model_path: str = "./models/sesame-csm-1b") -> dict:
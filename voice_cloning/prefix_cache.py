@@ -0,0 +1,227 @@
+"""
+KV-cache reuse for the voice prompt prefix
+
+Every CSM conversation for a named voice starts with the same turn (reference
+transcript plus reference audio). The backbone's past_key_values for that turn
+are computed once, kept in a memory-bounded LRU and copied into each new
+generation, so prefill only has to attend over the target text.
+"""
+
+import copy
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREFIX_CACHE_MB = int(os.environ.get("PREFIX_CACHE_MB", "512"))
+
+
+@dataclass
+class PrefixEntry:
+    """Cached backbone state for one voice prompt prefix"""
+    length: int
+    past_key_values: Any
+    nbytes: int
+
+
+def _iter_cache_tensors(past_key_values) -> Iterator[torch.Tensor]:
+    """Yield the key/value tensors of any transformers cache layout"""
+    if hasattr(past_key_values, "layers"):
+        for layer in past_key_values.layers:
+            for name in ("keys", "values"):
+                tensor = getattr(layer, name, None)
+                if isinstance(tensor, torch.Tensor):
+                    yield tensor
+    elif hasattr(past_key_values, "key_cache"):
+        yield from past_key_values.key_cache
+        yield from past_key_values.value_cache
+    else:
+        for layer in past_key_values:
+            for tensor in layer:
+                if isinstance(tensor, torch.Tensor):
+                    yield tensor
+
+
+def cache_nbytes(past_key_values) -> int:
+    """Memory held by a past_key_values object in bytes"""
+    return sum(t.numel() * t.element_size() for t in _iter_cache_tensors(past_key_values))
+
+
+def prefix_key(model, prefix_turn: Dict) -> Optional[str]:
+    """
+    Identify a voice prompt prefix
+
+    The key covers the speaker id, the reference transcript and the content
+    of the reference audio, so two voices sharing a file name never collide.
+
+    Args:
+        model: Loaded CsmForConditionalGeneration
+        prefix_turn: First conversation turn (transcript + reference audio)
+
+    Returns:
+        Hex digest, or None when the turn carries no reference audio
+    """
+    digest = hashlib.sha256()
+    digest.update(str(getattr(model.config, "_name_or_path", "")).encode("utf-8"))
+    digest.update(str(next(model.parameters()).dtype).encode("utf-8"))
+    digest.update(str(prefix_turn.get("role", "")).encode("utf-8"))
+
+    has_audio = False
+    for content in prefix_turn.get("content", []):
+        if content.get("type") == "text":
+            digest.update(b"text:" + content["text"].encode("utf-8"))
+        elif content.get("type") == "audio" and isinstance(content.get("path"), np.ndarray):
+            digest.update(b"audio:" + np.ascontiguousarray(content["path"], dtype=np.float32).tobytes())
+            has_audio = True
+
+    return digest.hexdigest() if has_audio else None
+
+
+class PrefixKVCache:
+    """
+    LRU cache of past_key_values for voice prompt prefixes, bounded by memory
+    """
+
+    def __init__(self, max_memory_mb: int = DEFAULT_PREFIX_CACHE_MB):
+        """
+        Args:
+            max_memory_mb: Memory budget for cached key/value tensors
+        """
+        self.max_memory_bytes = max_memory_mb * 1024 * 1024
+        self.entries: "OrderedDict[str, PrefixEntry]" = OrderedDict()
+        self.size_bytes = 0
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[PrefixEntry]:
+        """Look up a prefix and mark it as most recently used"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: PrefixEntry) -> bool:
+        """Insert a prefix, evicting least recently used entries to fit"""
+        if entry.nbytes > self.max_memory_bytes:
+            logger.debug(f"Prefix {key[:12]} ({entry.nbytes} bytes) exceeds the cache budget")
+            return False
+
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size_bytes -= old.nbytes
+            while self.entries and self.size_bytes + entry.nbytes > self.max_memory_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size_bytes -= evicted.nbytes
+                self.evictions += 1
+            self.entries[key] = entry
+            self.size_bytes += entry.nbytes
+        return True
+
+    def clear(self):
+        """Drop all cached prefixes"""
+        with self.lock:
+            self.entries.clear()
+            self.size_bytes = 0
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get cache statistics"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "size_mb": self.size_bytes / 1024**2,
+                "max_size_mb": self.max_memory_bytes / 1024**2,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _compute_prefix(self, model, prefix_embeds: torch.Tensor) -> PrefixEntry:
+        """Run the backbone over the prefix and keep its key/value cache"""
+        attention_mask = torch.ones(prefix_embeds.shape[:2], dtype=torch.long,
+                                    device=prefix_embeds.device)
+        with torch.no_grad():
+            outputs = model(inputs_embeds=prefix_embeds, attention_mask=attention_mask,
+                            use_cache=True, return_dict=True)
+        past_key_values = outputs.past_key_values
+        return PrefixEntry(
+            length=prefix_embeds.shape[1],
+            past_key_values=past_key_values,
+            nbytes=cache_nbytes(past_key_values),
+        )
+
+    def attach(self, model, processor, conversation: List[Dict], input_ids: torch.Tensor,
+               gen_inputs: Dict[str, torch.Tensor]) -> Dict[str, torch.Tensor]:
+        """
+        Add a copy of the cached prefix state to generate() keyword arguments
+
+        generate() receives the full inputs_embeds plus past_key_values and
+        only runs prefill over the positions not already in the cache.
+
+        Args:
+            model: Loaded CsmForConditionalGeneration
+            processor: Matching processor
+            conversation: Full conversation; its first turn is the prefix
+            input_ids: Tokenized full conversation of shape (1, seq_len)
+            gen_inputs: Output of prepare_cached_inputs (must hold inputs_embeds)
+
+        Returns:
+            gen_inputs, with past_key_values when a prefix applies
+        """
+        if "inputs_embeds" not in gen_inputs or len(conversation) < 2 or input_ids.shape[0] != 1:
+            return gen_inputs
+
+        key = prefix_key(model, conversation[0])
+        if key is None:
+            return gen_inputs
+
+        entry = self.get(key)
+        if entry is None:
+            prefix_ids = processor.apply_chat_template(
+                conversation[:1], tokenize=True, return_dict=True
+            )["input_ids"]
+            length = prefix_ids.shape[-1]
+            # The prefix only applies if the template tokenizes it identically
+            # at the start of the full conversation
+            if length >= input_ids.shape[1] or not torch.equal(
+                input_ids[0, :length].cpu(), torch.as_tensor(prefix_ids).view(-1).cpu()
+            ):
+                return gen_inputs
+
+            entry = self._compute_prefix(model, gen_inputs["inputs_embeds"][:, :length])
+            self.put(key, entry)
+            logger.info(f"Cached voice prompt prefix {key[:12]}: {entry.length} tokens, "
+                        f"{entry.nbytes / 1024**2:.1f} MB")
+
+        if entry.length >= gen_inputs["inputs_embeds"].shape[1]:
+            return gen_inputs
+
+        gen_inputs = dict(gen_inputs)
+        # generate() appends to the cache in place, so each call gets its own copy
+        gen_inputs["past_key_values"] = copy.deepcopy(entry.past_key_values)
+        return gen_inputs
+
+
+# Global prefix cache instance
+prefix_cache = PrefixKVCache()
+
+
+def get_prefix_cache() -> PrefixKVCache:
+    """Get the global prefix cache instance"""
+    return prefix_cache
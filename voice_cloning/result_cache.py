@@ -0,0 +1,257 @@
+"""
+Cache of finished syntheses for repeated requests
+
+Traffic repeats a lot (greetings, IVR prompts, error messages). A finished
+waveform only depends on the text, the voice, the sampling parameters and the
+model, so repeats can be answered from a memory tier or a disk tier instead
+of running CSM again. The cache is opt-in (SYNTHESIS_CACHE=1) because without
+a fixed seed sampling would otherwise give a different take every time.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESULT_DIR = os.environ.get("SYNTHESIS_CACHE_DIR", "cache/synthesis")
+
+# Statuses reported in the X-Cache response header
+CACHE_HIT = "HIT"
+CACHE_MISS = "MISS"
+CACHE_BYPASS = "BYPASS"
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form of a text for keying: NFC, collapsed whitespace"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def audio_fingerprint(audio: Optional[np.ndarray]) -> Optional[str]:
+    """SHA-256 of reference PCM, identifying a voice by content"""
+    if audio is None:
+        return None
+    return hashlib.sha256(np.ascontiguousarray(audio, dtype=np.float32).tobytes()).hexdigest()
+
+
+class SynthesisResultCache:
+    """
+    Two-tier (memory + disk) cache of synthesized waveforms with TTL
+
+    The memory tier is a size-bounded LRU; the disk tier stores .npy files
+    and uses their modification time as the entry's age, so entries written
+    by other worker processes expire on the same schedule.
+    """
+
+    PURGE_EVERY = 100
+
+    def __init__(self, enabled: bool = False, cache_dir: Optional[str] = DEFAULT_RESULT_DIR,
+                 max_memory_mb: float = 256.0, ttl_seconds: float = 86400.0):
+        """
+        Args:
+            enabled: Serve and store results at all
+            cache_dir: Directory for the disk tier (None disables it)
+            max_memory_mb: Budget of the memory tier
+            ttl_seconds: Age after which an entry is discarded
+        """
+        self.enabled = enabled
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, Tuple[np.ndarray, float]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = Lock()
+        self._puts = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    @staticmethod
+    def make_key(text: str, voice: Optional[str], temperature: float,
+                 model_version: str, seed: Optional[int] = None, **params: Any) -> str:
+        """
+        Build the key of a synthesis
+
+        Args:
+            text: Text to synthesize (normalized here)
+            voice: Voice identity (profile/sample id or reference fingerprint)
+            temperature: Sampling temperature
+            model_version: Identifies the model weights and any adapter
+            seed: Sampling seed, when the request fixes one
+            **params: Any other parameter that changes the output
+
+        Returns:
+            Hex digest identifying the synthesis
+        """
+        parts = {
+            "text": normalize_text(text),
+            "voice": voice,
+            "temperature": round(float(temperature), 4),
+            "seed": seed,
+            "model": model_version,
+            "params": params,
+        }
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def _remember(self, key: str, audio: np.ndarray, created_at: float):
+        """Insert into the memory tier (caller holds the lock)"""
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= old[0].nbytes
+        if audio.nbytes > self.max_memory_bytes:
+            return
+        while self._memory and self._memory_bytes + audio.nbytes > self.max_memory_bytes:
+            _, (evicted, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+        self._memory[key] = (audio, created_at)
+        self._memory_bytes += audio.nbytes
+
+    def _forget(self, key: str):
+        """Drop an entry from the memory tier (caller holds the lock)"""
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry[0].nbytes
+
+    def get(self, key: str) -> Tuple[Optional[np.ndarray], Optional[str]]:
+        """
+        Look up a synthesis
+
+        Returns:
+            (read-only float32 audio, tier) where tier is "memory" or
+            "disk", or (None, None) on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                audio, created_at = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return audio, "memory"
+                self._forget(key)
+                self.expired += 1
+
+        if self.cache_dir:
+            path = self._path(key)
+            try:
+                created_at = os.path.getmtime(path)
+                if now - created_at > self.ttl_seconds:
+                    os.remove(path)
+                    with self._lock:
+                        self.expired += 1
+                else:
+                    audio = np.load(path)
+                    audio.setflags(write=False)
+                    with self._lock:
+                        self._remember(key, audio, created_at)
+                        self.disk_hits += 1
+                    return audio, "disk"
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                logger.warning(f"Corrupt synthesis cache entry {key}: {e}")
+
+        with self._lock:
+            self.misses += 1
+        return None, None
+
+    def put(self, key: str, audio: np.ndarray):
+        """Store a synthesis in memory and persist it to disk"""
+        audio = np.array(audio, dtype=np.float32).reshape(-1)
+        audio.setflags(write=False)
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, audio, created_at)
+            self._puts += 1
+            purge = self._puts % self.PURGE_EVERY == 0
+
+        if self.cache_dir:
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(tmp_path, "wb") as f:
+                    np.save(f, audio)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Could not persist synthesis cache entry {key}: {e}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+        if purge:
+            self.purge_expired()
+
+    def purge_expired(self) -> int:
+        """
+        Remove expired entries from both tiers
+
+        Returns:
+            Number of disk entries removed
+        """
+        now = time.time()
+        with self._lock:
+            for key in [k for k, (_, created_at) in self._memory.items()
+                        if now - created_at > self.ttl_seconds]:
+                self._forget(key)
+
+        removed = 0
+        if self.cache_dir and os.path.isdir(self.cache_dir):
+            for entry in os.scandir(self.cache_dir):
+                try:
+                    if entry.name.endswith(".npy") and now - entry.stat().st_mtime > self.ttl_seconds:
+                        os.remove(entry.path)
+                        removed += 1
+                except OSError:
+                    continue  # Removed concurrently by another worker
+        with self._lock:
+            self.expired += removed
+        return removed
+
+    def clear(self):
+        """Drop the memory tier (disk entries expire by TTL)"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "memory_items": len(self._memory),
+                "memory_mb": self._memory_bytes / 1024**2,
+                "ttl_seconds": self.ttl_seconds,
+                "memory_hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+# Global synthesis result cache instance
+result_cache = SynthesisResultCache(
+    enabled=os.environ.get("SYNTHESIS_CACHE", "0").lower() in ("1", "true", "yes"),
+    max_memory_mb=float(os.environ.get("SYNTHESIS_CACHE_MEMORY_MB", "256")),
+    ttl_seconds=float(os.environ.get("SYNTHESIS_CACHE_TTL", "86400")),
+)
+
+
+def get_result_cache() -> SynthesisResultCache:
+    """Get the global synthesis result cache instance"""
+    return result_cache
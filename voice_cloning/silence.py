@@ -0,0 +1,234 @@
+"""
+Silence compaction for generated speech
+
+Silences longer than a limit are shortened to that limit and the cut is
+crossfaded, so pauses between words survive but long gaps do not. Detection
+works on frame RMS masks and run lengths, entirely vectorized; only the
+(few) long silent runs are visited in Python.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+DEFAULT_SILENCE_THRESHOLD = 0.01
+DEFAULT_FRAME_MS = 25.0
+DEFAULT_HOP_MS = 6.25
+DEFAULT_CROSSFADE_MS = 5.0
+
+
+def frame_rms(audio: np.ndarray, frame_length: int, hop_length: int) -> np.ndarray:
+    """
+    RMS energy of centered frames, one per hop
+
+    The signal is read once to get per-hop block energies; each frame then
+    sums the blocks its window covers.
+
+    Args:
+        audio: Mono waveform
+        frame_length: Analysis window in samples (rounded to whole hops)
+        hop_length: Distance between frame centers in samples
+
+    Returns:
+        Array of ceil(len(audio) / hop_length) RMS values
+    """
+    n = len(audio)
+    full = n // hop_length
+    blocks = audio[:full * hop_length].reshape(full, hop_length)
+    energy = np.einsum("ij,ij->i", blocks, blocks)
+    if n > full * hop_length:
+        rest = audio[full * hop_length:]
+        energy = np.append(energy, np.dot(rest, rest))
+    sizes = np.full(len(energy), hop_length)
+    sizes[full:] = n - full * hop_length
+
+    span = max(1, int(round(frame_length / hop_length)))
+    lo = np.clip(np.arange(len(energy)) - (span - 1) // 2, 0, len(energy))
+    hi = np.clip(lo + span, 0, len(energy))
+    energy_sums = np.concatenate(([0.0], np.cumsum(energy, dtype=np.float64)))
+    size_sums = np.concatenate(([0], np.cumsum(sizes)))
+    return np.sqrt((energy_sums[hi] - energy_sums[lo]) / np.maximum(size_sums[hi] - size_sums[lo], 1))
+
+
+def silent_runs(audio: np.ndarray, sample_rate: int = 24000,
+                threshold: float = DEFAULT_SILENCE_THRESHOLD) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Locate silent stretches of a waveform
+
+    Args:
+        audio: Mono waveform
+        sample_rate: Sample rate of the waveform
+        threshold: RMS level below which a frame counts as silent
+
+    Returns:
+        (starts, ends) sample offsets of each silent run, end exclusive
+    """
+    hop_length = max(1, int(sample_rate * DEFAULT_HOP_MS / 1000))
+    frame_length = max(hop_length, int(sample_rate * DEFAULT_FRAME_MS / 1000))
+    silent = frame_rms(audio, frame_length, hop_length) <= threshold
+
+    edges = np.diff(np.concatenate(([0], silent.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1) * hop_length
+    ends = np.minimum(np.flatnonzero(edges == -1) * hop_length, len(audio))
+    return starts, ends
+
+
+def _join(pieces: List[np.ndarray], crossfade: int) -> np.ndarray:
+    """Concatenate pieces, overlapping each join by a linear crossfade"""
+    if len(pieces) == 1 or crossfade <= 0:
+        return np.concatenate(pieces)
+
+    fade_in = np.linspace(0.0, 1.0, crossfade, dtype=np.float32)
+    fade_out = 1.0 - fade_in
+    out = []
+    carry = None
+    for i, piece in enumerate(pieces):
+        if carry is not None:
+            out.append(carry * fade_out + piece[:crossfade] * fade_in)
+            piece = piece[crossfade:]
+        if i < len(pieces) - 1:
+            out.append(piece[:-crossfade])
+            carry = piece[-crossfade:]
+        else:
+            out.append(piece)
+    return np.concatenate(out).astype(pieces[0].dtype, copy=False)
+
+
+def compact_silence(audio: np.ndarray, sample_rate: int = 24000,
+                    max_silence_duration: float = 0.5,
+                    threshold: float = DEFAULT_SILENCE_THRESHOLD,
+                    crossfade_ms: float = DEFAULT_CROSSFADE_MS,
+                    trim_start: bool = True, trim_end: bool = True) -> np.ndarray:
+    """
+    Shorten every silence longer than max_silence_duration to that duration
+
+    Interior silences keep their first and last halves and the cut between
+    them is crossfaded. Leading and trailing silences keep the part next to
+    the speech.
+
+    Args:
+        audio: Mono waveform
+        sample_rate: Sample rate of the waveform
+        max_silence_duration: Longest silence kept, in seconds
+        threshold: RMS level below which a frame counts as silent
+        crossfade_ms: Crossfade length at each cut
+        trim_start: Shorten a leading silence
+        trim_end: Shorten a trailing silence
+
+    Returns:
+        Compacted waveform (the input itself when nothing is cut)
+    """
+    n = len(audio)
+    keep = int(max_silence_duration * sample_rate)
+    crossfade = min(int(crossfade_ms * sample_rate / 1000), keep // 2)
+    if n == 0:
+        return audio
+
+    starts, ends = silent_runs(audio, sample_rate, threshold)
+    long_runs = (ends - starts) > keep + crossfade
+    if not long_runs.any():
+        return audio
+    if starts[0] == 0 and ends[0] == n:
+        return audio  # All silent: nothing to anchor the cut to
+
+    pieces = []
+    position = 0
+    for start, end in zip(starts[long_runs], ends[long_runs]):
+        if start == 0:
+            if trim_start:
+                position = end - keep
+        elif end == n:
+            if trim_end:
+                pieces.append(audio[position:start + keep])
+                position = n
+        else:
+            # The extra crossfade samples overlap the next piece, so the
+            # silence that remains is exactly `keep` samples long
+            head = keep // 2 + crossfade
+            pieces.append(audio[position:start + head])
+            position = end - (keep - keep // 2)
+    if position < n:
+        pieces.append(audio[position:])
+    if not pieces:
+        return audio[:0]
+
+    # Every join between two pieces is an interior cut
+    return _join(pieces, crossfade)
+
+
+class SilenceCompactor:
+    """
+    Incremental silence compaction for streamed audio chunks
+
+    A silence may straddle chunk boundaries, so each call holds back the
+    trailing silent run (plus a short anchor of preceding speech that keeps
+    the run interior on the next call) and emits everything before it. The
+    held-back silence is itself capped at the limit, so memory stays bounded
+    however long the silence lasts.
+    """
+
+    def __init__(self, sample_rate: int = 24000, max_silence_duration: float = 0.5,
+                 threshold: float = DEFAULT_SILENCE_THRESHOLD,
+                 crossfade_ms: float = DEFAULT_CROSSFADE_MS):
+        """
+        Args:
+            sample_rate: Sample rate of the stream
+            max_silence_duration: Longest silence kept, in seconds
+            threshold: RMS level below which a frame counts as silent
+            crossfade_ms: Crossfade length at each cut
+        """
+        self.sample_rate = sample_rate
+        self.max_silence_duration = max_silence_duration
+        self.threshold = threshold
+        self.crossfade_ms = crossfade_ms
+        self._keep = int(max_silence_duration * sample_rate)
+        self._crossfade = min(int(crossfade_ms * sample_rate / 1000), self._keep // 2)
+        self._anchor = int(sample_rate * DEFAULT_FRAME_MS / 1000) + self._crossfade
+        self._pending = None
+        self._started = False
+
+    def _compact(self, audio: np.ndarray, trim_end: bool) -> np.ndarray:
+        return compact_silence(audio, self.sample_rate, self.max_silence_duration, self.threshold,
+                               self.crossfade_ms, trim_start=not self._started, trim_end=trim_end)
+
+    def _cap(self, held: np.ndarray) -> np.ndarray:
+        """Shorten the held-back silence to the limit, as an interior cut"""
+        if len(held) <= self._anchor + self._keep + self._crossfade:
+            return held
+        head = self._anchor + self._keep // 2 + self._crossfade
+        return _join([held[:head], held[len(held) - (self._keep - self._keep // 2):]], self._crossfade)
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        """
+        Compact the next chunk of the stream
+
+        Args:
+            chunk: Next mono samples
+
+        Returns:
+            Samples that are final (possibly empty)
+        """
+        data = chunk if self._pending is None else np.concatenate((self._pending, chunk))
+        starts, ends = silent_runs(data, self.sample_rate, self.threshold)
+
+        hold_from = len(data)
+        if len(ends) and ends[-1] == len(data):
+            hold_from = int(starts[-1])
+        hold_from = max(hold_from - self._anchor, 0)
+
+        self._pending = self._cap(data[hold_from:])
+        if hold_from == 0:
+            return data[:0]
+
+        emitted = self._compact(data[:hold_from], trim_end=False)
+        self._started = True
+        return emitted
+
+    def flush(self) -> np.ndarray:
+        """Emit whatever is held back, trimming a trailing silence"""
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return np.zeros(0, dtype=np.float32)
+        emitted = self._compact(pending, trim_end=True)
+        self._started = False
+        return emitted
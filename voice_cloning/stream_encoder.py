@@ -0,0 +1,172 @@
+"""
+Progressive audio encoders for streamed responses
+
+A stream is one file: the container header is written once, then every
+generated piece is appended as it arrives, so players can start decoding
+from the first bytes instead of receiving back-to-back WAV files.
+"""
+
+import struct
+from typing import Dict
+
+import numpy as np
+import soundfile as sf
+
+STREAM_FORMATS: Dict[str, str] = {
+    "wav": "audio/wav",
+    # audio/L16 would mean network byte order; the samples are little-endian
+    "pcm": "audio/pcm;rate={sample_rate};encoding=s16le;channels=1",
+    "opus": "audio/ogg; codecs=opus",
+}
+
+FILE_EXTENSIONS = {"wav": "wav", "pcm": "pcm", "opus": "ogg"}
+
+# Size fields of a WAV header whose length is not known up front
+_UNKNOWN_SIZE = 0xFFFFFFFF
+
+# libsndfile >= 1.2 command controlling how often Ogg pages are flushed
+SFC_SET_OGG_PAGE_LATENCY_MS = 0x1302
+
+
+def float_to_pcm16(audio: np.ndarray) -> bytes:
+    """Convert float samples in [-1, 1] to 16-bit little-endian PCM bytes"""
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+class StreamEncoder:
+    """Raw 16-bit mono PCM; the base for the other stream formats"""
+
+    format = "pcm"
+
+    def __init__(self, sample_rate: int = 24000):
+        self.sample_rate = sample_rate
+        self.samples_written = 0
+
+    @property
+    def media_type(self) -> str:
+        return STREAM_FORMATS[self.format].format(sample_rate=self.sample_rate)
+
+    @property
+    def filename(self) -> str:
+        return f"streamed_voice.{FILE_EXTENSIONS[self.format]}"
+
+    def header(self) -> bytes:
+        """Bytes to send before the first piece"""
+        return b""
+
+    def encode(self, audio: np.ndarray) -> bytes:
+        """Encode the next piece of float32 audio"""
+        self.samples_written += len(audio)
+        return float_to_pcm16(audio)
+
+    def close(self) -> bytes:
+        """Bytes to send after the last piece"""
+        return b""
+
+
+class WAVStreamEncoder(StreamEncoder):
+    """
+    One RIFF/WAVE header followed by 16-bit PCM
+
+    The header's size fields are set to 0xFFFFFFFF, the usual convention for
+    WAV streams of unknown length, which players read up to end of stream.
+    """
+
+    format = "wav"
+
+    def header(self) -> bytes:
+        byte_rate = self.sample_rate * 2
+        return (
+            b"RIFF" + struct.pack("<I", _UNKNOWN_SIZE) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, self.sample_rate, byte_rate, 2, 16)
+            + b"data" + struct.pack("<I", _UNKNOWN_SIZE)
+        )
+
+
+class _ByteSink:
+    """Write-only file object that hands written bytes back to the caller"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+
+    def write(self, data) -> int:
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        # Ogg is written sequentially; libsndfile only queries the position
+        return self.position
+
+    def read(self, size: int = -1) -> bytes:
+        return b""
+
+    def drain(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+class OggOpusStreamEncoder(StreamEncoder):
+    """
+    Ogg/Opus pages, emitted as libsndfile completes them
+
+    libsndfile flushes a page about once a second by default; the page
+    latency is lowered so pages follow the generated pieces closely.
+    """
+
+    format = "opus"
+
+    def __init__(self, sample_rate: int = 24000, page_latency_ms: float = 80.0):
+        super().__init__(sample_rate)
+        self._sink = _ByteSink()
+        try:
+            self._file = sf.SoundFile(self._sink, mode="w", samplerate=sample_rate, channels=1,
+                                      format="OGG", subtype="OPUS")
+        except (sf.LibsndfileError, ValueError, TypeError) as e:
+            raise ValueError(f"Ogg/Opus streaming is not supported by this libsndfile build: {e}")
+
+        # Older libsndfile builds reject the command and keep their default latency
+        latency = sf._ffi.new("double*", page_latency_ms)
+        sf._snd.sf_command(self._file._file, SFC_SET_OGG_PAGE_LATENCY_MS, latency, sf._ffi.sizeof("double"))
+
+    def header(self) -> bytes:
+        return self._sink.drain()
+
+    def encode(self, audio: np.ndarray) -> bytes:
+        self.samples_written += len(audio)
+        self._file.write(np.asarray(audio, dtype=np.float32))
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._file.close()
+        return self._sink.drain()
+
+
+_ENCODERS = {
+    "pcm": StreamEncoder,
+    "wav": WAVStreamEncoder,
+    "opus": OggOpusStreamEncoder,
+}
+
+
+def create_stream_encoder(stream_format: str = "wav", sample_rate: int = 24000) -> StreamEncoder:
+    """
+    Create an encoder for a streamed response
+
+    Args:
+        stream_format: One of "wav", "pcm" or "opus"
+        sample_rate: Sample rate of the audio
+
+    Returns:
+        A fresh encoder (encoders are stateful, one per response)
+    """
+    try:
+        encoder_cls = _ENCODERS[stream_format]
+    except KeyError:
+        raise ValueError(f"Unknown stream format '{stream_format}', expected one of {sorted(_ENCODERS)}")
+    return encoder_cls(sample_rate)
@@ -0,0 +1,154 @@
+"""
+Frame-level audio streaming during CSM generation
+
+The backbone emits one Mimi codebook frame (80 ms of audio) per decoding
+step. CodecFrameStreamer receives those frames through generate()'s streamer
+hook and decodes them every few frames, so audio is available while the
+rest of the utterance is still being generated.
+"""
+
+import time
+from collections import deque
+from threading import Lock
+from typing import Callable, Deque, Dict, List, Optional
+
+import numpy as np
+import torch
+
+from transformers.generation.streamers import BaseStreamer
+
+SAMPLES_PER_FRAME = 1920  # 24kHz / 12.5 Hz Mimi frame rate
+DEFAULT_FRAMES_PER_CHUNK = 2  # 160 ms of audio per emitted chunk
+DEFAULT_CONTEXT_FRAMES = 4
+
+
+class CodecFrameStreamer(BaseStreamer):
+    """
+    generate() streamer that decodes Mimi frames incrementally
+
+    The Mimi decoder is causal, so decoding the newest frames together with a
+    few already-emitted frames of left context reproduces the full decode
+    closely; only the samples of the new frames are emitted.
+    """
+
+    def __init__(self, model, on_audio: Callable[[np.ndarray], None],
+                 frames_per_chunk: int = DEFAULT_FRAMES_PER_CHUNK,
+                 context_frames: int = DEFAULT_CONTEXT_FRAMES):
+        """
+        Args:
+            model: Loaded CsmForConditionalGeneration
+            on_audio: Called with each decoded float32 24kHz chunk
+            frames_per_chunk: Frames decoded per emitted chunk (1 frame = 80 ms)
+            context_frames: Already-emitted frames re-decoded as left context
+        """
+        self.model = model
+        self.on_audio = on_audio
+        self.frames_per_chunk = max(1, frames_per_chunk)
+        self.context_frames = max(0, context_frames)
+        self.eos_token_id = model.config.codebook_eos_token_id
+        self.frames: List[torch.Tensor] = []
+        self.emitted = 0
+        self.finished = False
+        self._prompt_seen = False
+
+    def put(self, value: torch.Tensor):
+        """Receive the next codebook frame of shape (1, num_codebooks)"""
+        if not self._prompt_seen:
+            # generate() first pushes the prompt ids
+            self._prompt_seen = True
+            return
+        if self.finished:
+            return
+
+        frame = value.reshape(-1)
+        if bool((frame[:-1] == self.eos_token_id).all()):
+            self.finished = True
+            return
+
+        self.frames.append(frame)
+        if len(self.frames) - self.emitted >= self.frames_per_chunk:
+            self._emit()
+
+    def end(self):
+        """Decode whatever frames are left"""
+        if len(self.frames) > self.emitted:
+            self._emit()
+
+    def _emit(self):
+        start = max(0, self.emitted - self.context_frames)
+        codes = torch.stack(self.frames[start:], dim=0)  # (frames, codebooks)
+        device = next(self.model.codec_model.parameters()).device
+        with torch.no_grad():
+            decoded = self.model.codec_model.decode(codes.transpose(0, 1).unsqueeze(0).to(device))
+        audio = decoded.audio_values[0, 0]
+
+        skip = (self.emitted - start) * SAMPLES_PER_FRAME
+        new = (len(self.frames) - self.emitted) * SAMPLES_PER_FRAME
+        self.emitted = len(self.frames)
+        self.on_audio(audio[skip:skip + new].detach().float().cpu().numpy())
+
+
+class StreamMetrics:
+    """Time-to-first-byte and inter-chunk gap statistics for streamed responses"""
+
+    def __init__(self, history_size: int = 1000):
+        self.streams = 0
+        self.ttfb: Deque[float] = deque(maxlen=history_size)
+        self.gaps: Deque[float] = deque(maxlen=history_size * 10)
+        self.lock = Lock()
+
+    def record_stream(self, started_at: float, chunk_times: List[float]):
+        """
+        Record one finished stream
+
+        Args:
+            started_at: time.perf_counter() when the request started
+            chunk_times: time.perf_counter() at each yielded chunk
+        """
+        if not chunk_times:
+            return
+        with self.lock:
+            self.streams += 1
+            self.ttfb.append(chunk_times[0] - started_at)
+            self.gaps.extend(np.diff(chunk_times).tolist())
+
+    @staticmethod
+    def _summary(values) -> Dict[str, float]:
+        if not values:
+            return {"avg": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        ms = np.array(values) * 1000
+        return {
+            "avg": float(np.mean(ms)),
+            "p50": float(np.percentile(ms, 50)),
+            "p95": float(np.percentile(ms, 95)),
+            "max": float(np.max(ms)),
+        }
+
+    def get_stats(self) -> Dict[str, object]:
+        """Get streaming statistics"""
+        with self.lock:
+            return {
+                "streams": self.streams,
+                "ttfb_ms": self._summary(list(self.ttfb)),
+                "inter_chunk_gap_ms": self._summary(list(self.gaps)),
+            }
+
+
+class StreamTimer:
+    """Collects yield timestamps for one streamed response"""
+
+    def __init__(self, metrics: Optional[StreamMetrics] = None):
+        self.metrics = metrics
+        self.started_at = time.perf_counter()
+        self.chunk_times: List[float] = []
+        self.audio_seconds = 0.0
+
+    def mark(self, audio_seconds: float = 0.0):
+        """Call right before yielding a chunk (with the audio it carries)"""
+        self.chunk_times.append(time.perf_counter())
+        self.audio_seconds += audio_seconds
+
+    def finish(self):
+        """Record the stream once it is done"""
+        if self.metrics is not None:
+            self.metrics.record_stream(self.started_at, self.chunk_times)
@@ -6,13 +6,23 @@ Based on: https://github.com/isaiahbjork/csm-voice-cloning
 import torch
 import torchaudio
 import os
+import time
 import numpy as np
-from typing import Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 from .models import load_csm_model, CSMModelConfig
 from .watermarking import apply_watermark
-import librosa
+from .codec_cache import (codec_version, get_codec_cache, load_reference_pcm,
+                          normalize_reference_pcm, prepare_cached_inputs)
+from .prefix_cache import get_prefix_cache
+from .streaming import DEFAULT_CONTEXT_FRAMES, DEFAULT_FRAMES_PER_CHUNK, CodecFrameStreamer
 import soundfile as sf
 
+# Mimi emits 12.5 codec frames per second of 24kHz audio
+CODEC_FRAME_RATE = 12.5
+SAMPLES_PER_FRAME = 1920
+# Rough speaking rate used to predict generated frames from text length
+CHARS_PER_SECOND = 14.0
+
 class VoiceCloner:
     """
     Voice Cloning class using Sesame CSM-1B model
@@ -20,7 +30,11 @@ class VoiceCloner:
     
     def __init__(self, model_path: str = "./models/sesame-csm-1b", 
                  max_length: int = 2048, 
-                 device: Optional[str] = None):
+                 device: Optional[str] = None,
+                 quantization: Optional[str] = None,
+                 component_dtypes: Optional[Dict[str, str]] = None,
+                 autocast: bool = False,
+                 compile: bool = False):
         """
         Initialize the VoiceCloner
         
@@ -28,20 +42,68 @@ class VoiceCloner:
             model_path: Path to the CSM-1B model
             max_length: Maximum sequence length for the model
             device: Device to run on (auto-detected if None)
+            quantization: None, "int8" or "int4" for the backbone and depth decoder
+                (int8 is CPU-only and runs on the CPU whatever the device)
+            component_dtypes: dtype per component ("backbone", "depth_decoder", "codec")
+            autocast: Generate under bfloat16 autocast (codec excluded)
+            compile: Compiled, static-cache generation (warmed up on load)
         """
         self.model_path = model_path
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
-        self.config = CSMModelConfig(max_length=max_length)
+        if quantization == "int8" and self.device != "cpu":
+            # The int8 weights are loaded on the CPU; inputs have to follow them
+            print(f"int8 quantization runs on CPU; ignoring device {self.device}")
+            self.device = "cpu"
+        self.config = CSMModelConfig(max_length=max_length, quantization=quantization,
+                                     component_dtypes=component_dtypes, autocast=autocast,
+                                     compile=compile)
         
         # Initialize model and processor
         self.model = None
         self.processor = None
+        self.codec_cache = get_codec_cache()
         self.load_model()
+        # Prefix reuse hands generate a dynamic KV cache, which the static
+        # cache of compiled generation replaces
+        compiled = getattr(self.model, "compilation", {}).get("status") in ("compiled", "partial")
+        self.prefix_cache = None if compiled else get_prefix_cache()
+        
+    @classmethod
+    def from_loaded(cls, model, processor, device: str = "cpu") -> "VoiceCloner":
+        """
+        Wrap an already loaded model and processor (e.g. a benchmark model)
         
+        Args:
+            model: Loaded CsmForConditionalGeneration
+            processor: Its processor
+            device: Device the model is on
+            
+        Returns:
+            A VoiceCloner using them as-is
+        """
+        cloner = cls.__new__(cls)
+        cloner.model_path = getattr(model, "name_or_path", "")
+        cloner.device = device
+        cloner.config = CSMModelConfig()
+        cloner.model, cloner.processor = model, processor
+        cloner.codec_cache = get_codec_cache()
+        cloner.prefix_cache = get_prefix_cache()
+        return cloner
+    
     def load_model(self):
         """Load the CSM model and processor"""
         print(f"Loading model on device: {self.device}")
         self.model, self.processor = load_csm_model(self.model_path, self.config)
+    
+    def model_version(self) -> str:
+        """Identify the weights, precision and quantization that produce audio"""
+        precision = getattr(self.model, "precision", {})
+        return ":".join([
+            codec_version(self.model, self.processor),
+            "/".join(precision.get("components", {}).values()) or str(self.model.dtype),
+            "autocast" if precision.get("autocast") else "native",
+            self.config.quantization or "none",
+        ])
         
     def preprocess_audio(self, audio_path: str, target_sample_rate: int = 24000) -> np.ndarray:
         """
@@ -52,23 +114,27 @@ class VoiceCloner:
             target_sample_rate: Target sample rate for processing (CSM uses 24kHz)
             
         Returns:
-            Preprocessed audio array as float32
+            Preprocessed audio array as float32 (read-only, shared between calls)
         """
-        # Load audio
-        audio, sr = librosa.load(audio_path, sr=None, dtype=np.float32)
-        
-        # Resample if necessary - CSM expects 24kHz
-        if sr != target_sample_rate:
-            audio = librosa.resample(audio, orig_sr=sr, target_sr=target_sample_rate)
-        
-        # Normalize audio
-        if np.max(np.abs(audio)) > 0:
-            audio = audio / np.max(np.abs(audio))
-        
-        # Ensure float32 type
-        audio = audio.astype(np.float32)
+        # Decoding, resampling and normalization are memoized per file
+        return load_reference_pcm(audio_path, target_sample_rate)
+    
+    def prepare_reference_audio(self, audio, sample_rate: int = 24000,
+                                target_sample_rate: int = 24000) -> np.ndarray:
+        """
+        Preprocess in-memory reference audio (numpy array or tensor)
         
-        return audio
+        Args:
+            audio: Mono or multi-channel waveform
+            sample_rate: Sample rate of the waveform
+            target_sample_rate: Target sample rate for processing (CSM uses 24kHz)
+            
+        Returns:
+            Preprocessed audio array as float32
+        """
+        if isinstance(audio, torch.Tensor):
+            audio = audio.detach().float().cpu().numpy()
+        return normalize_reference_pcm(audio, sample_rate, target_sample_rate)
         
     def create_conversation(self, context_text: str, target_text: str, 
                            context_audio: Optional[np.ndarray] = None, 
@@ -133,35 +199,260 @@ class VoiceCloner:
             print(f"Loading reference audio: {context_audio_path}")
             context_audio = self.preprocess_audio(context_audio_path)
         
-        # Create conversation in CSM format
+        # Generate with the model
+        print("Generating audio...")
+        audio = self.synthesize(target_text, context_text, context_audio,
+                                temperature=temperature, speaker_id=speaker_id)
+        
+        # Save the generated audio
+        sf.write(output_path, audio.numpy(), 24000)
+        
+        print(f"Audio generated and saved to: {output_path}")
+        return output_path
+    
+    def synthesize(self, target_text: str, context_text: str = "",
+                   context_audio=None, temperature: float = 0.7,
+                   speaker_id: str = "0") -> torch.Tensor:
+        """
+        Generate speech entirely in memory
+        
+        Args:
+            target_text: Text to synthesize
+            context_text: Transcription of the reference voice
+            context_audio: Preprocessed 24kHz reference audio (numpy or tensor)
+            temperature: Generation temperature
+            speaker_id: Speaker ID for the conversation
+            
+        Returns:
+            Generated 24kHz float32 waveform as a 1-D CPU tensor
+        """
+        if isinstance(context_audio, torch.Tensor):
+            context_audio = context_audio.detach().float().cpu().numpy().reshape(-1)
+        
         conversation = self.create_conversation(
             context_text, target_text, context_audio, speaker_id
         )
+        audio = self.generate_conversations([conversation], temperature)[0]
+        return torch.from_numpy(audio)
+    
+    def generate_batch(self, context_text: str, target_texts: List[str],
+                       context_audio: Optional[np.ndarray] = None,
+                       temperature: float = 0.7,
+                       speaker_id: str = "0") -> List[np.ndarray]:
+        """
+        Generate several texts with one batched model.generate call
         
-        # Process inputs using the CSM processor
-        inputs = self.processor.apply_chat_template(
-            conversation,
-            tokenize=True,
-            return_dict=True,
-        ).to(self.device)
+        Each conversation is embedded separately (reusing cached codec tokens),
+        left-padded into one batch and decoded together; the audio is split
+        back out by row.
+        
+        Args:
+            context_text: Transcription of the reference voice
+            target_texts: Texts to synthesize
+            context_audio: Preprocessed reference audio (24kHz float32)
+            temperature: Generation temperature
+            speaker_id: Speaker ID for the conversation
+            
+        Returns:
+            One float32 24kHz audio array per target text
+        """
+        conversations = [
+            self.create_conversation(context_text, target_text, context_audio, speaker_id)
+            for target_text in target_texts
+        ]
+        return self.generate_conversations(conversations, temperature)
+    
+    def generate_conversations(self, conversations: List[list],
+                               temperature: float = 0.7) -> List[np.ndarray]:
+        """
+        Generate audio for several CSM conversations in one batch
         
-        # Set generation parameters
-        gen_kwargs = {
-            "output_audio": True,
-            "temperature": temperature,
-            "do_sample": True if temperature > 0 else False,
+        Rows may use different voices; they only have to share the
+        generation parameters.
+        
+        Args:
+            conversations: Conversations in CSM format
+            temperature: Generation temperature
+            
+        Returns:
+            One float32 24kHz audio array per conversation
+        """
+        return self.generate_conversations_timed(conversations, temperature)[0]
+    
+    def generate_conversations_timed(self, conversations: List[list],
+                                     temperature: float = 0.7) -> Tuple[List[np.ndarray], Dict[str, float]]:
+        """
+        generate_conversations that also reports where the time went
+        
+        The timings travel back with the audio, so they reach the API
+        process from forked inference processes too.
+        
+        Args:
+            conversations: Conversations in CSM format
+            temperature: Generation temperature
+            
+        Returns:
+            (one float32 24kHz audio array per conversation,
+             seconds spent in "tokenize", "generate" and "decode")
+        """
+        started = time.perf_counter()
+        # A shared KV prefix can't be reused across left-padded rows, so only
+        # single-row calls attach it
+        prefix_cache = self.prefix_cache if len(conversations) == 1 else None
+        batch_inputs = [
+            prepare_cached_inputs(
+                self.model, self.processor, conversation, self.device,
+                self.codec_cache, prefix_cache
+            )
+            for conversation in conversations
+        ]
+        tokenized = time.perf_counter()
+        
+        if len(batch_inputs) == 1 or any("inputs_embeds" not in i for i in batch_inputs):
+            # Nothing to pad without the embedding path; run rows one by one
+            codes = [self._generate_codes(inputs, temperature)[0] for inputs in batch_inputs]
+        else:
+            codes = self._generate_padded(batch_inputs, temperature)
+        generated = time.perf_counter()
+        
+        audio = [self._decode_codes(row) for row in codes]
+        timings = {
+            "tokenize": tokenized - started,
+            "generate": generated - tokenized,
+            "decode": time.perf_counter() - generated,
         }
+        return audio, timings
+    
+    def _generate_padded(self, batch_inputs: List[dict], temperature: float) -> torch.Tensor:
+        """Left-pad prepared conversations into one batch and generate their codes"""
+        embeds = [inputs["inputs_embeds"][0] for inputs in batch_inputs]
+        masks = [inputs["attention_mask"][0] for inputs in batch_inputs]
+        
+        # Left padding keeps every row's last prompt token aligned for decoding
+        max_len = max(e.shape[0] for e in embeds)
+        inputs_embeds = embeds[0].new_zeros((len(embeds), max_len, embeds[0].shape[-1]))
+        attention_mask = masks[0].new_zeros((len(masks), max_len))
+        for row, (embed, mask) in enumerate(zip(embeds, masks)):
+            inputs_embeds[row, max_len - embed.shape[0]:] = embed
+            attention_mask[row, max_len - mask.shape[0]:] = mask
+        
+        print(f"Generating batch of {len(batch_inputs)} conversations...")
+        return self._generate_codes(
+            {"inputs_embeds": inputs_embeds, "attention_mask": attention_mask}, temperature
+        )
+    
+    def stream_conversation(self, conversation: list, emit: Callable[[np.ndarray], None],
+                            temperature: float = 0.7,
+                            frames_per_chunk: int = DEFAULT_FRAMES_PER_CHUNK,
+                            context_frames: int = DEFAULT_CONTEXT_FRAMES) -> int:
+        """
+        Generate one conversation, delivering audio while it is generated
         
-        # Generate with the model
-        print("Generating audio...")
+        Mimi frames are decoded every frames_per_chunk steps (80 ms each)
+        instead of once the whole utterance is done.
+        
+        Args:
+            conversation: Conversation in CSM format
+            emit: Called on this thread with each float32 24kHz chunk
+            temperature: Generation temperature
+            frames_per_chunk: Frames per emitted chunk
+            context_frames: Left context frames re-decoded for continuity
+            
+        Returns:
+            Number of frames generated
+        """
+        inputs = prepare_cached_inputs(
+            self.model, self.processor, conversation, self.device,
+            self.codec_cache, self.prefix_cache
+        )
+        streamer = CodecFrameStreamer(self.model, emit, frames_per_chunk, context_frames)
         with torch.no_grad():
-            audio = self.model.generate(**inputs, **gen_kwargs)
+            self.model.generate(
+                **inputs,
+                streamer=streamer,
+                output_audio=False,
+                temperature=temperature,
+                do_sample=temperature > 0,
+            )
+        return len(streamer.frames)
+    
+    def _generate_codes(self, inputs: dict, temperature: float) -> torch.Tensor:
+        """Generate Mimi codes (batch, frames, codebooks) for prepared inputs"""
+        with torch.no_grad():
+            return self.model.generate(
+                **inputs,
+                output_audio=False,
+                temperature=temperature,
+                do_sample=temperature > 0,
+            )
+    
+    def _decode_codes(self, codes: torch.Tensor) -> np.ndarray:
+        """Decode one row of codes to audio, cut at EOS as generate(output_audio=True) does"""
+        eos = (codes == self.model.config.codebook_eos_token_id).all(dim=-1).nonzero()
+        if eos.numel():
+            codes = codes[:eos.min()]
+        with torch.no_grad():
+            decoded = self.model.codec_model.decode(codes.transpose(0, 1).unsqueeze(0))
+        return self._audio_to_numpy(decoded.audio_values[0, 0])
+    
+    @staticmethod
+    def _audio_to_numpy(audio) -> np.ndarray:
+        """Convert one decoded audio row to float32 numpy"""
+        if isinstance(audio, torch.Tensor):
+            return audio.detach().float().cpu().numpy().reshape(-1)
+        return np.asarray(audio, dtype=np.float32).reshape(-1)
+    
+    def kv_bytes_per_token(self) -> float:
+        """
+        Estimate memory needed per sequence position during generation
         
-        # Save the generated audio
-        self.processor.save_audio(audio, output_path)
+        Covers the backbone KV cache plus working activations, from the
+        loaded model's config and dtype.
         
-        print(f"Audio generated and saved to: {output_path}")
-        return output_path
+        Returns:
+            Bytes per token of one sequence
+        """
+        config = self.model.config
+        backbone = getattr(self.model, "backbone_model", self.model)
+        element_size = next(backbone.parameters()).element_size()
+        num_layers = getattr(config, "num_hidden_layers", 16)
+        num_heads = getattr(config, "num_attention_heads", 32)
+        num_kv_heads = getattr(config, "num_key_value_heads", None) or num_heads
+        hidden_size = getattr(config, "hidden_size", 2048)
+        head_dim = getattr(config, "head_dim", None) or hidden_size // num_heads
+        
+        kv_cache = 2 * num_layers * num_kv_heads * head_dim * element_size
+        activations = 4 * hidden_size * element_size
+        return float(kv_cache + activations)
+    
+    @staticmethod
+    def estimate_sequence_length(text: str, context_audio: Optional[np.ndarray] = None,
+                                 context_text: str = "") -> int:
+        """
+        Predict the total sequence length (prompt + generated frames) for a text
+        
+        Args:
+            text: Text to synthesize
+            context_audio: Reference audio at 24kHz, if any
+            context_text: Reference transcript
+            
+        Returns:
+            Estimated number of backbone positions
+        """
+        prompt_tokens = (len(text) + len(context_text)) // 3 + 8
+        if context_audio is not None:
+            prompt_tokens += int(np.ceil(len(context_audio) / SAMPLES_PER_FRAME))
+        return prompt_tokens + VoiceCloner.estimate_audio_frames(text)
+    
+    @staticmethod
+    def estimate_audio_frames(text: str) -> int:
+        """
+        Predict how many Mimi frames generating a text takes
+        
+        Generation runs one backbone step per frame, so this is the cost of
+        the text on the model.
+        """
+        return int(len(text) / CHARS_PER_SECOND * CODEC_FRAME_RATE) + 1
         
     def clone_voice_from_file(self, reference_audio: str, reference_transcript: str,
                              target_text: str, output_path: str = "cloned_voice.wav",
@@ -5,7 +5,6 @@ Based on: https://github.com/isaiahbjork/csm-voice-cloning
 
 import numpy as np
 import soundfile as sf
-import librosa
 from typing import Optional
 
 def apply_watermark(audio_path: str, output_path: str, 
@@ -23,6 +22,8 @@ def apply_watermark(audio_path: str, output_path: str,
     Returns:
         Path to the watermarked audio file
     """
+    import librosa  # Imported where used: slow to import, kept off the startup path
+    
     # Load audio
     audio, sr = librosa.load(audio_path, sr=None)
     
@@ -61,6 +62,7 @@ def _apply_spectral_watermark(audio: np.ndarray, watermark_text: str) -> np.ndar
     Returns:
         Watermarked audio array
     """
+    import librosa
     # Convert to frequency domain
     stft = librosa.stft(audio)
     magnitude = np.abs(stft)
@@ -118,6 +120,7 @@ def detect_watermark(audio_path: str, expected_watermark: str = None) -> dict:
     Returns:
         Dictionary with detection results
     """
+    import librosa
     try:
         # Load audio
         audio, sr = librosa.load(audio_path, sr=None)
@@ -155,6 +158,7 @@ def _check_for_pattern(audio: np.ndarray, watermark_text: str) -> bool:
     Returns:
         Boolean indicating if pattern might be present
     """
+    import librosa
     # This is a simplified detection - in practice, this would be more sophisticated
     watermark_hash = hash(watermark_text) % 1000
     
@@ -181,6 +185,7 @@ def remove_watermark(audio_path: str, output_path: str, method: str = "denoise")
     Returns:
         Path to cleaned audio file
     """
+    import librosa
     # Load audio
     audio, sr = librosa.load(audio_path, sr=None)
     
@@ -201,6 +206,7 @@ def remove_watermark(audio_path: str, output_path: str, method: str = "denoise")
 
 def _denoise_audio(audio: np.ndarray) -> np.ndarray:
     """Simple denoising using spectral subtraction"""
+    import librosa
     # Convert to frequency domain
     stft = librosa.stft(audio)
     magnitude = np.abs(stft)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Admission control for the Voice Cloning API
+Requests reserve their estimated memory footprint (KV cache plus audio
+buffers) and a concurrency slot before any work starts. What doesn't fit
+waits in a bounded FIFO queue for a limited time; past that the request is
+turned away with 429 and a Retry-After hint instead of piling onto the model.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+from voice_cloning_metrics import (ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTIONS,
+                                   ADMISSION_RESERVED_BYTES, ADMISSION_WAIT)
+
+logger = logging.getLogger(__name__)
+
+# Reasons a request is rejected
+QUEUE_FULL = "queue_full"
+WAIT_TIMEOUT = "wait_timeout"
+
+
+class AdmissionRejected(Exception):
+    """The server is at capacity; the client should retry after retry_after seconds"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Server busy ({reason}), retry later")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass
+class AdmissionTicket:
+    """One request's reservation"""
+    cost_bytes: int
+    enqueued_at: float  # time.perf_counter()
+    admitted_at: Optional[float] = None
+    released: bool = False
+    future: Optional[asyncio.Future] = None
+
+
+class AdmissionController:
+    """
+    Admits requests against a concurrency limit and a memory budget
+
+    Waiters are served in arrival order, so a large request at the head of
+    the queue is not starved by small ones behind it. A request larger than
+    the whole budget is admitted alone once nothing else is running. All
+    methods run on the event loop.
+    """
+
+    def __init__(self, max_concurrent: int = 4, memory_budget_bytes: Optional[int] = None,
+                 max_queue: int = 16, max_wait_s: float = 30.0):
+        """
+        Args:
+            max_concurrent: Requests running at once
+            memory_budget_bytes: Estimated bytes admitted requests may hold
+                (None: only the concurrency limit applies)
+            max_queue: Requests allowed to wait; beyond that they are rejected
+            max_wait_s: Longest a request waits before it is rejected
+        """
+        self.max_concurrent = max_concurrent
+        self.memory_budget_bytes = memory_budget_bytes
+        self.max_queue = max_queue
+        self.max_wait_s = max_wait_s
+        self.in_flight = 0
+        self.reserved_bytes = 0
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {QUEUE_FULL: 0, WAIT_TIMEOUT: 0}
+        self._queue: Deque[AdmissionTicket] = deque()
+        # Moving average of how long admitted requests hold their slot
+        self._hold_seconds: Optional[float] = None
+
+    def set_limits(self, max_concurrent: Optional[int] = None,
+                   memory_budget_bytes: Optional[int] = None):
+        """Change the limits; raised limits admit waiting requests right away"""
+        if max_concurrent is not None:
+            self.max_concurrent = max(1, max_concurrent)
+        if memory_budget_bytes is not None:
+            self.memory_budget_bytes = memory_budget_bytes
+        self._dispatch()
+
+    def _fits(self, cost_bytes: int) -> bool:
+        if self.in_flight >= self.max_concurrent:
+            return False
+        if self.memory_budget_bytes is None or self.in_flight == 0:
+            return True
+        return self.reserved_bytes + cost_bytes <= self.memory_budget_bytes
+
+    def _admit(self, ticket: AdmissionTicket):
+        ticket.admitted_at = time.perf_counter()
+        self.in_flight += 1
+        self.reserved_bytes += ticket.cost_bytes
+        self.admitted += 1
+        ADMISSION_WAIT.observe(ticket.admitted_at - ticket.enqueued_at)
+        self._update_gauges()
+
+    def _dispatch(self):
+        """Admit waiters from the head of the queue while they fit"""
+        while self._queue and self._fits(self._queue[0].cost_bytes):
+            ticket = self._queue.popleft()
+            self._admit(ticket)
+            ticket.future.set_result(True)
+        self._update_gauges()
+
+    def _update_gauges(self):
+        ADMISSION_QUEUE_DEPTH.set(len(self._queue))
+        ADMISSION_IN_FLIGHT.set(self.in_flight)
+        ADMISSION_RESERVED_BYTES.set(self.reserved_bytes)
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead of a new request should have drained"""
+        hold = self._hold_seconds if self._hold_seconds is not None else 5.0
+        return max(1, math.ceil(hold * (len(self._queue) + 1) / max(self.max_concurrent, 1)))
+
+    def _reject(self, reason: str):
+        self.rejected[reason] += 1
+        ADMISSION_REJECTIONS.inc(reason=reason)
+        retry_after = self.retry_after()
+        logger.warning(f"Admission rejected ({reason}): {self.in_flight} running, "
+                       f"{len(self._queue)} queued, retry after {retry_after}s")
+        raise AdmissionRejected(reason, retry_after)
+
+    async def acquire(self, cost_bytes: int) -> AdmissionTicket:
+        """
+        Reserve a slot and cost_bytes of the memory budget
+
+        Raises:
+            AdmissionRejected: The queue is full, or the wait timed out
+        """
+        ticket = AdmissionTicket(cost_bytes, time.perf_counter())
+        if not self._queue and self._fits(cost_bytes):
+            self._admit(ticket)
+            return ticket
+        if len(self._queue) >= self.max_queue:
+            self._reject(QUEUE_FULL)
+
+        ticket.future = asyncio.get_running_loop().create_future()
+        self._queue.append(ticket)
+        self._update_gauges()
+        try:
+            # asyncio.wait leaves the future alone on timeout or cancellation
+            await asyncio.wait({ticket.future}, timeout=self.max_wait_s)
+        except asyncio.CancelledError:
+            # Client went away while queued (or right as it was admitted)
+            self._withdraw(ticket)
+            raise
+        if not ticket.future.done():
+            self._withdraw(ticket)
+            self._reject(WAIT_TIMEOUT)
+        return ticket
+
+    def _withdraw(self, ticket: AdmissionTicket):
+        if ticket.admitted_at is not None:
+            self.release(ticket)
+        else:
+            self._queue.remove(ticket)
+            self._dispatch()
+
+    def release(self, ticket: AdmissionTicket):
+        """Give back a ticket's slot and memory (safe to call more than once)"""
+        if ticket.released or ticket.admitted_at is None:
+            return
+        ticket.released = True
+        self.in_flight -= 1
+        self.reserved_bytes -= ticket.cost_bytes
+        held = time.perf_counter() - ticket.admitted_at
+        self._hold_seconds = held if self._hold_seconds is None else 0.8 * self._hold_seconds + 0.2 * held
+        self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, cost_bytes: int) -> AsyncIterator[AdmissionTicket]:
+        """Hold an admission for the enclosed block"""
+        ticket = await self.acquire(cost_bytes)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get admission statistics"""
+        return {
+            "max_concurrent": self.max_concurrent,
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._queue),
+            "max_queue": self.max_queue,
+            "max_wait_s": self.max_wait_s,
+            "reserved_mb": self.reserved_bytes / 1024**2,
+            "memory_budget_mb": (self.memory_budget_bytes / 1024**2
+                                 if self.memory_budget_bytes is not None else None),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "avg_hold_seconds": self._hold_seconds,
+        }
@@ -3,38 +3,60 @@
 Robust Voice Cloning API with streaming, performance monitoring, and advanced features
 """
 
+import time
+
+# Imported first so the import phase below covers every heavy dependency
+from voice_cloning_startup import get_startup_timeline
+
+_imports_started = time.time()
+
 import asyncio
-import io
+import math
 import os
-import time
 import uuid
 from contextlib import asynccontextmanager
 from dataclasses import dataclass, asdict
+from pathlib import Path
 from typing import List, Optional, AsyncGenerator, Dict, Any
 import logging
 
 import numpy as np
 import torch
-import torchaudio
-import librosa
 import soundfile as sf
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Depends, Form
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Depends, Form, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, Field
 import uvicorn
+from functools import cached_property
 from threading import Lock
 import psutil
-import GPUtil
 
 # Import voice cloning components
-from voice_cloning.voice_clone import VoiceCloner
+from voice_cloning.voice_clone import CHARS_PER_SECOND, CODEC_FRAME_RATE, VoiceCloner
+from voice_cloning.codec_cache import get_codec_cache, get_reference_store
+from voice_cloning.compilation import compile_errors
+from voice_cloning.prefix_cache import get_prefix_cache
+from voice_cloning.result_cache import CACHE_BYPASS, CACHE_HIT, CACHE_MISS, audio_fingerprint, get_result_cache
+from voice_cloning.silence import SilenceCompactor, compact_silence
+from voice_cloning.streaming import StreamMetrics, StreamTimer
+from voice_cloning.stream_encoder import StreamEncoder, create_stream_encoder
+from voice_cloning_admission import AdmissionController, AdmissionRejected, AdmissionTicket
+from voice_cloning_metrics import (AUDIO_SECONDS, CONTENT_TYPE as METRICS_CONTENT_TYPE, REQUEST_LATENCY,
+                                   STAGE_LATENCY, STREAM_FIRST_AUDIO, get_metrics_registry)
 from voice_cloning_optimizer import get_optimizer, optimize_model_loading, OptimizationConfig
 from voice_manager import get_voice_manager, initialize_voices, VoiceProfile
+from voice_cloning_scheduler import BULK, INTERACTIVE, STANDARD, InferenceScheduler
+from voice_cloning_tracing import get_tracer
+from voice_cloning_worker import AudioWorkerPool, get_inference_worker
+from voice_cloning_prefork import preload_and_fork
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+get_startup_timeline().record("imports", _imports_started, time.time() - _imports_started)
+
 @dataclass
 class PerformanceMetrics:
     """Performance metrics for monitoring"""
@@ -63,6 +85,9 @@ class VoiceCloneRequest(BaseModel):
     streaming: bool = Field(False, description="Enable streaming response")
     max_silence_duration: float = Field(0.5, description="Max silence duration in seconds")
     use_optimization: bool = Field(True, description="Enable automatic optimization")
+    stream_frames: int = Field(2, ge=0, le=12, description="Streaming: send audio every N Mimi frames (80 ms each) while generating; 0 sends whole text chunks")
+    stream_format: str = Field("wav", description="Streaming container: wav (one header), pcm (raw 16-bit) or opus (Ogg/Opus)")
+    priority: str = Field(STANDARD, description="Scheduling class: interactive (streaming), standard or bulk (batch jobs)")
 
 class BatchVoiceCloneRequest(BaseModel):
     """Batch voice cloning request"""
@@ -132,40 +157,11 @@ class AudioProcessor:
     def remove_silence(audio: np.ndarray, sample_rate: int = 24000, 
                       max_silence_duration: float = 0.5) -> np.ndarray:
         """
-        Remove excessive silence from audio with optimization
+        Shorten silences longer than max_silence_duration (crossfading the cuts)
         """
-        optimizer = get_optimizer()
-        optimizer.profiler.start_profile("silence_removal")
-        
-        try:
-            # Detect silence using librosa
-            silence_threshold = 0.01  # Adjust based on your needs
-            frame_length = int(sample_rate * 0.025)  # 25ms frames
-            hop_length = frame_length // 4
-            
-            # Calculate RMS energy
-            rms = librosa.feature.rms(y=audio, frame_length=frame_length, hop_length=hop_length)[0]
-            
-            # Find non-silent frames
-            non_silent_frames = rms > silence_threshold
-            
-            # Convert frame indices to sample indices
-            non_silent_samples = []
-            for i, is_sound in enumerate(non_silent_frames):
-                start_sample = i * hop_length
-                end_sample = min(start_sample + hop_length, len(audio))
-                if is_sound:
-                    non_silent_samples.extend(range(start_sample, end_sample))
-            
-            if not non_silent_samples:
-                return audio  # Return original if all silent
-            
-            # Extract non-silent audio
-            cleaned_audio = audio[non_silent_samples]
-            
-            return cleaned_audio
-        finally:
-            optimizer.profiler.end_profile()
+        with get_tracer().span("silence_removal"):
+            # Shorten silences longer than the limit instead of cutting every quiet frame
+            return compact_silence(audio, sample_rate, max_silence_duration)
     
     @staticmethod
     def normalize_audio(audio: np.ndarray, target_lufs: float = -23.0) -> np.ndarray:
@@ -204,52 +200,333 @@ class VoiceCloneService:
     
     def __init__(self):
         self.cloner: Optional[VoiceCloner] = None
-        self.reference_audio_cache: Dict[str, np.ndarray] = {}
+        self.reference_store = get_reference_store()
+        self.result_cache = get_result_cache()
         self.lock = Lock()
         self.chunker = TextChunker()
         self.audio_processor = AudioProcessor()
         self.monitor = PerformanceMonitor()
-        self.optimizer = get_optimizer()
-        self.voice_manager = get_voice_manager()
+        self.startup = get_startup_timeline()
+        self.warmup_state: Dict[str, Any] = {"status": "pending", "voices": {}, "seconds": None, "error": None}
+        # The model lives on the inference thread; CPU-bound audio work runs
+        # on a pool so the event loop stays free for other requests
+        self.worker = get_inference_worker()
+        self.stream_metrics = StreamMetrics()
+        self.tracer = get_tracer()
+        # Values kept elsewhere are read when /metrics is scraped
+        self.metrics = get_metrics_registry()
+        self.metrics.set_collector("voice_cache_lookups_total", self._cache_lookups)
+        self.metrics.set_collector("voice_scheduler_queue_depth", lambda: len(self.scheduler.pending))
+        self.metrics.set_collector("process_resident_memory_bytes", lambda: psutil.Process().memory_info().rss)
+    
+    # Built on first use rather than at import: the optimizer touches the
+    # CUDA runtime and the voice manager the voices directory
+    @cached_property
+    def optimizer(self):
+        return get_optimizer()
+    
+    @cached_property
+    def voice_manager(self):
+        return get_voice_manager()
+    
+    @cached_property
+    def audio_pool(self) -> AudioWorkerPool:
+        return AudioWorkerPool(self.optimizer.config.audio_preprocessing_threads)
+    
+    @cached_property
+    def scheduler(self) -> InferenceScheduler:
+        return InferenceScheduler(
+            cloner_getter=lambda: self.cloner,
+            batch_size_fn=self._scheduler_batch_size,
+            batch_window_ms=self.optimizer.config.batch_window_ms,
+            worker=self.worker,
+            aging_s=self.optimizer.config.scheduler_aging_s
+        )
+    
+    @cached_property
+    def admission(self) -> AdmissionController:
+        config = self.optimizer.config
+        return AdmissionController(
+            max_concurrent=config.max_concurrent_requests,
+            max_queue=config.admission_queue_size,
+            max_wait_s=config.admission_max_wait_s
+        )
+        
+    def get_precision_report(self) -> Dict[str, Any]:
+        """Loaded component dtypes with measured weight memory, load time and speed"""
+        report = dict(getattr(self.cloner.model, "precision", {})) if self.cloner else {}
+        history = self.optimizer.adaptive_chunker.performance_history
+        report["measured"] = {
+            "process_rss_mb": psutil.Process().memory_info().rss / 1024**2,
+            "realtime_factor": float(np.mean(history)) if history else None,
+            "requests_measured": len(history)
+        }
+        return report
+    
+    def get_compilation_report(self) -> Dict[str, Any]:
+        """Compile status, warmup time and components that fell back to eager"""
+        model = self.cloner.model if self.cloner else None
+        report = dict(getattr(model, "compilation", {"enabled": False}))
+        if model is not None and report.get("enabled"):
+            report["fallbacks"] = compile_errors(model)
+        return report
+    
+    def _cache_lookups(self) -> Dict[tuple, float]:
+        """Hit and miss counters of every cache, keyed by (cache, result)"""
+        result = self.result_cache.get_stats()
+        codec = get_codec_cache().get_stats()
+        reference = self.reference_store.get_stats()
+        prefix = get_prefix_cache().get_stats()
+        return {
+            ("result", "hit"): result["memory_hits"] + result["disk_hits"],
+            ("result", "miss"): result["misses"],
+            ("codec", "hit"): codec["memory_hits"] + codec["disk_hits"],
+            ("codec", "miss"): codec["misses"],
+            ("reference", "hit"): reference["hits"],
+            ("reference", "miss"): reference["misses"],
+            ("prefix", "hit"): prefix["hits"],
+            ("prefix", "miss"): prefix["misses"],
+        }
+    
+    @staticmethod
+    def _record_request(endpoint: str, started: float, success: bool, audio_seconds: float = 0.0):
+        """Request latency and audio produced, for /metrics"""
+        REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint=endpoint,
+                                status="success" if success else "error")
+        if audio_seconds:
+            AUDIO_SECONDS.inc(audio_seconds, endpoint=endpoint)
+    
+    def preload_and_fork(self, num_workers: int, threads_per_worker: Optional[int] = None):
+        """
+        Load the model once and serve it from forked CPU inference processes
         
+        Must run before the server starts (no event loop or helper threads
+        yet). The scheduler then keeps one batch in flight per process.
+        """
+        with self.startup.phase("optimizer"):
+            precision = self.optimizer.get_precision_settings("cpu")
+        with self.startup.phase("preload_and_fork"):
+            self.cloner, self.worker = preload_and_fork(
+                lambda: self._load_cloner(device="cpu", compile=self.optimizer.config.enable_torch_compile,
+                                          **precision),
+                num_workers, threads_per_worker
+            )
+        self.scheduler.worker = self.worker
+    
+    def _load_cloner(self, **kwargs) -> VoiceCloner:
+        """Build the VoiceCloner, recording its load phases in the startup timeline"""
+        with self.startup.phase("model_load"):
+            cloner = VoiceCloner(model_path="./models/sesame-csm-1b",
+                                 quantization=self.optimizer.config.quantization, **kwargs)
+        for name, (started, seconds) in getattr(cloner.model, "load_phases", {}).items():
+            self.startup.record(name, started, seconds, parent="model_load")
+        return cloner
+    
+    def _initialize_voices(self):
+        with self.startup.phase("voice_profiles"):
+            return initialize_voices()
+    
     async def initialize(self):
         """Initialize the voice cloner with optimization"""
         logger.info("Initializing Voice Cloning Service with optimization...")
         
-        with self.lock:
-            if self.cloner is None:
-                # Get optimization settings for model loading
+        # Voice profiles decode on the audio pool while the weights load
+        voices = asyncio.ensure_future(self.audio_pool.run(self._initialize_voices))
+        
+        if self.cloner is None:
+            # Get optimization settings for model loading
+            with self.startup.phase("optimizer"):
                 optimization_settings = optimize_model_loading("./models/sesame-csm-1b")
-                
-                # Initialize cloner with optimized settings
-                self.cloner = VoiceCloner(
-                    model_path="./models/sesame-csm-1b",
-                    device=optimization_settings["device"]
-                )
-                
-                # Initialize voice profiles
-                initialize_voices()
-                
+                device = str(optimization_settings["device"])
+                if self.optimizer.config.quantization == "int8" and device != "cpu":
+                    # Dynamic int8 kernels are CPU-only: weights and inputs stay on the CPU
+                    logger.warning(f"int8 quantization runs on CPU; ignoring device {device}")
+                    device = "cpu"
+                precision = self.optimizer.get_precision_settings(device)
+            
+            # Initialize cloner with optimized settings, on the thread that owns the model
+            self.cloner = await self.worker.submit(
+                self._load_cloner,
+                device=device,
+                compile=optimization_settings["compile_model"],
+                **precision
+            )
+        
+        await voices
         logger.info("Voice Cloning Service initialized successfully with optimization")
     
-    def _resolve_voice_reference(self, request: VoiceCloneRequest, reference_audio: Optional[UploadFile] = None) -> tuple:
-        """Resolve voice reference from voice name or uploaded file"""
+    @property
+    def ready(self) -> bool:
+        """
+        Warmup finished (or disabled) and every inference thread or process
+        is alive: the replica can take traffic
+        """
+        return self.warmup_state["status"] in ("done", "disabled") and self.worker.healthy
+    
+    async def warmup(self):
+        """
+        Run a short synthesis per registered voice before reporting ready
+        
+        Goes through the normal scheduler path, so besides the allocator,
+        kernel selection and first touch of the weights it fills the
+        reference PCM, codec token and prefix KV caches of every voice.
+        With prefork workers each voice is synthesized once per process.
+        """
+        config = self.optimizer.config
+        if not config.enable_warmup:
+            self.warmup_state["status"] = "disabled"
+            self._set_admission_budget()
+            self.startup.mark_ready()
+            return
+        
+        self.warmup_state["status"] = "running"
+        voices = config.warmup_voices if config.warmup_voices is not None else self.voice_manager.list_voices()
+        started = time.perf_counter()
+        try:
+            with self.startup.phase("warmup"):
+                # Without registered voices, warm up text-only generation
+                for name in list(voices) or [None]:
+                    voice_started = time.perf_counter()
+                    context_audio, context_text = None, ""
+                    if name is not None:
+                        profile = self.voice_manager.get_voice(name)
+                        if profile is not None:
+                            context_audio = await self.audio_pool.run(self.voice_manager.get_reference_audio, name)
+                        if context_audio is None:
+                            logger.warning(f"Warmup skipping voice '{name}': no reference audio")
+                            continue
+                        context_text = profile.transcription
+                    
+                    conversation = self.cloner.create_conversation(context_text, config.warmup_text, context_audio)
+                    sequence_length = self.cloner.estimate_sequence_length(config.warmup_text, context_audio, context_text)
+                    # Idle prefork processes are handed out round-robin
+                    for _ in range(self.worker.capacity):
+                        await self.scheduler.generate([conversation], 0.7, [sequence_length])
+                    self.warmup_state["voices"][name or "<text-only>"] = time.perf_counter() - voice_started
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.warmup_state.update(status="failed", error=str(e))
+            logger.error(f"Warmup failed, replica stays not ready: {e}")
+            return
+        
+        self.warmup_state.update(status="done", seconds=time.perf_counter() - started)
+        self._set_admission_budget()
+        self.startup.mark_ready()
+        logger.info(f"Warmup finished in {self.warmup_state['seconds']:.1f}s "
+                    f"({len(self.warmup_state['voices'])} voices)")
+    
+    def _set_admission_budget(self):
+        """Budget admitted requests against the memory still free once the model is warm"""
+        free_bytes = self.optimizer.gpu_optimizer.get_available_memory()
+        budget = int(free_bytes * self.optimizer.config.admission_memory_fraction)
+        self.admission.set_limits(memory_budget_bytes=budget)
+        logger.info(f"Admission memory budget {budget / 1024**2:.0f} MB "
+                    f"(max {self.admission.max_concurrent} concurrent requests)")
+    
+    def _admission_cost(self, request: VoiceCloneRequest,
+                        reference_audio: Optional[UploadFile] = None) -> int:
+        """
+        Estimate the bytes a request holds while it runs
+        
+        Every chunk's sequence keeps the voice prompt in its KV cache, since
+        the scheduler may decode all chunks of the request in one batch. On
+        top come the generated audio, its post-processed and encoded copies
+        and the decoded reference, as float32 at 24kHz.
+        """
+        if self.cloner is None:
+            return 0
+        
+        prompt_seconds, prompt_chars = 0.0, len(request.reference_text or "")
+        profile = self.voice_manager.get_voice(request.voice_name) if request.voice_name else None
+        if profile is not None:
+            prompt_seconds = profile.duration or 10.0
+            prompt_chars = prompt_chars or len(profile.transcription)
+        elif reference_audio is not None:
+            # Upload size as 16-bit 24kHz PCM; unknown sizes count as a typical 10 s clip
+            size = getattr(reference_audio, "size", None)
+            prompt_seconds = size / (2 * 24000) if size else 10.0
+        
+        chunk_size = request.chunk_size or self.optimizer.config.optimal_chunk_sizes["medium_memory"]
+        chunks = max(1, math.ceil(len(request.text) / chunk_size))
+        audio_seconds = len(request.text) / CHARS_PER_SECOND
+        prompt_positions = int(prompt_seconds * CODEC_FRAME_RATE) + prompt_chars // 3 + 8
+        positions = chunks * (prompt_positions + 1) + len(request.text) // 3 + int(audio_seconds * CODEC_FRAME_RATE)
+        
+        kv_bytes = positions * self.cloner.kv_bytes_per_token()
+        audio_bytes = (3 * audio_seconds + prompt_seconds) * 24000 * 4
+        return int(kv_bytes + audio_bytes)
+    
+    async def admit(self, request: VoiceCloneRequest,
+                    reference_audio: Optional[UploadFile] = None) -> AdmissionTicket:
+        """
+        Reserve capacity for a request before any work starts
+        
+        Raises:
+            AdmissionRejected: The server is at capacity (answered with 429)
+        """
+        cost = self._admission_cost(request, reference_audio)
+        with self.tracer.span("admission", cost_mb=cost / 1024**2):
+            return await self.admission.acquire(cost)
+    
+    async def release_admission(self, ticket: AdmissionTicket):
+        """Release a ticket (a coroutine, so Starlette runs it on the event loop)"""
+        self.admission.release(ticket)
+    
+    async def _resolve_voice_reference(self, request: VoiceCloneRequest,
+                                       reference_audio: Optional[UploadFile] = None) -> tuple:
+        """
+        Resolve the voice reference from a voice name or an uploaded file
+        
+        Named voices come from the voice manager's decoded PCM. Uploads are
+        content-addressed: the reference store memory-maps a clip decoded by
+        any worker before and only decodes (straight from the upload) on a miss.
+        
+        Returns:
+            (voice_profile, context_audio, reference_text, cache_hit)
+        """
+        with self.tracer.span("resolve_reference", voice=request.voice_name):
+            return await self._resolve_reference(request, reference_audio)
+    
+    async def _resolve_reference(self, request: VoiceCloneRequest,
+                                 reference_audio: Optional[UploadFile] = None) -> tuple:
         voice_profile = None
-        reference_audio_path = None
+        context_audio = None
+        cache_hit = False
         reference_text = request.reference_text
         
         # Check if voice_name is provided
         if request.voice_name:
             voice_profile = self.voice_manager.get_voice(request.voice_name)
             if voice_profile:
-                reference_audio_path = voice_profile.audio_path
+                context_audio = await self.audio_pool.run(
+                    self.voice_manager.get_reference_audio, request.voice_name
+                )
                 if not reference_text:  # Use profile transcription if not provided
                     reference_text = voice_profile.transcription
                 logger.info(f"Using voice profile '{request.voice_name}': {voice_profile.audio_path}")
             else:
                 logger.warning(f"Voice profile '{request.voice_name}' not found, falling back to uploaded audio")
         
-        return voice_profile, reference_audio_path, reference_text
+        # If no voice profile, use the uploaded audio
+        if context_audio is None and reference_audio:
+            reference_audio_key = await self.audio_pool.run(
+                self.reference_store.hash_upload, reference_audio.file
+            )
+            
+            context_audio = self.optimizer.memory_manager.get_cached_audio(reference_audio_key)
+            cache_hit = context_audio is not None
+            if context_audio is None:
+                context_audio, cache_hit = await self.audio_pool.run(
+                    self.reference_store.load_upload, reference_audio_key, reference_audio.file
+                )
+                self.optimizer.memory_manager.cache_audio_data(reference_audio_key, context_audio)
+        
+        # The reference only conditions generation together with its transcript
+        if not reference_text:
+            context_audio = None
+        
+        return voice_profile, context_audio, reference_text, cache_hit
 
     def _get_performance_metrics(self, start_time: float, text: str, 
                                 audio_duration: float, chunk_count: int, 
@@ -274,13 +551,116 @@ class VoiceCloneService:
             optimization_stats=optimization_stats
         )
     
+    async def _result_cache_key(self, request: VoiceCloneRequest, context_audio: Optional[np.ndarray],
+                                reference_text: Optional[str], chunk_size: Optional[int]) -> str:
+        """
+        Key of a finished synthesis: text, voice content, sampling and post-processing
+        
+        chunk_size is the size the client asked for; auto-tuned sizes drift
+        over time and would otherwise split the cache for identical requests.
+        """
+        voice = await self.audio_pool.run(audio_fingerprint, context_audio)
+        return self.result_cache.make_key(
+            request.text, voice, request.temperature,
+            model_version=self.cloner.model_version(),
+            reference_text=reference_text if voice else None,
+            speaker_id=request.speaker_id,
+            chunk_size=chunk_size,
+            remove_silence=request.remove_silence,
+            max_silence_duration=request.max_silence_duration
+        )
+    
+    def _compact_chunks(self, chunks: List[np.ndarray], request: VoiceCloneRequest,
+                        sr: int = 24000) -> List[np.ndarray]:
+        """
+        Silence compaction over a request's generated chunks, in order
+        
+        One compactor carries state across chunks, so a pause spanning a
+        chunk boundary is capped once, as in the concatenated audio.
+        """
+        with self.tracer.span("postprocess"), STAGE_LATENCY.time(stage="postprocess"):
+            with self.tracer.span("silence_removal"):
+                compactor = SilenceCompactor(sr, request.max_silence_duration)
+                pieces = [compactor.process(audio) for audio in chunks]
+                pieces.append(compactor.flush())
+            return [piece for piece in pieces if len(piece)]
+    
+    def _postprocess_audio(self, audio: np.ndarray) -> np.ndarray:
+        """Loudness normalization for one piece of a request's audio"""
+        with self.tracer.span("postprocess"), STAGE_LATENCY.time(stage="postprocess"):
+            return self.audio_processor.normalize_audio(audio)
+    
+    def _encode_wav(self, path: str, audio: np.ndarray, sr: int = 24000):
+        """Write the finished request audio as WAV"""
+        with self.tracer.span("encode"), STAGE_LATENCY.time(stage="encode"):
+            sf.write(path, audio, sr)
+    
+    def _encode_stream_chunk(self, encoder: StreamEncoder, audio: np.ndarray) -> bytes:
+        """Encode one streamed piece in the response's container"""
+        with self.tracer.span("encode"), STAGE_LATENCY.time(stage="encode"):
+            return encoder.encode(audio)
+    
+    def _postprocess_stream_chunk(self, audio: np.ndarray,
+                                  compactor: Optional[SilenceCompactor]) -> np.ndarray:
+        """Incremental silence compaction and normalization for one streamed chunk"""
+        with self.tracer.span("postprocess"), STAGE_LATENCY.time(stage="postprocess"):
+            if compactor is not None:
+                audio = compactor.process(audio)
+            return self.audio_processor.normalize_audio(audio) if len(audio) else audio
+    
+    def _scheduler_batch_size(self, sequence_length: int) -> int:
+        """Largest batch of sequence_length positions that fits in measured free memory"""
+        if self.cloner is None:
+            return 1
+        return self.optimizer.get_batch_size(sequence_length, self.cloner.kv_bytes_per_token())
+    
+    def _submit_chunks(self, chunks: List[str], context_audio: Optional[np.ndarray],
+                       context_text: Optional[str], request: VoiceCloneRequest) -> List[asyncio.Future]:
+        """Queue text chunks on the shared inference scheduler, costed by predicted audio frames"""
+        conversations = [
+            self.cloner.create_conversation(context_text or "", chunk, context_audio, request.speaker_id)
+            for chunk in chunks
+        ]
+        sequence_lengths = [
+            self.cloner.estimate_sequence_length(chunk, context_audio, context_text or "")
+            for chunk in chunks
+        ]
+        costs = [self.cloner.estimate_audio_frames(chunk) for chunk in chunks]
+        return self.scheduler.submit(conversations, request.temperature, sequence_lengths,
+                                     request.priority, costs)
+    
+    async def _generate_chunks(self, chunks: List[str], context_audio: Optional[np.ndarray],
+                               context_text: Optional[str], request: VoiceCloneRequest) -> List[np.ndarray]:
+        """Generate 24kHz audio for text chunks, batched with other in-flight requests"""
+        return list(await asyncio.gather(
+            *self._submit_chunks(chunks, context_audio, context_text, request)
+        ))
+    
     async def clone_voice(self, request: VoiceCloneRequest, 
                          reference_audio: Optional[UploadFile] = None) -> VoiceCloneResponse:
         """
         Clone voice with advanced features and optimization
+        
+        The request is traced; processing_info["trace_id"] names its trace
+        in /debug/traces. It waits for admission first and raises
+        AdmissionRejected when the server is at capacity.
         """
+        with self.tracer.trace("clone-voice", text_chars=len(request.text),
+                               voice=request.voice_name) as trace:
+            ticket = await self.admit(request, reference_audio)
+            try:
+                result = await self._clone_voice(request, reference_audio)
+            finally:
+                self.admission.release(ticket)
+        result.processing_info["trace_id"] = trace.trace_id
+        return result
+    
+    async def _clone_voice(self, request: VoiceCloneRequest,
+                           reference_audio: Optional[UploadFile] = None) -> VoiceCloneResponse:
         start_time = time.time()
+        request_started = time.perf_counter()
         optimization_info = {}
+        requested_chunk_size = request.chunk_size
         
         try:
             # Get optimization settings
@@ -300,92 +680,80 @@ class VoiceCloneService:
             else:
                 request.chunk_size = request.chunk_size or 100
             
-            # Resolve voice reference (from profile or uploaded file)
-            voice_profile, reference_audio_path, reference_text = self._resolve_voice_reference(request, reference_audio)
-            reference_audio_key = None
-            
-            # If no voice profile, handle uploaded audio
-            if not voice_profile and reference_audio:
-                # Create cache key for reference audio
-                reference_audio_key = f"ref_{hash(await reference_audio.read())}"
-                await reference_audio.seek(0)  # Reset file pointer
-                
-                # Check cache first
-                cached_audio = self.optimizer.memory_manager.get_cached_audio(reference_audio_key)
-                
-                if cached_audio is None:
-                    # Save uploaded file temporarily
-                    reference_audio_path = f"temp_reference_{uuid.uuid4().hex}.wav"
-                    with open(reference_audio_path, "wb") as f:
-                        content = await reference_audio.read()
-                        f.write(content)
-                    
-                    # Cache the audio for future use
-                    audio_data, _ = librosa.load(reference_audio_path, sr=24000)
-                    self.optimizer.memory_manager.cache_audio_data(reference_audio_key, audio_data)
-                else:
-                    # Use cached audio
-                    reference_audio_path = f"temp_cached_{uuid.uuid4().hex}.wav"
-                    sf.write(reference_audio_path, cached_audio, 24000)
+            # Resolve voice reference (from profile or uploaded file); the
+            # reference is decoded once and shared by every chunk
+            voice_profile, context_audio, reference_text, cache_hit = await self._resolve_voice_reference(
+                request, reference_audio
+            )
             
             # Chunk the text for processing
-            chunks = self.chunker.chunk_text(request.text, request.chunk_size)
+            with self.tracer.span("chunking"), STAGE_LATENCY.time(stage="chunking"):
+                chunks = self.chunker.chunk_text(request.text, request.chunk_size)
             logger.info(f"Text chunked into {len(chunks)} pieces (chunk_size: {request.chunk_size})")
             
-            # Generate audio for each chunk
+            # Repeated requests are answered from the result cache (opt-in)
+            result_key = None
+            result_cache_status = CACHE_BYPASS
+            if self.result_cache.enabled:
+                result_key = await self._result_cache_key(
+                    request, context_audio, reference_text, requested_chunk_size
+                )
+                cached_audio, tier = await self.audio_pool.run(self.result_cache.get, result_key)
+                result_cache_status = CACHE_MISS
+                if cached_audio is not None:
+                    output_path = f"outputs/cloned_voice_{uuid.uuid4().hex}.wav"
+                    os.makedirs("outputs", exist_ok=True)
+                    await self.audio_pool.run(sf.write, output_path, cached_audio, 24000)
+                    total_duration = len(cached_audio) / 24000
+                    logger.info(f"Result cache hit ({tier}): {total_duration:.1f}s of audio")
+                    
+                    metrics = self._get_performance_metrics(start_time, request.text, total_duration, len(chunks))
+                    self._record_request("clone-voice", request_started, True, total_duration)
+                    return VoiceCloneResponse(
+                        success=True,
+                        audio_url=output_path,
+                        performance_metrics=asdict(metrics),
+                        processing_info={
+                            "chunks_processed": 0,
+                            "total_audio_duration": total_duration,
+                            "voice_profile_used": voice_profile.name if voice_profile else None,
+                            "cache_hit": cache_hit,
+                            "result_cache": CACHE_HIT,
+                            "result_cache_tier": tier
+                        },
+                        optimization_info=optimization_info
+                    )
+            
+            # Generate audio for all chunks; the scheduler batches them together
+            # (and with chunks from other in-flight requests)
             audio_segments = []
             total_duration = 0.0
+            sr = 24000
             
-            for i, chunk in enumerate(chunks):
-                chunk_start_time = time.time()
-                logger.info(f"Processing chunk {i+1}/{len(chunks)}: {chunk[:50]}...")
-                
-                # Generate audio for this chunk
-                chunk_output = f"temp_chunk_{uuid.uuid4().hex}.wav"
-                
-                if reference_audio_path and reference_text:
-                    # Use voice cloning
-                    self.cloner.clone_voice_from_file(
-                        reference_audio=reference_audio_path,
-                        reference_transcript=reference_text,
-                        target_text=chunk,
-                        output_path=chunk_output,
-                        speaker_id=request.speaker_id
-                    )
-                else:
-                    # Use simple TTS
-                    self.cloner.simple_generate(
-                        text=chunk,
-                        output_path=chunk_output,
-                        speaker_id=request.speaker_id
-                    )
-                
-                # Load and process the generated audio
-                audio, sr = librosa.load(chunk_output, sr=24000)
-                
-                # Remove silence if requested
-                if request.remove_silence:
-                    audio = self.audio_processor.remove_silence(
-                        audio, sr, request.max_silence_duration
-                    )
-                
-                # Normalize audio
-                audio = self.audio_processor.normalize_audio(audio)
-                
+            generation_start_time = time.time()
+            with self.tracer.span("generate_chunks", chunks=len(chunks)):
+                generated = await self._generate_chunks(chunks, context_audio, reference_text, request)
+            chunk_processing_time = (time.time() - generation_start_time) / len(chunks)
+            
+            # Silences are compacted across chunk boundaries, then every piece
+            # is normalized on the audio pool
+            if request.remove_silence:
+                generated = await self.audio_pool.run(self._compact_chunks, generated, request, sr)
+            processed = await asyncio.gather(*[
+                self.audio_pool.run(self._postprocess_audio, audio)
+                for audio in generated
+            ])
+            
+            for audio in processed:
                 audio_segments.append(audio)
                 chunk_duration = len(audio) / sr
                 total_duration += chunk_duration
                 
                 # Record performance for optimization
-                chunk_processing_time = time.time() - chunk_start_time
                 if request.use_optimization:
                     self.optimizer.record_request_performance(
                         request.chunk_size, chunk_processing_time, chunk_duration
                     )
-                
-                # Clean up temporary file
-                if os.path.exists(chunk_output):
-                    os.remove(chunk_output)
             
             # Concatenate all audio segments
             if audio_segments:
@@ -396,17 +764,16 @@ class VoiceCloneService:
             # Save final audio
             output_path = f"outputs/cloned_voice_{uuid.uuid4().hex}.wav"
             os.makedirs("outputs", exist_ok=True)
-            sf.write(output_path, final_audio, 24000)
+            await self.audio_pool.run(self._encode_wav, output_path, final_audio)
+            if result_key is not None:
+                await self.audio_pool.run(self.result_cache.put, result_key, final_audio)
             
             # Calculate performance metrics
             optimization_stats = self.optimizer.get_optimization_stats() if request.use_optimization else None
             metrics = self._get_performance_metrics(
                 start_time, request.text, total_duration, len(chunks), optimization_stats
             )
-            
-            # Clean up temporary reference audio (only if not from voice profile)
-            if not voice_profile and reference_audio_path and os.path.exists(reference_audio_path) and "temp_" in reference_audio_path:
-                os.remove(reference_audio_path)
+            self._record_request("clone-voice", request_started, True, total_duration)
             
             return VoiceCloneResponse(
                 success=True,
@@ -419,13 +786,15 @@ class VoiceCloneService:
                     "silence_removed": request.remove_silence,
                     "optimization_enabled": request.use_optimization,
                     "voice_profile_used": voice_profile.name if voice_profile else None,
-                    "cache_hit": reference_audio_key and self.optimizer.memory_manager.get_cached_audio(reference_audio_key) is not None
+                    "cache_hit": cache_hit,
+                    "result_cache": result_cache_status
                 },
                 optimization_info=optimization_info
             )
             
         except Exception as e:
             logger.error(f"Error in voice cloning: {str(e)}")
+            self._record_request("clone-voice", request_started, False)
             return VoiceCloneResponse(
                 success=False,
                 error=str(e),
@@ -435,11 +804,40 @@ class VoiceCloneService:
             )
     
     async def stream_voice_clone(self, request: VoiceCloneRequest, 
-                                reference_audio: Optional[UploadFile] = None) -> AsyncGenerator[bytes, None]:
+                                reference_audio: Optional[UploadFile] = None,
+                                encoder: Optional[StreamEncoder] = None,
+                                trace_id: Optional[str] = None,
+                                ticket: Optional[AdmissionTicket] = None) -> AsyncGenerator[bytes, None]:
         """
         Stream voice cloning with real-time chunks and optimization
+        
+        The response is a single stream in the encoder's format: one header,
+        then every piece appended as it is generated. The request is traced
+        under trace_id (a new id when not given). ticket is an admission
+        taken before the response started; without one the stream waits
+        for admission itself. Either way it is released when the stream ends.
         """
+        with self.tracer.trace("clone-voice-stream", trace_id, text_chars=len(request.text),
+                               voice=request.voice_name, stream_frames=request.stream_frames):
+            if ticket is None:
+                ticket = await self.admit(request, reference_audio)
+            try:
+                async for data in self._stream_voice_clone(request, reference_audio, encoder):
+                    yield data
+            finally:
+                self.admission.release(ticket)
+    
+    async def _stream_voice_clone(self, request: VoiceCloneRequest,
+                                  reference_audio: Optional[UploadFile] = None,
+                                  encoder: Optional[StreamEncoder] = None) -> AsyncGenerator[bytes, None]:
+        timer = StreamTimer(self.stream_metrics)
+        encoder = encoder or create_stream_encoder(request.stream_format)
+        completed = False
         try:
+            header = encoder.header()
+            if header:
+                yield header
+            
             # Get optimization settings for streaming
             if request.use_optimization:
                 optimization_settings = self.optimizer.optimize_for_request(
@@ -450,77 +848,125 @@ class VoiceCloneService:
             else:
                 request.chunk_size = request.chunk_size or 75  # Default for streaming
             
-            # Process reference audio if provided
-            reference_audio_path = None
-            if reference_audio:
-                reference_audio_path = f"temp_reference_{uuid.uuid4().hex}.wav"
-                with open(reference_audio_path, "wb") as f:
-                    content = await reference_audio.read()
-                    f.write(content)
+            # Resolve the reference in memory (voice profile or uploaded file)
+            _, context_audio, reference_text, _ = await self._resolve_voice_reference(
+                request, reference_audio
+            )
             
             # Chunk the text
-            chunks = self.chunker.chunk_text(request.text, request.chunk_size)
+            with self.tracer.span("chunking"), STAGE_LATENCY.time(stage="chunking"):
+                chunks = self.chunker.chunk_text(request.text, request.chunk_size)
             
-            for i, chunk in enumerate(chunks):
+            if request.stream_frames > 0:
+                async for data in self._stream_frames(chunks, context_audio, reference_text, request,
+                                                      encoder, timer):
+                    yield data
+                trailer = encoder.close()
+                if trailer:
+                    yield trailer
+                completed = True
+                return
+            
+            # The first chunk is queued alone to keep time-to-first-audio low;
+            # the rest are queued as soon as it is done so they batch together
+            sr = 24000
+            # Silences can straddle chunk boundaries, so compaction carries state across chunks
+            compactor = SilenceCompactor(sr, request.max_silence_duration) if request.remove_silence else None
+            pending = self._submit_chunks(chunks[:1], context_audio, reference_text, request)
+            remaining = chunks[1:]
+            
+            for i in range(len(chunks)):
                 chunk_start_time = time.time()
                 logger.info(f"Streaming chunk {i+1}/{len(chunks)}")
                 
-                # Generate audio for this chunk
-                chunk_output = f"temp_stream_chunk_{uuid.uuid4().hex}.wav"
-                
-                if reference_audio_path and request.reference_text:
-                    self.cloner.clone_voice_from_file(
-                        reference_audio=reference_audio_path,
-                        reference_transcript=request.reference_text,
-                        target_text=chunk,
-                        output_path=chunk_output,
-                        speaker_id=request.speaker_id
-                    )
-                else:
-                    self.cloner.simple_generate(
-                        text=chunk,
-                        output_path=chunk_output,
-                        speaker_id=request.speaker_id
-                    )
-                
-                # Process and stream the audio
-                audio, sr = librosa.load(chunk_output, sr=24000)
-                
-                if request.remove_silence:
-                    audio = self.audio_processor.remove_silence(audio, sr)
+                with self.tracer.span("wait_chunk", chunk=i):
+                    audio = await pending.pop(0)
+                if remaining:
+                    pending += self._submit_chunks(remaining, context_audio, reference_text, request)
+                    remaining = []
+                chunk_processing_time = time.time() - chunk_start_time
                 
-                audio = self.audio_processor.normalize_audio(audio)
+                audio = await self.audio_pool.run(self._postprocess_stream_chunk, audio, compactor)
+                if len(audio) == 0:
+                    continue  # Held back as a possibly longer silence
                 
                 # Record performance for streaming optimization
-                chunk_processing_time = time.time() - chunk_start_time
                 chunk_duration = len(audio) / sr
                 if request.use_optimization:
                     self.optimizer.record_request_performance(
                         request.chunk_size, chunk_processing_time, chunk_duration
                     )
                 
-                # Convert to bytes for streaming
-                buffer = io.BytesIO()
-                sf.write(buffer, audio, sr, format='WAV')
-                buffer.seek(0)
-                
-                yield buffer.read()
-                
-                # Clean up
-                if os.path.exists(chunk_output):
-                    os.remove(chunk_output)
+                # Append to the stream
+                data = await self.audio_pool.run(self._encode_stream_chunk, encoder, audio)
+                timer.mark(chunk_duration)
+                yield data
                 
                 # Adaptive delay based on performance
                 delay = 0.05 if chunk_processing_time < chunk_duration else 0.1
                 await asyncio.sleep(delay)
             
-            # Clean up reference audio
-            if reference_audio_path and os.path.exists(reference_audio_path):
-                os.remove(reference_audio_path)
-                
+            if compactor is not None:
+                tail = compactor.flush()
+                if len(tail):
+                    data = await self.audio_pool.run(self._encode_stream_chunk, encoder,
+                                                     self.audio_processor.normalize_audio(tail))
+                    timer.mark(len(tail) / sr)
+                    yield data
+            
+            trailer = encoder.close()
+            if trailer:
+                yield trailer
+            completed = True
+
         except Exception as e:
             logger.error(f"Error in streaming: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
+        finally:
+            timer.finish()
+            if timer.chunk_times:
+                STREAM_FIRST_AUDIO.observe(timer.chunk_times[0] - timer.started_at)
+            self._record_request("clone-voice-stream", timer.started_at, completed, timer.audio_seconds)
+    
+    async def _stream_frames(self, chunks: List[str], context_audio: Optional[np.ndarray],
+                             context_text: Optional[str], request: VoiceCloneRequest,
+                             encoder: StreamEncoder, timer: StreamTimer) -> AsyncGenerator[bytes, None]:
+        """
+        Stream audio while the model generates, every request.stream_frames frames
+        
+        Text chunks are queued on the scheduler one after another, each
+        running alone on a worker slot once its turn comes; each decoded
+        piece is sent as soon as it arrives.
+        """
+        sr = 24000
+        compactor = SilenceCompactor(sr, request.max_silence_duration) if request.remove_silence else None
+        
+        for i, chunk in enumerate(chunks):
+            logger.info(f"Streaming chunk {i+1}/{len(chunks)} every {request.stream_frames} frames")
+            conversation = self.cloner.create_conversation(
+                context_text or "", chunk, context_audio, request.speaker_id
+            )
+            pieces = self.scheduler.stream(
+                conversation, request.temperature,
+                self.cloner.estimate_sequence_length(chunk, context_audio, context_text or ""),
+                request.stream_frames, request.priority, self.cloner.estimate_audio_frames(chunk)
+            )
+            with self.tracer.span("stream_generate", chunk=i):
+                async for audio in pieces:
+                    # Pieces are a few frames long; compaction on them is cheap enough for the loop
+                    if compactor is not None:
+                        audio = compactor.process(audio)
+                    if len(audio):
+                        data = self._encode_stream_chunk(encoder, audio)
+                        timer.mark(len(audio) / sr)
+                        yield data
+        
+        if compactor is not None:
+            tail = compactor.flush()
+            if len(tail):
+                data = self._encode_stream_chunk(encoder, tail)
+                timer.mark(len(tail) / sr)
+                yield data
 
 # Global service instance
 voice_service = VoiceCloneService()
@@ -530,9 +976,16 @@ async def lifespan(app: FastAPI):
     """Application lifespan management"""
     # Startup
     await voice_service.initialize()
+    await voice_service.scheduler.start()
+    # Warmup runs while the server already answers /health; /ready turns
+    # 200 once it finishes
+    warmup = asyncio.create_task(voice_service.warmup())
     yield
     # Shutdown
-    pass
+    warmup.cancel()
+    await voice_service.scheduler.stop()
+    voice_service.worker.stop()
+    voice_service.audio_pool.shutdown()
 
 # FastAPI app
 app = FastAPI(
@@ -542,18 +995,59 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    """At capacity: 429 with a Retry-After estimated from the queue ahead"""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "reason": exc.reason, "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 @app.get("/health")
-async def health_check():
-    """Health check endpoint"""
+async def health_check(response: Response):
+    """
+    Health check endpoint: 503 once the model is loaded but no inference
+    thread or process is left to run it, so the replica gets restarted
+    """
     metrics = voice_service.monitor.get_system_metrics()
+    alive = voice_service.cloner is None or voice_service.worker.running
+    if not alive:
+        response.status_code = 503
     return {
-        "status": "healthy",
+        "status": "healthy" if alive else "unhealthy",
         "system_metrics": metrics,
-        "model_loaded": voice_service.cloner is not None
+        "model_loaded": voice_service.cloner is not None,
+        "ready": voice_service.ready
+    }
+
+@app.get("/ready")
+async def readiness_check(response: Response):
+    """
+    Readiness endpoint: 503 until the model is loaded and warmed up, and
+    again if an inference process dies, so the load balancer only routes
+    traffic to warm, complete replicas (/health is liveness)
+    """
+    if not voice_service.ready:
+        response.status_code = 503
+    return {
+        "ready": voice_service.ready,
+        "model_loaded": voice_service.cloner is not None,
+        "warmup": voice_service.warmup_state,
+        "inference_worker": voice_service.worker.get_stats()
     }
 
+@app.get("/startup-timeline")
+async def get_startup_timeline_endpoint():
+    """
+    Cold-start breakdown: each startup phase with its offset from process
+    start and duration (model load sub-phases reference model_load)
+    """
+    return voice_service.startup.get_timeline()
+
 @app.post("/clone-voice", response_model=VoiceCloneResponse)
 async def clone_voice_endpoint(
+    response: Response,
     text: str = Form(...),
     voice_name: Optional[str] = Form(None),
     reference_text: Optional[str] = Form(None),
@@ -581,7 +1075,12 @@ async def clone_voice_endpoint(
         max_silence_duration=max_silence_duration,
         use_optimization=use_optimization
     )
-    return await voice_service.clone_voice(request, reference_audio)
+    result = await voice_service.clone_voice(request, reference_audio)
+    response.headers["X-Trace-Id"] = result.processing_info["trace_id"]
+    response.headers["X-Cache"] = result.processing_info.get("result_cache", CACHE_BYPASS)
+    if "result_cache_tier" in result.processing_info:
+        response.headers["X-Cache-Tier"] = result.processing_info["result_cache_tier"]
+    return result
 
 @app.post("/clone-voice-stream")
 async def stream_voice_clone_endpoint(
@@ -595,10 +1094,16 @@ async def stream_voice_clone_endpoint(
     streaming: bool = Form(True),
     max_silence_duration: float = Form(0.5),
     use_optimization: bool = Form(True),
+    stream_frames: int = Form(2),
+    stream_format: str = Form("wav"),
     reference_audio: Optional[UploadFile] = File(None)
 ):
     """
     Stream voice cloning in real-time chunks
+    
+    With stream_frames > 0 audio is sent every stream_frames Mimi frames
+    (80 ms each) while generating. stream_format picks the container: one
+    WAV header followed by PCM, raw 16-bit PCM, or Ogg/Opus pages.
     """
     request = VoiceCloneRequest(
         text=text,
@@ -610,30 +1115,56 @@ async def stream_voice_clone_endpoint(
         remove_silence=remove_silence,
         streaming=streaming,
         max_silence_duration=max_silence_duration,
-        use_optimization=use_optimization
+        use_optimization=use_optimization,
+        stream_frames=stream_frames,
+        stream_format=stream_format,
+        priority=INTERACTIVE
     )
     
     if not request.streaming:
         raise HTTPException(status_code=400, detail="Streaming must be enabled")
     
+    try:
+        encoder = create_stream_encoder(request.stream_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Admitted before the response starts so a full server answers 429, not
+    # a 200 whose body never comes; released when the stream ends (or, if the
+    # client left before it started, by the background task)
+    ticket = await voice_service.admit(request, reference_audio)
+    trace_id = voice_service.tracer.new_trace_id()
     return StreamingResponse(
-        voice_service.stream_voice_clone(request, reference_audio),
-        media_type="audio/wav",
-        headers={"Content-Disposition": "attachment; filename=streamed_voice.wav"}
+        voice_service.stream_voice_clone(request, reference_audio, encoder, trace_id, ticket),
+        media_type=encoder.media_type,
+        headers={"Content-Disposition": f"attachment; filename={encoder.filename}",
+                 "X-Trace-Id": trace_id},
+        background=BackgroundTask(voice_service.release_admission, ticket)
     )
 
 @app.post("/batch-clone-voice")
 async def batch_clone_voice_endpoint(
+    response: Response,
     request: BatchVoiceCloneRequest = Depends(),
     reference_audio: Optional[UploadFile] = File(None),
     background_tasks: BackgroundTasks = None
 ):
     """
     Batch voice cloning for multiple texts
+    
+    Items are admitted one at a time. When the server turns an item away,
+    the items already synthesized are still returned; that item and the
+    ones after it carry the rejection, and retry_after / Retry-After say
+    when to resubmit them.
     """
     results = []
+    rejection: Optional[AdmissionRejected] = None
     
     for i, text in enumerate(request.texts):
+        if rejection is not None:
+            results.append({"index": i, "text": text, "result": _rejected_response(rejection)})
+            continue
+        
         voice_request = VoiceCloneRequest(
             text=text,
             voice_name=request.voice_name,
@@ -642,21 +1173,39 @@ async def batch_clone_voice_endpoint(
             temperature=request.temperature,
             chunk_size=request.chunk_size,
             remove_silence=request.remove_silence,
-            max_silence_duration=request.max_silence_duration
+            max_silence_duration=request.max_silence_duration,
+            priority=BULK
         )
         
-        result = await voice_service.clone_voice(voice_request, reference_audio)
+        try:
+            result = await voice_service.clone_voice(voice_request, reference_audio)
+        except AdmissionRejected as e:
+            rejection = e
+            result = _rejected_response(e)
         results.append({
             "index": i,
             "text": text,
             "result": result
         })
     
-    return {
-        "success": True,
-        "total_processed": len(results),
+    batch = {
+        "success": rejection is None,
+        "total_processed": sum(1 for item in results if item["result"].success),
         "results": results
     }
+    if rejection is not None:
+        response.headers["Retry-After"] = str(rejection.retry_after)
+        batch["retry_after"] = rejection.retry_after
+    return batch
+
+def _rejected_response(exc: AdmissionRejected) -> VoiceCloneResponse:
+    """Batch item turned away by admission control"""
+    return VoiceCloneResponse(
+        success=False,
+        error=str(exc),
+        performance_metrics={},
+        processing_info={"admission": exc.reason, "retry_after": exc.retry_after}
+    )
 
 @app.get("/performance-stats")
 async def get_performance_stats():
@@ -676,14 +1225,50 @@ async def get_performance_stats():
         optimization_stats = voice_service.optimizer.get_optimization_stats()
         base_stats.update({
             "optimization_stats": optimization_stats,
+            "codec_token_cache": get_codec_cache().get_stats(),
+            "reference_store": voice_service.reference_store.get_stats(),
+            "result_cache": voice_service.result_cache.get_stats(),
+            "prefix_kv_cache": get_prefix_cache().get_stats(),
+            "scheduler": voice_service.scheduler.get_stats(),
+            "admission": voice_service.admission.get_stats(),
+            "inference_worker": voice_service.worker.get_stats(),
+            "streaming": voice_service.stream_metrics.get_stats(),
             "cache_efficiency": {
-                "cache_hit_ratio": "calculated_on_demand",  # Would need request tracking
-                "memory_savings": optimization_stats.get("cache_stats", {}).get("cache_size_mb", 0)
+                "cache_hit_ratio": optimization_stats["cache_stats"]["hit_ratio"],
+                "hits": optimization_stats["cache_stats"]["hits"],
+                "misses": optimization_stats["cache_stats"]["misses"],
+                "evictions": optimization_stats["cache_stats"]["evictions"],
+                "memory_savings": optimization_stats["cache_stats"]["cache_size_mb"]
             }
         })
     
     return base_stats
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """
+    Prometheus metrics: request and per-stage latency histograms, cache
+    lookups, admission queue and rejections, scheduler queue depth,
+    resident memory and audio produced
+    """
+    return Response(content=voice_service.metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/debug/traces")
+async def list_traces_endpoint(limit: int = 20, min_ms: float = 0.0):
+    """Most recent request traces (newest first), optionally only those slower than min_ms"""
+    return {"traces": voice_service.tracer.list_traces(limit, min_ms)}
+
+@app.get("/debug/traces/{trace_id}")
+async def get_trace_endpoint(trace_id: str):
+    """
+    One request trace as Chrome trace JSON: open it in chrome://tracing or
+    ui.perfetto.dev (trace ids come from X-Trace-Id / processing_info)
+    """
+    trace = voice_service.tracer.get_trace(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"Trace '{trace_id}' not found (still running or evicted)")
+    return voice_service.tracer.to_chrome_trace(trace)
+
 @app.get("/optimization-config")
 async def get_optimization_config():
     """
@@ -697,8 +1282,14 @@ async def get_optimization_config():
                 "adaptive_chunking": voice_service.optimizer.config.adaptive_chunk_sizing,
                 "max_cache_size_mb": voice_service.optimizer.config.max_cache_size_mb,
                 "optimal_chunk_sizes": voice_service.optimizer.config.optimal_chunk_sizes,
-                "max_concurrent_requests": voice_service.optimizer.config.max_concurrent_requests
+                "max_concurrent_requests": voice_service.optimizer.config.max_concurrent_requests,
+                "batch_processing_enabled": voice_service.optimizer.config.batch_processing_enabled,
+                "max_batch_size": voice_service.optimizer.config.max_batch_size,
+                "quantization": voice_service.optimizer.config.quantization,
+                "torch_compile": voice_service.optimizer.config.enable_torch_compile
             },
+            "precision": voice_service.get_precision_report(),
+            "compilation": voice_service.get_compilation_report(),
             "current_stats": voice_service.optimizer.get_optimization_stats()
         }
     else:
@@ -730,7 +1321,7 @@ async def update_optimization_settings(
     
     if max_cache_size_mb is not None:
         config.max_cache_size_mb = max_cache_size_mb
-        voice_service.optimizer.memory_manager.max_cache_size_bytes = max_cache_size_mb * 1024 * 1024
+        voice_service.optimizer.memory_manager.set_max_cache_size_mb(max_cache_size_mb)
         updated_settings["max_cache_size_mb"] = max_cache_size_mb
     
     if adaptive_chunking is not None:
@@ -739,6 +1330,7 @@ async def update_optimization_settings(
     
     if max_concurrent_requests is not None:
         config.max_concurrent_requests = max_concurrent_requests
+        voice_service.admission.set_limits(max_concurrent=max_concurrent_requests)
         updated_settings["max_concurrent_requests"] = max_concurrent_requests
     
     return {
@@ -758,23 +1350,19 @@ async def clear_audio_cache():
     Clear the audio cache to free up memory
     """
     if hasattr(voice_service, 'optimizer'):
-        cache_size_before = voice_service.optimizer.memory_manager.cache_size_bytes / 1024**2
-        cache_items_before = len(voice_service.optimizer.memory_manager.cache)
-        
         # Clear cache
-        voice_service.optimizer.memory_manager.cache.clear()
-        voice_service.optimizer.memory_manager.access_count.clear()
-        voice_service.optimizer.memory_manager.cache_size_bytes = 0
+        cache_cleared = voice_service.optimizer.memory_manager.clear_cache()
+        
+        # Prefix KV caches live on the model device
+        get_prefix_cache().clear()
+        voice_service.result_cache.clear()
         
         # Force garbage collection
         voice_service.optimizer.memory_manager.force_garbage_collection()
         
         return {
             "success": True,
-            "cache_cleared": {
-                "size_mb_freed": cache_size_before,
-                "items_removed": cache_items_before
-            },
+            "cache_cleared": cache_cleared,
             "current_memory": voice_service.optimizer.memory_manager.get_memory_stats()
         }
     else:
@@ -907,8 +1495,15 @@ async def get_voice_profile(voice_name: str):
         raise HTTPException(status_code=404, detail=f"Voice profile '{voice_name}' not found")
 
 if __name__ == "__main__":
+    # PREFORK_WORKERS=N serves a CPU model from N forked inference processes
+    # sharing one copy of the weights; uvicorn itself stays single-process
+    prefork_workers = int(os.environ.get("PREFORK_WORKERS", "0"))
+    if prefork_workers > 0:
+        threads = int(os.environ.get("PREFORK_THREADS_PER_WORKER", "0")) or None
+        voice_service.preload_and_fork(prefork_workers, threads)
+    
     uvicorn.run(
-        "voice_cloning_api:app",
+        app,
         host="0.0.0.0",
         port=7860,  # Changed to 7860
         reload=False,  # Set to True for development
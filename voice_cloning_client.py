@@ -6,7 +6,9 @@ Client example for Voice Cloning API
 import asyncio
 import aiohttp
 import json
+import struct
 import time
+import wave
 from pathlib import Path
 from typing import Optional
 
@@ -15,12 +17,16 @@ class VoiceCloneClient:
     Client for Voice Cloning API
     """
     
-    def __init__(self, base_url: str = "http://localhost:7860"):
+    def __init__(self, base_url: str = "http://localhost:7860", timeout: Optional[float] = None):
         self.base_url = base_url
+        self.timeout = timeout  # Total seconds per request (aiohttp default when None)
         self.session: Optional[aiohttp.ClientSession] = None
     
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        if self.timeout:
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        else:
+            self.session = aiohttp.ClientSession()
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -39,6 +45,7 @@ class VoiceCloneClient:
         """
         data = {
             "text": text,
+            "voice_name": kwargs.get("voice_name"),
             "reference_text": reference_text,
             "speaker_id": kwargs.get("speaker_id", "0"),
             "temperature": kwargs.get("temperature", 0.7),
@@ -67,21 +74,26 @@ class VoiceCloneClient:
                                    data=form_data) as response:
             return await response.json()
     
-    async def stream_voice_clone(self, text: str, reference_audio_path: Optional[str] = None,
-                                reference_text: Optional[str] = None, output_path: str = "streamed_output.wav",
-                                **kwargs):
+    def open_stream(self, text: str, reference_audio_path: Optional[str] = None,
+                    reference_text: Optional[str] = None, **kwargs):
         """
-        Stream voice cloning
+        Start a /clone-voice-stream request
+        
+        Returns the aiohttp request context manager, so callers can read
+        the body as it arrives (async with client.open_stream(...) as response)
         """
         data = {
             "text": text,
+            "voice_name": kwargs.get("voice_name"),
             "reference_text": reference_text,
             "speaker_id": kwargs.get("speaker_id", "0"),
             "temperature": kwargs.get("temperature", 0.7),
             "chunk_size": kwargs.get("chunk_size", 100),
             "remove_silence": kwargs.get("remove_silence", True),
             "streaming": "true",  # Enable streaming
-            "max_silence_duration": kwargs.get("max_silence_duration", 0.5)
+            "max_silence_duration": kwargs.get("max_silence_duration", 0.5),
+            "stream_frames": kwargs.get("stream_frames", 2),
+            "stream_format": kwargs.get("stream_format", "wav")
         }
         
         # Prepare form data
@@ -97,15 +109,53 @@ class VoiceCloneClient:
                               filename=Path(reference_audio_path).name,
                               content_type='audio/wav')
         
+        return self.session.post(f"{self.base_url}/clone-voice-stream", data=form_data)
+    
+    async def stream_voice_clone(self, text: str, reference_audio_path: Optional[str] = None,
+                                reference_text: Optional[str] = None, output_path: str = "streamed_output.wav",
+                                **kwargs):
+        """
+        Stream voice cloning
+        """
         # Stream the response
-        async with self.session.post(f"{self.base_url}/clone-voice-stream", 
-                                   data=form_data) as response:
-            with open(output_path, 'wb') as f:
-                async for chunk in response.content.iter_chunked(8192):
-                    f.write(chunk)
+        start_time = time.time()
+        first_byte_time = None
+        async with self.open_stream(text, reference_audio_path, reference_text, **kwargs) as response:
+            if response.headers.get("Content-Type", "").startswith("audio/pcm"):
+                # Frame-level streaming sends raw 16-bit PCM; wrap it in a WAV file
+                with wave.open(output_path, 'wb') as f:
+                    f.setnchannels(1)
+                    f.setsampwidth(2)
+                    f.setframerate(24000)
+                    async for chunk in response.content.iter_chunked(8192):
+                        first_byte_time = first_byte_time or time.time()
+                        f.writeframes(chunk)
+            else:
+                with open(output_path, 'wb') as f:
+                    async for chunk in response.content.iter_chunked(8192):
+                        first_byte_time = first_byte_time or time.time()
+                        f.write(chunk)
+        
+        if output_path.endswith(".wav") and not response.headers.get("Content-Type", "").startswith("audio/pcm"):
+            self._finalize_wav_header(output_path)
         
+        if first_byte_time:
+            print(f"Time to first audio byte: {first_byte_time - start_time:.3f}s")
         return output_path
     
+    @staticmethod
+    def _finalize_wav_header(path: str):
+        """Fill in the size fields a streamed WAV header leaves open"""
+        with open(path, 'r+b') as f:
+            header = f.read(44)
+            if len(header) < 44 or header[:4] != b"RIFF" or header[40:44] != b"\xff\xff\xff\xff":
+                return
+            size = f.seek(0, 2)
+            f.seek(4)
+            f.write(struct.pack("<I", size - 8))
+            f.seek(40)
+            f.write(struct.pack("<I", size - 44))
+    
     async def batch_clone_voice(self, texts: list, reference_audio_path: Optional[str] = None,
                                reference_text: Optional[str] = None, **kwargs):
         """
@@ -140,6 +190,27 @@ class VoiceCloneClient:
                                    data=form_data) as response:
             return await response.json()
     
+    async def clone(self, text: str, voice_id: Optional[str] = None, sample_name: Optional[str] = None,
+                    temperature: float = 0.8, max_tokens: int = 512) -> bytes:
+        """
+        Clone voice with the /clone endpoint of voice_api_complete.py
+        
+        Returns:
+            The generated WAV file
+        """
+        form_data = aiohttp.FormData()
+        form_data.add_field("text", text)
+        form_data.add_field("temperature", str(temperature))
+        form_data.add_field("max_tokens", str(max_tokens))
+        if voice_id:
+            form_data.add_field("voice_id", voice_id)
+        if sample_name:
+            form_data.add_field("sample_name", sample_name)
+        
+        async with self.session.post(f"{self.base_url}/clone", data=form_data) as response:
+            response.raise_for_status()
+            return await response.read()
+    
     async def get_performance_stats(self):
         """Get performance statistics"""
         async with self.session.get(f"{self.base_url}/performance-stats") as response:
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Prometheus metrics for the Voice Cloning API
+Counters, gauges and fixed-bucket histograms rendered in the Prometheus text
+exposition format by GET /metrics. Observing a value is a dict lookup and a
+few additions under a lock, cheap enough to leave on in production; values
+that already live elsewhere (cache counters, queue depth, memory) are read
+only when the endpoint is scraped.
+"""
+
+import logging
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers a cached 5 ms lookup up to a two-minute long-form request
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelValues = Tuple[str, ...]
+# A scrape-time callback returns one value, or values keyed by label values
+Collector = Callable[[], Union[float, Dict[LabelValues, float]]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+class Metric:
+    """Base class: a named metric family with optional labels"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 collector: Optional[Collector] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collector = collector
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> List[Tuple[str, LabelValues, float]]:
+        if self.collector is not None:
+            try:
+                collected = self.collector()
+            except Exception as e:
+                logger.debug(f"Metric collector for {self.name} failed: {e}")
+                return []
+            values = collected if isinstance(collected, dict) else {(): collected}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [(self.name, key, value) for key, value in sorted(values.items())]
+
+    def render(self) -> List[str]:
+        """Text exposition lines of this family"""
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.type_name}"]
+        for name, key, value in self._samples():
+            lines.append(f"{name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    type_name = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    """Value that goes up and down"""
+
+    type_name = "gauge"
+
+    def set(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(Metric):
+    """Observations counted into fixed cumulative buckets, with sum and count"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Label values -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the enclosed block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        names = self.labelnames + ("le",)
+        for key, values in sorted(series.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (math.inf,), values[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, key + (_format_value(bound),))} "
+                             f"{_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(values[-1])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(cumulative)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metric families and renders them for a scrape"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                collector: Optional[Collector] = None) -> Counter:
+        return self.register(Counter(name, documentation, labelnames, collector))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              collector: Optional[Collector] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, collector))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def set_collector(self, name: str, collector: Collector):
+        """Read a registered counter or gauge from collector at scrape time"""
+        self._metrics[name].collector = collector
+
+    def render(self) -> str:
+        """All families in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Global metrics registry instance
+metrics_registry = MetricsRegistry()
+
+# Synthesis stages, in pipeline order
+STAGES = ("queue_wait", "chunking", "tokenize", "generate", "decode", "postprocess", "encode")
+
+REQUEST_LATENCY = metrics_registry.histogram(
+    "voice_request_duration_seconds", "End-to-end request latency", ["endpoint", "status"]
+)
+STAGE_LATENCY = metrics_registry.histogram(
+    "voice_stage_duration_seconds", "Time spent in each synthesis stage", ["stage"]
+)
+STREAM_FIRST_AUDIO = metrics_registry.histogram(
+    "voice_stream_first_audio_seconds", "Time from request start to the first streamed audio"
+)
+AUDIO_SECONDS = metrics_registry.counter(
+    "voice_audio_seconds_total", "Seconds of audio produced", ["endpoint"]
+)
+CACHE_LOOKUPS = metrics_registry.counter(
+    "voice_cache_lookups_total", "Cache lookups by cache and result", ["cache", "result"]
+)
+QUEUE_DEPTH = metrics_registry.gauge(
+    "voice_scheduler_queue_depth", "Text chunks waiting for a decode batch"
+)
+ADMISSION_WAIT = metrics_registry.histogram(
+    "voice_admission_wait_seconds", "Time requests waited for admission"
+)
+ADMISSION_REJECTIONS = metrics_registry.counter(
+    "voice_admission_rejections_total", "Requests turned away by admission control", ["reason"]
+)
+ADMISSION_QUEUE_DEPTH = metrics_registry.gauge(
+    "voice_admission_queue_depth", "Requests waiting for admission"
+)
+ADMISSION_IN_FLIGHT = metrics_registry.gauge(
+    "voice_admission_in_flight", "Admitted requests still running"
+)
+ADMISSION_RESERVED_BYTES = metrics_registry.gauge(
+    "voice_admission_reserved_bytes", "Estimated memory held by admitted requests"
+)
+RESIDENT_MEMORY = metrics_registry.gauge(
+    "process_resident_memory_bytes", "Resident memory of the API process"
+)
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Get the global metrics registry instance"""
+    return metrics_registry
@@ -4,17 +4,20 @@ Advanced optimization module for Voice Cloning API
 Includes GPU optimization, memory management, and performance tuning
 """
 
+import io
 import os
 import gc
 import torch
 import psutil
-import GPUtil
 import numpy as np
-from typing import Dict, List, Tuple, Optional
+import soundfile as sf
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple, Optional
 from dataclasses import dataclass
 import logging
 from threading import Lock
-import time
+
+from voice_cloning_tracing import get_tracer
 
 logger = logging.getLogger(__name__)
 
@@ -25,23 +28,43 @@ class OptimizationConfig:
     enable_gpu_optimization: bool = True
     max_gpu_memory_fraction: float = 0.9
     enable_mixed_precision: bool = True
-    enable_torch_compile: bool = True
+    enable_torch_compile: bool = False  # Compiled static-cache generation, warmed up at load
     
     # Memory management
     enable_memory_pool: bool = True
     max_cache_size_mb: int = 2048
+    cache_storage: str = "float32"  # float32, int16 or flac
+    
+    # Model weights
+    quantization: Optional[str] = None  # None, int8 (CPU dynamic) or int4 (torchao)
+    component_dtypes: Optional[Dict[str, str]] = None  # None: derived from enable_mixed_precision
+    cpu_autocast: bool = True  # bf16 autocast on CPUs with native bf16
     garbage_collection_threshold: int = 100
     
     # Processing optimization
     optimal_chunk_sizes: Dict[str, int] = None
     adaptive_chunk_sizing: bool = True
     batch_processing_enabled: bool = True
+    max_batch_size: int = 32
+    batch_memory_fraction: float = 0.8
+    batch_window_ms: float = 10.0
+    scheduler_aging_s: float = 5.0  # Waiting time that promotes a chunk one priority class
     max_concurrent_requests: int = 4
     
+    # Admission control in front of the service
+    admission_memory_fraction: float = 0.7  # Of the memory free once warmed up
+    admission_queue_size: int = 16
+    admission_max_wait_s: float = 30.0
+    
     # Audio processing
     audio_preprocessing_threads: int = 2
     silence_detection_optimization: bool = True
     
+    # Warmup before the replica reports ready
+    enable_warmup: bool = True
+    warmup_text: str = "Hola, esto es una prueba de calentamiento."
+    warmup_voices: Optional[List[str]] = None  # None: every registered voice
+    
     def __post_init__(self):
         if self.optimal_chunk_sizes is None:
             self.optimal_chunk_sizes = {
@@ -86,82 +109,172 @@ class GPUOptimizer:
         except Exception as e:
             logger.error(f"GPU optimization failed: {e}")
     
-    def get_optimal_batch_size(self, model_size_mb: float, sequence_length: int) -> int:
-        """Calculate optimal batch size based on GPU memory"""
-        if not self.gpu_available:
-            return 1
+    def get_available_memory(self) -> int:
+        """Measure memory currently free for generation on the active device (bytes)"""
+        if self.gpu_available:
+            free_bytes, _ = torch.cuda.mem_get_info()
+            # Blocks cached by the allocator are reusable too
+            return free_bytes + torch.cuda.memory_reserved() - torch.cuda.memory_allocated()
+        return psutil.virtual_memory().available
+    
+    def get_optimal_batch_size(self, model_size_mb: float, sequence_length: int,
+                               bytes_per_token: Optional[float] = None,
+                               max_batch_size: int = 32,
+                               memory_fraction: float = 0.8) -> int:
+        """
+        Calculate optimal batch size from measured free memory
         
+        bytes_per_token should come from the loaded model (KV cache plus
+        activations per position); without it a rough estimate derived from
+        the model size is used.
+        """
         try:
-            gpu_memory_gb = torch.cuda.get_device_properties(0).total_memory / 1024**3
-            available_memory = gpu_memory_gb * 0.8  # Leave 20% buffer
+            available_memory = self.get_available_memory() * memory_fraction
             
-            # Estimate memory per sample (rough calculation)
-            memory_per_sample = model_size_mb * sequence_length / 1000
-            optimal_batch_size = max(1, int(available_memory * 1024 / memory_per_sample))
+            if bytes_per_token is None:
+                bytes_per_token = model_size_mb * 1024**2 / 1000
+            memory_per_sample = max(bytes_per_token * max(sequence_length, 1), 1.0)
+            optimal_batch_size = max(1, int(available_memory / memory_per_sample))
             
-            return min(optimal_batch_size, 8)  # Cap at 8 for stability
+            return min(optimal_batch_size, max_batch_size)
             
         except Exception as e:
             logger.error(f"Failed to calculate optimal batch size: {e}")
             return 1
 
+@dataclass
+class CacheEntry:
+    """One cached clip in its storage encoding"""
+    data: Any  # float32/int16 ndarray, or FLAC bytes
+    nbytes: int
+    sample_rate: int
+
 class MemoryManager:
     """Advanced memory management"""
     
+    STORAGE_FORMATS = ("float32", "int16", "flac")
+    
     def __init__(self, config: OptimizationConfig):
         self.config = config
-        self.cache = {}
+        # Size-bounded LRU: least recently used first
+        self.cache: "OrderedDict[str, CacheEntry]" = OrderedDict()
         self.cache_size_bytes = 0
         self.max_cache_size_bytes = config.max_cache_size_mb * 1024 * 1024
-        self.access_count = {}
+        self.storage = config.cache_storage if config.cache_storage in self.STORAGE_FORMATS else "float32"
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
         self.lock = Lock()
+    
+    def _encode(self, audio_data: np.ndarray, sample_rate: int) -> CacheEntry:
+        """Convert audio to the configured storage encoding"""
+        if self.storage == "int16":
+            data = (np.clip(audio_data, -1.0, 1.0) * 32767).astype(np.int16)
+            data.flags.writeable = False
+            return CacheEntry(data, data.nbytes, sample_rate)
+        if self.storage == "flac":
+            buffer = io.BytesIO()
+            sf.write(buffer, audio_data, sample_rate, format="FLAC", subtype="PCM_16")
+            data = buffer.getvalue()
+            return CacheEntry(data, len(data), sample_rate)
         
-    def cache_audio_data(self, key: str, audio_data: np.ndarray) -> bool:
+        # float32: keep the caller's array when it is already immutable
+        data = np.asarray(audio_data, dtype=np.float32)
+        if data.flags.writeable:
+            data = data.copy()
+            data.flags.writeable = False
+        return CacheEntry(data, data.nbytes, sample_rate)
+    
+    @staticmethod
+    def _decode(entry: CacheEntry) -> np.ndarray:
+        """Read-only float32 audio for an entry (a view for float32 storage)"""
+        if isinstance(entry.data, bytes):
+            audio, _ = sf.read(io.BytesIO(entry.data), dtype="float32")
+        elif entry.data.dtype == np.int16:
+            audio = entry.data.astype(np.float32) / 32767
+        else:
+            return entry.data.view()
+        audio.flags.writeable = False
+        return audio
+    
+    def cache_audio_data(self, key: str, audio_data: np.ndarray, sample_rate: int = 24000) -> bool:
         """Cache audio data with LRU eviction"""
+        try:
+            entry = self._encode(audio_data, sample_rate)
+        except Exception as e:
+            logger.error(f"Failed to cache audio data: {e}")
+            return False
+        
+        if entry.nbytes > self.max_cache_size_bytes:
+            return False
+        
         with self.lock:
-            try:
-                data_size = audio_data.nbytes
-                
-                # Check if we need to evict
-                while (self.cache_size_bytes + data_size > self.max_cache_size_bytes 
-                       and self.cache):
-                    self._evict_lru()
-                
-                # Cache the data
-                self.cache[key] = audio_data.copy()
-                self.cache_size_bytes += data_size
-                self.access_count[key] = 1
-                
-                logger.debug(f"Cached audio data: {key} ({data_size} bytes)")
-                return True
-                
-            except Exception as e:
-                logger.error(f"Failed to cache audio data: {e}")
-                return False
+            old = self.cache.pop(key, None)
+            if old is not None:
+                self.cache_size_bytes -= old.nbytes
+            
+            # Evict least recently used entries until the new one fits
+            while self.cache and self.cache_size_bytes + entry.nbytes > self.max_cache_size_bytes:
+                self._evict_lru()
+            
+            self.cache[key] = entry
+            self.cache_size_bytes += entry.nbytes
+        
+        logger.debug(f"Cached audio data: {key} ({entry.nbytes} bytes, {self.storage})")
+        return True
     
     def get_cached_audio(self, key: str) -> Optional[np.ndarray]:
-        """Retrieve cached audio data"""
+        """Retrieve cached audio data as a read-only float32 array"""
         with self.lock:
-            if key in self.cache:
-                self.access_count[key] += 1
-                return self.cache[key].copy()
-            return None
+            entry = self.cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.cache.move_to_end(key)
+            self.hits += 1
+        return self._decode(entry)
     
     def _evict_lru(self):
-        """Evict least recently used item"""
+        """Evict least recently used item (caller holds the lock)"""
         if not self.cache:
             return
         
-        # Find LRU item
-        lru_key = min(self.access_count.keys(), key=lambda k: self.access_count[k])
-        
-        # Remove from cache
-        data = self.cache.pop(lru_key)
-        self.cache_size_bytes -= data.nbytes
-        del self.access_count[lru_key]
+        lru_key, entry = self.cache.popitem(last=False)
+        self.cache_size_bytes -= entry.nbytes
+        self.evictions += 1
         
         logger.debug(f"Evicted LRU item: {lru_key}")
     
+    def set_max_cache_size_mb(self, max_cache_size_mb: int):
+        """Change the cache budget, evicting down to it"""
+        with self.lock:
+            self.max_cache_size_bytes = max_cache_size_mb * 1024 * 1024
+            while self.cache and self.cache_size_bytes > self.max_cache_size_bytes:
+                self._evict_lru()
+    
+    def clear_cache(self) -> Dict[str, float]:
+        """Drop every cached entry, returning what was freed"""
+        with self.lock:
+            freed = {"size_mb_freed": self.cache_size_bytes / 1024**2, "items_removed": len(self.cache)}
+            self.cache.clear()
+            self.cache_size_bytes = 0
+        return freed
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get cache occupancy and hit/miss/eviction counters"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "cache_size_mb": self.cache_size_bytes / 1024**2,
+                "cache_items": len(self.cache),
+                "max_cache_size_mb": self.max_cache_size_bytes / 1024**2,
+                "storage": self.storage,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+    
     def force_garbage_collection(self):
         """Force garbage collection"""
         collected = gc.collect()
@@ -233,58 +346,6 @@ class AdaptiveChunker:
             if len(self.performance_history) > 50:
                 self.performance_history = self.performance_history[-50:]
 
-class PerformanceProfiler:
-    """Performance profiling and monitoring"""
-    
-    def __init__(self):
-        self.profiles = {}
-        self.current_profile = None
-        
-    def start_profile(self, name: str):
-        """Start profiling a section"""
-        self.current_profile = {
-            "name": name,
-            "start_time": time.time(),
-            "start_memory": self._get_memory_usage(),
-            "start_gpu_memory": self._get_gpu_memory() if torch.cuda.is_available() else 0
-        }
-    
-    def end_profile(self) -> Dict[str, float]:
-        """End profiling and return metrics"""
-        if not self.current_profile:
-            return {}
-        
-        end_time = time.time()
-        end_memory = self._get_memory_usage()
-        end_gpu_memory = self._get_gpu_memory() if torch.cuda.is_available() else 0
-        
-        profile_data = {
-            "duration": end_time - self.current_profile["start_time"],
-            "memory_delta": end_memory - self.current_profile["start_memory"],
-            "gpu_memory_delta": end_gpu_memory - self.current_profile["start_gpu_memory"],
-            "peak_memory": end_memory,
-            "peak_gpu_memory": end_gpu_memory
-        }
-        
-        self.profiles[self.current_profile["name"]] = profile_data
-        self.current_profile = None
-        
-        return profile_data
-    
-    def _get_memory_usage(self) -> float:
-        """Get current memory usage in MB"""
-        return psutil.Process().memory_info().rss / 1024**2
-    
-    def _get_gpu_memory(self) -> float:
-        """Get current GPU memory usage in MB"""
-        if torch.cuda.is_available():
-            return torch.cuda.memory_allocated() / 1024**2
-        return 0.0
-    
-    def get_performance_summary(self) -> Dict[str, Dict[str, float]]:
-        """Get summary of all profiles"""
-        return self.profiles.copy()
-
 class VoiceCloneOptimizer:
     """Main optimization controller"""
     
@@ -293,7 +354,6 @@ class VoiceCloneOptimizer:
         self.gpu_optimizer = GPUOptimizer()
         self.memory_manager = MemoryManager(self.config)
         self.adaptive_chunker = AdaptiveChunker(self.config)
-        self.profiler = PerformanceProfiler()
         
         # Initialize optimization
         self._initialize_optimizations()
@@ -325,8 +385,15 @@ class VoiceCloneOptimizer:
         if streaming:
             chunk_size = min(chunk_size, self.config.optimal_chunk_sizes["streaming"])
         
-        # Get optimal batch size for model
-        batch_size = self.gpu_optimizer.get_optimal_batch_size(1500, len(text))  # Estimate 1.5GB model
+        # Get optimal batch size from measured memory
+        if self.config.batch_processing_enabled:
+            batch_size = self.gpu_optimizer.get_optimal_batch_size(
+                1500, len(text),  # Estimate 1.5GB model
+                max_batch_size=self.config.max_batch_size,
+                memory_fraction=self.config.batch_memory_fraction
+            )
+        else:
+            batch_size = 1
         
         return {
             "chunk_size": chunk_size,
@@ -337,6 +404,24 @@ class VoiceCloneOptimizer:
             "memory_stats": system_stats
         }
     
+    def get_precision_settings(self, device: str) -> Dict[str, Any]:
+        """
+        Model precision for a device: per-component dtypes and autocast
+        
+        With enable_mixed_precision the backbone and depth decoder run in
+        bfloat16 where the hardware supports it and the codec stays float32.
+        """
+        from voice_cloning.models import cpu_supports_bf16, default_component_dtypes
+        
+        component_dtypes = self.config.component_dtypes or default_component_dtypes(
+            device, self.config.enable_mixed_precision
+        )
+        # Dynamic int8 kernels take float32 activations
+        autocast = (not str(device).startswith("cuda") and self.config.enable_mixed_precision
+                    and self.config.cpu_autocast and cpu_supports_bf16()
+                    and self.config.quantization != "int8")
+        return {"component_dtypes": component_dtypes, "autocast": autocast}
+    
     def record_request_performance(self, chunk_size: int, processing_time: float, 
                                  audio_duration: float):
         """Record performance for adaptive optimization"""
@@ -346,17 +431,24 @@ class VoiceCloneOptimizer:
         if self.memory_manager.get_memory_stats()["ram_usage_percent"] > 85:
             self.memory_manager.force_garbage_collection()
     
+    def get_batch_size(self, sequence_length: int, bytes_per_token: float) -> int:
+        """Batch size for sequences of a given length, from measured free memory"""
+        if not self.config.batch_processing_enabled:
+            return 1
+        return self.gpu_optimizer.get_optimal_batch_size(
+            1500, sequence_length,
+            bytes_per_token=bytes_per_token,
+            max_batch_size=self.config.max_batch_size,
+            memory_fraction=self.config.batch_memory_fraction
+        )
+    
     def get_optimization_stats(self) -> Dict[str, any]:
         """Get comprehensive optimization statistics"""
         return {
             "memory_stats": self.memory_manager.get_memory_stats(),
-            "performance_profiles": self.profiler.get_performance_summary(),
+            "performance_profiles": get_tracer().get_summary(),
             "gpu_available": self.gpu_optimizer.gpu_available,
-            "cache_stats": {
-                "cache_size_mb": self.memory_manager.cache_size_bytes / 1024**2,
-                "cache_items": len(self.memory_manager.cache),
-                "max_cache_size_mb": self.config.max_cache_size_mb
-            },
+            "cache_stats": self.memory_manager.get_cache_stats(),
             "config": {
                 "mixed_precision": self.config.enable_mixed_precision,
                 "adaptive_chunking": self.config.adaptive_chunk_sizing,
@@ -364,17 +456,34 @@ class VoiceCloneOptimizer:
             }
         }
 
-# Global optimizer instance
-global_optimizer = VoiceCloneOptimizer()
+# Global optimizer instance, built on first use: construction touches the
+# CUDA runtime, which has no business running at import time
+global_optimizer: Optional[VoiceCloneOptimizer] = None
+_global_optimizer_lock = Lock()
 
 def get_optimizer() -> VoiceCloneOptimizer:
     """Get the global optimizer instance"""
+    global global_optimizer
+    if global_optimizer is None:
+        with _global_optimizer_lock:
+            if global_optimizer is None:
+                global_optimizer = VoiceCloneOptimizer()
+    return global_optimizer
+
+def configure_optimizer(config: OptimizationConfig) -> VoiceCloneOptimizer:
+    """
+    Replace the global optimizer with one built from config
+    
+    Must run before the service first uses the optimizer (model loading at
+    startup at the latest).
+    """
+    global global_optimizer
+    global_optimizer = VoiceCloneOptimizer(config)
     return global_optimizer
 
 def optimize_model_loading(model_path: str) -> Dict[str, any]:
     """Optimize model loading process"""
     optimizer = get_optimizer()
-    optimizer.profiler.start_profile("model_loading")
     
     # Pre-optimize GPU settings
     if torch.cuda.is_available():
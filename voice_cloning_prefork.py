@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Preload-then-fork serving for the Voice Cloning API
+The parent loads the CSM weights once into shared memory and forks N
+inference processes that map the same pages; the API process dispatches
+calls to whichever process is idle. CPU only: CUDA contexts do not survive fork.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Object the forked processes call into (inherited through fork, never pickled)
+_target = None
+
+
+def _describe(exc: BaseException) -> str:
+    return f"{type(exc).__name__}: {exc}"
+
+
+def _child_main(conn, threads: int):
+    """Inference process loop: run calls on the inherited target"""
+    import torch
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The API process handles shutdown
+    torch.set_num_threads(threads)
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+
+        kind, method, args, kwargs = message
+        try:
+            fn = getattr(_target, method)
+            if kind == "stream":
+                fn(*args, emit=lambda item: conn.send(("item", item)), **kwargs)
+                conn.send(("end", None))
+            else:
+                conn.send(("ok", fn(*args, **kwargs)))
+        except Exception as e:
+            conn.send(("error", _describe(e)))
+
+
+class PreforkWorkerPool:
+    """
+    Forked inference processes sharing one copy of the model weights
+
+    A drop-in for InferenceWorker where calls go to methods of the preloaded
+    target: ``submit(target.method, ...)`` and ``stream(target.method, ...)``
+    are sent by method name to an idle process, so several requests run in
+    parallel, each process with its own torch thread budget.
+
+    A process that dies is not replaced (forking the serving process, with
+    its event loop and helper threads, is unsafe); it leaves the pool, the
+    replica reports not ready, and once none is left calls fail right away.
+    """
+
+    def __init__(self, target: Any, num_workers: int, threads_per_worker: Optional[int] = None):
+        """
+        Args:
+            target: Loaded object whose methods the processes run (a VoiceCloner)
+            num_workers: Number of inference processes to fork
+            threads_per_worker: torch intra-op threads per process
+                (defaults to an even split of the CPU cores)
+        """
+        self.target = target
+        self.num_workers = max(1, num_workers)
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // self.num_workers)
+        self._processes: List[multiprocessing.Process] = []
+        self._connections: List[Any] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._dead: set = set()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.jobs_run = 0
+        self.jobs_failed = 0
+        self.busy_seconds = 0.0
+
+    @property
+    def capacity(self) -> int:
+        """Number of calls that can run at the same time"""
+        return self.live_processes if self._processes else self.num_workers
+
+    @property
+    def live_processes(self) -> int:
+        return sum(1 for index, process in enumerate(self._processes)
+                   if index not in self._dead and process.is_alive())
+
+    @property
+    def running(self) -> bool:
+        return self.live_processes > 0
+
+    @property
+    def healthy(self) -> bool:
+        """Every forked process is still alive"""
+        return bool(self._processes) and self.live_processes == self.num_workers
+
+    def fork(self):
+        """
+        Fork the inference processes
+
+        Must be called before the event loop and any helper threads start:
+        only the forking thread survives in the children.
+        """
+        global _target
+        if self._processes:
+            return
+
+        _target = self.target
+        context = multiprocessing.get_context("fork")
+        for i in range(self.num_workers):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_child_main, args=(child_conn, self.threads_per_worker),
+                name=f"inference-{i}", daemon=True
+            )
+            process.start()
+            child_conn.close()
+            self._processes.append(process)
+            self._connections.append(parent_conn)
+
+        self._executor = ThreadPoolExecutor(max_workers=self.num_workers, thread_name_prefix="prefork-recv")
+        logger.info(f"Forked {self.num_workers} inference processes "
+                    f"({self.threads_per_worker} torch threads each)")
+
+    def start(self):
+        """Processes are started by fork(); kept for InferenceWorker compatibility"""
+        if not self._processes:
+            raise RuntimeError("PreforkWorkerPool.fork() must run before serving")
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        """Ask every process to exit and wait for it"""
+        for conn in self._connections:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._processes.clear()
+        self._connections.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _method_name(self, fn: Callable) -> str:
+        if getattr(fn, "__self__", None) is not self.target:
+            raise ValueError("Prefork workers only run methods of the preloaded target")
+        return fn.__name__
+
+    def _idle_queue(self) -> asyncio.Queue:
+        # Created on first use so it belongs to the serving event loop
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for index in range(len(self._connections)):
+                self._idle.put_nowait(index)
+        return self._idle
+
+    def _retire(self, index: int):
+        """Drop a dead process from the pool; with none left, fail every waiting call"""
+        self._dead.add(index)
+        exitcode = self._processes[index].exitcode
+        logger.error(f"Inference process {index} died (exit code {exitcode}); "
+                     f"{self.live_processes}/{self.num_workers} left")
+        if not self.live_processes:
+            # Wakes the calls waiting for an idle process; each passes it on
+            self._idle_queue().put_nowait(None)
+
+    def _release(self, index: int):
+        """Return a process to the idle queue, or retire it if it died"""
+        if self._processes[index].is_alive():
+            self._idle_queue().put_nowait(index)
+        else:
+            self._retire(index)
+
+    async def _acquire(self) -> int:
+        """Wait for an idle live process"""
+        idle = self._idle_queue()
+        while True:
+            if not self.live_processes:
+                raise RuntimeError("No inference process left: every forked worker has died")
+            index = await idle.get()
+            if index is None:
+                idle.put_nowait(None)
+                continue
+            if self._processes[index].is_alive():
+                return index
+            self._retire(index)
+
+    async def _dispatch(self, kind: str, method: str, args: Tuple, kwargs: Dict,
+                        on_item: Optional[Callable[[Any], None]] = None) -> Any:
+        """Run one call on an idle process and collect its reply"""
+        loop = asyncio.get_running_loop()
+        index = await self._acquire()
+        conn = self._connections[index]
+        started = time.perf_counter()
+        reply = None
+        release = True
+        try:
+            conn.send((kind, method, args, kwargs))
+            while True:
+                reply = loop.run_in_executor(self._executor, conn.recv)
+                # Shielded so a cancelled request leaves the reply for _drain
+                status, payload = await asyncio.shield(reply)
+                if status == "item":
+                    on_item(payload)
+                    continue
+                if status == "error":
+                    self.jobs_failed += 1
+                    raise RuntimeError(f"Inference process {index} failed: {payload}")
+                self.jobs_run += 1
+                return payload
+        except asyncio.CancelledError:
+            # The process is still working; take it back once its reply is read
+            release = False
+            asyncio.ensure_future(self._drain(index, reply))
+            raise
+        except (EOFError, BrokenPipeError, OSError) as e:
+            self.jobs_failed += 1
+            logger.error(f"Inference process {index} failed: {e}")
+            # A closed pipe means the process is exiting; let it be reaped
+            await loop.run_in_executor(None, self._processes[index].join, 1.0)
+            raise RuntimeError(f"Inference process {index} died")
+        finally:
+            self.busy_seconds += time.perf_counter() - started
+            if release:
+                self._release(index)
+
+    async def _drain(self, index: int, reply: Optional[asyncio.Future]):
+        """Discard the rest of an abandoned call, then mark the process idle"""
+        loop = asyncio.get_running_loop()
+        try:
+            status = (await reply)[0] if reply is not None else "item"
+            while status == "item":
+                status, _ = await loop.run_in_executor(self._executor, self._connections[index].recv)
+        except (EOFError, OSError) as e:
+            logger.error(f"Inference process {index} failed: {e}")
+            await loop.run_in_executor(None, self._processes[index].join, 1.0)
+        self._release(index)
+
+    def submit(self, fn: Callable, *args, **kwargs) -> asyncio.Future:
+        """
+        Queue a call of a target method on the next idle process
+
+        Returns:
+            Future resolving to the call's return value
+        """
+        self.start()
+        return asyncio.ensure_future(self._dispatch("call", self._method_name(fn), args, kwargs))
+
+    async def stream(self, fn: Callable, *args, finished: Optional[asyncio.Future] = None,
+                     **kwargs) -> AsyncIterator[Any]:
+        """
+        Run a callback-style target method on the next idle process
+
+        fn receives an ``emit`` keyword argument in the child; every value
+        passed to it is yielded here as it arrives. finished is resolved as
+        soon as the child's call returns or fails, before a slow consumer
+        has read every value.
+        """
+        self.start()
+        method = self._method_name(fn)
+        items: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        async def run():
+            try:
+                await self._dispatch("stream", method, args, kwargs, on_item=items.put_nowait)
+                items.put_nowait(done)
+            except Exception as e:
+                items.put_nowait(e)
+            finally:
+                if finished is not None and not finished.done():
+                    finished.set_result(None)
+
+        task = asyncio.ensure_future(run())
+        try:
+            while True:
+                item = await items.get()
+                if item is done:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            await task
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get pool statistics"""
+        return {
+            "running": self.running,
+            "processes": len(self._processes),
+            "healthy": self.healthy,
+            "threads_per_worker": self.threads_per_worker,
+            "live_processes": self.live_processes,
+            "idle": self._idle.qsize() if self._idle is not None else len(self._connections),
+            "jobs_run": self.jobs_run,
+            "jobs_failed": self.jobs_failed,
+            "busy_seconds": self.busy_seconds,
+        }
+
+
+def preload_and_fork(loader: Callable[[], Any], num_workers: int,
+                     threads_per_worker: Optional[int] = None) -> Tuple[Any, PreforkWorkerPool]:
+    """
+    Load the model once in this process and fork inference processes
+
+    The parent loads single-threaded so no OpenMP thread team exists at fork
+    time; the weights are then moved to shared memory, so every child maps
+    the same pages instead of copying ~4 GB each.
+
+    Args:
+        loader: Builds the object to share (e.g. a CPU VoiceCloner)
+        num_workers: Number of inference processes
+        threads_per_worker: torch intra-op threads per process
+
+    Returns:
+        (loaded target, started pool)
+    """
+    import torch
+
+    torch.set_num_threads(1)
+    target = loader()
+    model = getattr(target, "model", None)
+    if model is not None:
+        if any(parameter.is_cuda for parameter in model.parameters()):
+            raise ValueError("Prefork serving requires a CPU model: CUDA contexts do not survive fork")
+        model.share_memory()
+
+    pool = PreforkWorkerPool(target, num_workers, threads_per_worker)
+    pool.fork()
+    return target, pool
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Inference scheduler for the Voice Cloning API
+Batches text chunks from all in-flight requests into shared decode batches,
+most urgent first: by priority class, then shortest predicted chunk
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from voice_cloning_metrics import STAGE_LATENCY
+from voice_cloning_tracing import Span, Trace, get_tracer
+from voice_cloning_worker import InferenceWorker, get_inference_worker
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, most urgent first
+INTERACTIVE = "interactive"
+STANDARD = "standard"
+BULK = "bulk"
+PRIORITY_CLASSES = (INTERACTIVE, STANDARD, BULK)
+
+# Behind an interactive chunk only chunks up to this much longer share its batch
+INTERACTIVE_COST_SPREAD = 1.5
+
+
+@dataclass
+class ChunkJob:
+    """One text chunk waiting for a decode batch"""
+    conversation: list
+    temperature: float
+    sequence_length: int
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+    # Request trace and span the chunk was queued from
+    trace: Optional[Trace] = None
+    parent: Optional[Span] = None
+    priority: str = STANDARD
+    # Predicted audio frames to generate: what the chunk costs on the model
+    cost: float = 0.0
+    # Set for frame-streamed chunks, which run alone and keep their worker
+    # slot until their generation is done
+    frames_per_chunk: Optional[int] = None
+
+    @property
+    def group_key(self) -> float:
+        """Jobs can share a batch when their generation parameters match"""
+        return round(self.temperature, 4)
+
+    def sort_key(self, now: float, aging_s: float) -> Tuple[int, float, float]:
+        """
+        Dispatch order: priority class, then shortest predicted job first
+
+        Every aging_s seconds of waiting moves a job up one class, eventually
+        past every freshly queued job, so bulk work is never starved.
+        """
+        rank = PRIORITY_CLASSES.index(self.priority) - (now - self.enqueued_at) / aging_s
+        return math.floor(rank), self.cost, self.enqueued_at
+
+
+class SchedulerMetrics:
+    """Batch occupancy and queue-wait statistics"""
+
+    def __init__(self, history_size: int = 1000):
+        self.batches = 0
+        self.sequences = 0
+        self.occupancy_sum = 0.0
+        self.queue_waits: Deque[float] = deque(maxlen=history_size)
+        self.class_waits: Dict[str, Deque[float]] = {
+            priority: deque(maxlen=history_size) for priority in PRIORITY_CLASSES
+        }
+        self.batch_sizes: Deque[int] = deque(maxlen=history_size)
+
+    def record_batch(self, jobs: List[ChunkJob], max_batch_size: int, started_at: float):
+        """Record one decode batch"""
+        self.batches += 1
+        self.sequences += len(jobs)
+        self.occupancy_sum += len(jobs) / max(max_batch_size, 1)
+        self.batch_sizes.append(len(jobs))
+        for job in jobs:
+            self.queue_waits.append(started_at - job.enqueued_at)
+            self.class_waits[job.priority].append(started_at - job.enqueued_at)
+            STAGE_LATENCY.observe(started_at - job.enqueued_at, stage="queue_wait")
+
+    def get_stats(self, queue_depth: int) -> Dict[str, float]:
+        """Get a snapshot of the scheduler statistics"""
+        waits_ms = np.array(self.queue_waits) * 1000 if self.queue_waits else np.zeros(1)
+        return {
+            "queue_depth": queue_depth,
+            "batches_run": self.batches,
+            "sequences_run": self.sequences,
+            "avg_batch_size": float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.0,
+            "avg_batch_occupancy": self.occupancy_sum / self.batches if self.batches else 0.0,
+            "queue_wait_ms": {
+                "avg": float(np.mean(waits_ms)),
+                "p50": float(np.percentile(waits_ms, 50)),
+                "p95": float(np.percentile(waits_ms, 95)),
+                "max": float(np.max(waits_ms)),
+            },
+            "queue_wait_ms_by_class": {
+                priority: {
+                    "count": len(waits),
+                    "p50": float(np.percentile(np.array(waits) * 1000, 50)),
+                    "p95": float(np.percentile(np.array(waits) * 1000, 95)),
+                }
+                for priority, waits in self.class_waits.items() if waits
+            },
+        }
+
+
+class InferenceScheduler:
+    """
+    Collects pending chunks from concurrent requests and decodes them together
+
+    After the first job arrives the scheduler waits a short batching window,
+    then runs the most urgent pending chunk and compatible followers (up to
+    the memory-derived batch size) through one batched generate call.
+    Chunks are ordered by priority class (interactive, standard, bulk) with
+    aging, then by predicted audio frames, shortest first. Batch membership
+    is decided at generate-call boundaries: finished rows retire when their
+    sequence hits EOS and newly queued chunks join the next batch, so a long
+    request yields to more urgent work between its chunks.
+    """
+
+    def __init__(self, cloner_getter: Callable, batch_size_fn: Callable[[int], int],
+                 batch_window_ms: float = 10.0, worker: Optional[InferenceWorker] = None,
+                 aging_s: float = 5.0):
+        """
+        Args:
+            cloner_getter: Returns the loaded VoiceCloner
+            batch_size_fn: Maps the longest sequence length in a batch to the
+                maximum batch size that fits in memory
+            batch_window_ms: How long to wait for more chunks after the first
+            worker: Inference thread that runs the batches (global worker by default)
+            aging_s: Waiting time that promotes a chunk by one priority class
+        """
+        self.cloner_getter = cloner_getter
+        self.batch_size_fn = batch_size_fn
+        self.batch_window = batch_window_ms / 1000.0
+        self.aging_s = aging_s
+        self.pending: List[ChunkJob] = []
+        self.metrics = SchedulerMetrics()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._batches: set = set()
+        # The worker runs batches off the event loop: one at a time on the
+        # inference thread, or one per process with a prefork pool
+        self.worker = worker or get_inference_worker()
+
+    async def start(self):
+        """Start the batching loop on the running event loop"""
+        if self._task is None:
+            self.worker.start()
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Inference scheduler started (batch window {self.batch_window * 1000:.0f} ms)")
+
+    async def stop(self):
+        """Stop the batching loop and fail anything still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._batches):
+            task.cancel()
+        for job in self.pending:
+            if not job.future.done():
+                job.future.set_exception(RuntimeError("Inference scheduler stopped"))
+        self.pending.clear()
+
+    def _enqueue(self, conversation: list, temperature: float, sequence_length: int,
+                 priority: str, cost: float, frames_per_chunk: Optional[int] = None) -> ChunkJob:
+        if self._task is None:
+            raise RuntimeError("Inference scheduler is not running")
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority '{priority}', expected one of {PRIORITY_CLASSES}")
+
+        tracer = get_tracer()
+        job = ChunkJob(
+            conversation=conversation,
+            temperature=temperature,
+            sequence_length=sequence_length,
+            future=asyncio.get_running_loop().create_future(),
+            trace=tracer.current_trace(),
+            parent=tracer.current_span(),
+            priority=priority,
+            cost=cost,
+            frames_per_chunk=frames_per_chunk,
+        )
+        self.pending.append(job)
+        return job
+
+    def submit(self, conversations: List[list], temperature: float, sequence_lengths: List[int],
+               priority: str = STANDARD, costs: Optional[List[float]] = None) -> List[asyncio.Future]:
+        """
+        Queue conversations for generation
+
+        Args:
+            conversations: Conversations in CSM format, one per chunk
+            temperature: Generation temperature
+            sequence_lengths: Estimated positions per conversation
+            priority: Priority class of the request (interactive, standard or bulk)
+            costs: Predicted audio frames per conversation (sequence lengths by default)
+
+        Returns:
+            One future per conversation resolving to its 24kHz audio
+        """
+        costs = costs if costs is not None else sequence_lengths
+        futures = [
+            self._enqueue(conversation, temperature, sequence_length, priority, cost).future
+            for conversation, sequence_length, cost in zip(conversations, sequence_lengths, costs)
+        ]
+        self._wakeup.set()
+        return futures
+
+    async def generate(self, conversations: List[list], temperature: float, sequence_lengths: List[int],
+                       priority: str = STANDARD, costs: Optional[List[float]] = None) -> List[np.ndarray]:
+        """Queue conversations and wait for all of their audio"""
+        return list(await asyncio.gather(
+            *self.submit(conversations, temperature, sequence_lengths, priority, costs)
+        ))
+
+    async def stream(self, conversation: list, temperature: float, sequence_length: int,
+                     frames_per_chunk: int, priority: str = INTERACTIVE,
+                     cost: Optional[float] = None) -> AsyncIterator[np.ndarray]:
+        """
+        Queue a conversation for streamed generation and yield its audio pieces
+
+        The chunk waits for its turn like any other, then runs alone on a
+        worker slot (streamed generation isn't batched). The slot is freed
+        as soon as the worker has generated the chunk, so a client reading
+        at playback speed doesn't hold up other work.
+        """
+        job = self._enqueue(conversation, temperature, sequence_length, priority,
+                            cost if cost is not None else sequence_length, frames_per_chunk)
+        self._wakeup.set()
+        try:
+            done = await job.future
+        except asyncio.CancelledError:
+            # Cancelled right as the slot was granted: hand it back
+            if job.future.done() and not job.future.cancelled():
+                job.future.result().set_result(None)
+            raise
+        try:
+            async for audio in self.worker.stream(self.cloner_getter().stream_conversation, conversation,
+                                                  finished=done, temperature=temperature,
+                                                  frames_per_chunk=frames_per_chunk):
+                yield audio
+        finally:
+            # The worker resolves done when generation ends; this covers a
+            # consumer that stops before then
+            if not done.done():
+                done.set_result(None)
+
+    def _take_batch(self) -> Tuple[List[ChunkJob], int]:
+        """
+        Pick the next batch: the most urgent job plus compatible followers
+
+        Followers are taken in dispatch order while the memory-derived batch
+        size for the rows taken so far allows another; a follower too long
+        for that is left for a later batch. A batch runs until its longest
+        row is done, so behind an interactive chunk only chunks of similar
+        predicted length join. Frame-streamed chunks run alone.
+        """
+        self.pending = [job for job in self.pending if not job.future.cancelled()]
+        if not self.pending:
+            return [], 0
+
+        now = time.perf_counter()
+        self.pending.sort(key=lambda job: job.sort_key(now, self.aging_s))
+        head = self.pending[0]
+        if head.frames_per_chunk is not None:
+            self.pending.pop(0)
+            return [head], 1
+
+        candidates = [job for job in self.pending
+                      if job.frames_per_chunk is None and job.group_key == head.group_key]
+        if head.priority == INTERACTIVE:
+            candidates = [job for job in candidates if job.cost <= head.cost * INTERACTIVE_COST_SPREAD]
+        # Only the rows taken bound the batch size: a long chunk left queued
+        # doesn't shrink the batch of shorter ones ahead of it
+        batch = [head]
+        longest = head.sequence_length
+        max_batch_size = max(1, self.batch_size_fn(longest))
+        for job in candidates[1:]:
+            if len(batch) >= max_batch_size:
+                break
+            size = max(1, self.batch_size_fn(max(longest, job.sequence_length)))
+            if len(batch) < size:
+                batch.append(job)
+                longest = max(longest, job.sequence_length)
+                max_batch_size = size
+
+        taken = set(id(job) for job in batch)
+        self.pending = [job for job in self.pending if id(job) not in taken]
+        return batch, max_batch_size
+
+    async def _run(self):
+        """Batching loop"""
+        slots = asyncio.Semaphore(self.worker.capacity)
+        while True:
+            if not self.pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            # Give concurrent requests a chance to add their chunks
+            await asyncio.sleep(self.batch_window)
+
+            # Jobs keep accumulating while every worker slot is busy
+            await slots.acquire()
+            batch, max_batch_size = self._take_batch()
+            if not batch:
+                slots.release()
+                continue
+
+            started_at = time.perf_counter()
+            self.metrics.record_batch(batch, max_batch_size, started_at)
+
+            if batch[0].frames_per_chunk is not None:
+                task = asyncio.create_task(self._grant_stream(batch[0], started_at))
+            else:
+                task = asyncio.create_task(self._run_batch(batch, started_at))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _grant_stream(self, job: ChunkJob, started_at: float):
+        """Hand a frame-streamed chunk its worker slot and hold it until its generation ends"""
+        if job.trace is not None:
+            get_tracer().record(job.trace, "queue_wait", job.enqueued_at, started_at, job.parent, lane="scheduler")
+        if job.future.cancelled():
+            return
+        done = asyncio.get_running_loop().create_future()
+        job.future.set_result(done)
+        await done
+
+    async def _run_batch(self, batch: List[ChunkJob], started_at: float):
+        """Decode one batch on the worker and resolve its jobs"""
+        cloner = self.cloner_getter()
+        try:
+            audio, timings = await self.worker.submit(
+                cloner.generate_conversations_timed,
+                [job.conversation for job in batch],
+                batch[0].temperature,
+            )
+        except asyncio.CancelledError:
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(RuntimeError("Inference scheduler stopped"))
+            raise
+        except Exception as e:
+            logger.error(f"Batch of {len(batch)} chunks failed: {e}")
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            return
+
+        finished_at = time.perf_counter()
+        logger.debug(f"Decoded batch of {len(batch)} chunks in {finished_at - started_at:.2f}s")
+        for stage, seconds in timings.items():
+            STAGE_LATENCY.observe(seconds, stage=stage)
+        self._trace_batch(batch, started_at, finished_at, timings)
+        for job, row in zip(batch, audio):
+            if not job.future.done():
+                job.future.set_result(row)
+
+    @staticmethod
+    def _trace_batch(batch: List[ChunkJob], started_at: float, finished_at: float,
+                     timings: Dict[str, float]):
+        """Record the queue wait and the shared batch in every member's trace"""
+        tracer = get_tracer()
+        for job in batch:
+            if job.trace is None:
+                continue
+            tracer.record(job.trace, "queue_wait", job.enqueued_at, started_at, job.parent, lane="scheduler")
+            span = tracer.record(job.trace, "batch", started_at, finished_at, job.parent,
+                                 lane="inference", batch_size=len(batch))
+            # The worker reports durations; its stages ran back to back before finished_at
+            stage_start = finished_at - sum(timings.values())
+            for stage, seconds in timings.items():
+                tracer.record(job.trace, stage, stage_start, stage_start + seconds, span, lane="inference")
+                stage_start += seconds
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get scheduler statistics"""
+        return self.metrics.get_stats(len(self.pending))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Startup timeline for the Voice Cloning API
+Records how long each cold-start phase (imports, model weights, processor,
+voice profiles, warmup...) took and when it ran relative to process start,
+so phases that overlap and regressions in any one of them are visible
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _process_start_time() -> float:
+    """Wall-clock time the interpreter process was started"""
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).create_time()
+    except Exception:
+        return time.time()
+
+
+@dataclass
+class StartupPhase:
+    """One timed step of the startup"""
+    name: str
+    start_s: float  # Seconds after process start
+    duration_s: Optional[float] = None
+    thread: str = ""
+    parent: Optional[str] = None
+
+
+class StartupTimeline:
+    """
+    Thread-safe record of startup phases
+
+    Phases may run concurrently (model weights on the inference thread,
+    voice profiles on the audio pool); each keeps its own start offset so
+    the overlap shows up in the timeline.
+    """
+
+    def __init__(self):
+        self.process_start = _process_start_time()
+        self._phases: List[StartupPhase] = []
+        self._lock = threading.Lock()
+        self.ready_s: Optional[float] = None
+
+    def _offset(self, timestamp: Optional[float] = None) -> float:
+        return (timestamp if timestamp is not None else time.time()) - self.process_start
+
+    def record(self, name: str, started: float, duration: float, parent: Optional[str] = None):
+        """Add a phase measured elsewhere (wall-clock start, seconds)"""
+        phase = StartupPhase(name, self._offset(started), duration,
+                             threading.current_thread().name, parent)
+        with self._lock:
+            self._phases.append(phase)
+
+    @contextmanager
+    def phase(self, name: str, parent: Optional[str] = None) -> Iterator[StartupPhase]:
+        """Time the enclosed block as one phase"""
+        started = time.time()
+        phase = StartupPhase(name, self._offset(started), None, threading.current_thread().name, parent)
+        with self._lock:
+            self._phases.append(phase)
+        try:
+            yield phase
+        finally:
+            phase.duration_s = time.time() - started
+            logger.info(f"Startup phase '{name}' took {phase.duration_s:.2f}s")
+
+    def mark_ready(self):
+        """Record the moment the service can take requests"""
+        self.ready_s = self._offset()
+        logger.info(f"Service ready {self.ready_s:.2f}s after process start")
+
+    def get_timeline(self) -> Dict[str, Any]:
+        """Phases in start order plus time to ready"""
+        with self._lock:
+            phases = sorted((asdict(p) for p in self._phases), key=lambda p: p["start_s"])
+        return {
+            "process_start": self.process_start,
+            "ready_s": self.ready_s,
+            "phases": phases,
+        }
+
+
+# Global startup timeline instance
+startup_timeline = StartupTimeline()
+
+
+def get_startup_timeline() -> StartupTimeline:
+    """Get the global startup timeline instance"""
+    return startup_timeline
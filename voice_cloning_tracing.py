@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Per-request span tracing for the Voice Cloning API
+Spans nest through contextvars, so concurrent requests and nested stages
+(silence removal inside post-processing) each keep their own parent. Times
+come from the monotonic perf_counter clock; memory sampling is opt-in.
+Finished request traces are kept in a small ring buffer and exported as
+Chrome trace / Perfetto JSON by the /debug/traces endpoints.
+"""
+
+import asyncio
+import contextvars
+import itertools
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_span_ids = itertools.count(1)
+
+
+def _lane() -> str:
+    """Track a span is drawn on: its thread, and its asyncio task on the event loop"""
+    lane = threading.current_thread().name
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return f"{lane}/{task.get_name()}" if task is not None else lane
+
+
+def _sample_resources() -> Dict[str, float]:
+    """Resident memory and allocated GPU memory in MB"""
+    import psutil
+
+    sample = {"rss_mb": psutil.Process().memory_info().rss / 1024**2}
+    try:
+        import torch
+        if torch.cuda.is_available():
+            sample["gpu_mb"] = torch.cuda.memory_allocated() / 1024**2
+    except ImportError:
+        pass
+    return sample
+
+
+@dataclass
+class Span:
+    """One timed operation inside a trace"""
+    name: str
+    span_id: int
+    parent_id: Optional[int]
+    start: float  # time.perf_counter()
+    end: Optional[float] = None
+    lane: str = ""
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.end is None else self.end - self.start
+
+
+@dataclass
+class Trace:
+    """Spans of one request"""
+    trace_id: str
+    name: str
+    wall_start: float  # time.time() when the trace started
+    start: float  # time.perf_counter() when the trace started
+    spans: List[Span] = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def root(self) -> Span:
+        return self.spans[0]
+
+    def add(self, span: Span):
+        with self.lock:
+            self.spans.append(span)
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("span", default=None)
+
+
+def _reset(var: contextvars.ContextVar, token: contextvars.Token, previous: Any):
+    try:
+        var.reset(token)
+    except ValueError:
+        # An async generator finalized from another context (client went away)
+        var.set(previous)
+
+
+class Tracer:
+    """
+    Records spans into the current request's trace
+
+    Spans opened outside a trace are not kept individually; like every
+    span they still feed the per-name summary (count, mean, max, last).
+    """
+
+    def __init__(self, max_traces: int = 100, sample_resources: bool = False):
+        """
+        Args:
+            max_traces: Finished traces kept for /debug/traces
+            sample_resources: Record memory at the start and end of every span
+        """
+        self.max_traces = max_traces
+        self.sample_resources = sample_resources
+        self._traces: "OrderedDict[str, Trace]" = OrderedDict()
+        self._summary: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_trace_id() -> str:
+        return uuid.uuid4().hex[:16]
+
+    @staticmethod
+    def current_trace() -> Optional[Trace]:
+        return _current_trace.get()
+
+    @staticmethod
+    def current_span() -> Optional[Span]:
+        return _current_span.get()
+
+    def _summarize(self, name: str, seconds: float):
+        with self._lock:
+            stats = self._summary.get(name)
+            if stats is None:
+                stats = self._summary[name] = {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            stats["count"] += 1
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            stats["last_seconds"] = seconds
+
+    @contextmanager
+    def trace(self, name: str, trace_id: Optional[str] = None, **attributes) -> Iterator[Trace]:
+        """Start a new trace whose root span covers the enclosed block"""
+        trace = Trace(trace_id or self.new_trace_id(), name, time.time(), time.perf_counter())
+        trace_token = _current_trace.set(trace)
+        try:
+            with self.span(name, **attributes):
+                yield trace
+        finally:
+            _reset(_current_trace, trace_token, None)
+            with self._lock:
+                self._traces[trace.trace_id] = trace
+                while len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        """Time the enclosed block as a child of the current span"""
+        trace = _current_trace.get()
+        parent = _current_span.get()
+        span = Span(name, next(_span_ids), parent.span_id if parent else None,
+                    time.perf_counter(), lane=_lane(), attributes=attributes)
+        if self.sample_resources:
+            span.attributes["start"] = _sample_resources()
+        if trace is not None:
+            trace.add(span)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.attributes["error"] = type(e).__name__
+            raise
+        finally:
+            span.end = time.perf_counter()
+            if self.sample_resources:
+                span.attributes["end"] = _sample_resources()
+            _reset(_current_span, token, parent)
+            self._summarize(name, span.end - span.start)
+
+    def record(self, trace: Optional[Trace], name: str, start: float, end: float,
+               parent: Optional[Span] = None, lane: Optional[str] = None, **attributes) -> Optional[Span]:
+        """
+        Add a span measured elsewhere (perf_counter start and end)
+
+        Used for work done on behalf of several requests at once, like a
+        scheduler batch, which is recorded into each request's trace.
+        """
+        self._summarize(name, end - start)
+        if trace is None:
+            return None
+        span = Span(name, next(_span_ids), parent.span_id if parent else None, start, end,
+                    lane or _lane(), attributes)
+        trace.add(span)
+        return span
+
+    def list_traces(self, limit: int = 20, min_ms: float = 0.0) -> List[Dict[str, Any]]:
+        """Most recent finished traces, newest first"""
+        with self._lock:
+            traces = list(self._traces.values())
+        listed = []
+        for trace in reversed(traces):
+            duration_ms = (trace.root.duration or 0.0) * 1000
+            if duration_ms < min_ms:
+                continue
+            listed.append({
+                "trace_id": trace.trace_id,
+                "name": trace.name,
+                "started": trace.wall_start,
+                "duration_ms": duration_ms,
+                "spans": len(trace.spans),
+                "attributes": trace.root.attributes,
+            })
+            if len(listed) >= limit:
+                break
+        return listed
+
+    def get_trace(self, trace_id: str) -> Optional[Trace]:
+        with self._lock:
+            return self._traces.get(trace_id)
+
+    @staticmethod
+    def to_chrome_trace(trace: Trace) -> Dict[str, Any]:
+        """
+        Chrome trace event JSON of a trace (chrome://tracing, ui.perfetto.dev)
+
+        Each thread / asyncio task gets its own track so concurrent spans of
+        the request don't overlap on one line.
+        """
+        pid = os.getpid()
+        with trace.lock:
+            spans = list(trace.spans)
+        lanes: Dict[str, int] = {}
+        events = []
+        for span in spans:
+            tid = lanes.setdefault(span.lane, len(lanes) + 1)
+            end = span.end if span.end is not None else time.perf_counter()
+            events.append({
+                "name": span.name,
+                "cat": trace.name,
+                "ph": "X",
+                "ts": (span.start - trace.start) * 1e6,
+                "dur": (end - span.start) * 1e6,
+                "pid": pid,
+                "tid": tid,
+                "args": {"span_id": span.span_id, "parent_id": span.parent_id, **span.attributes},
+            })
+        events += [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": lane}}
+            for lane, tid in lanes.items()
+        ]
+        events.append({"name": "process_name", "ph": "M", "pid": pid, "tid": 0,
+                       "args": {"name": f"{trace.name} {trace.trace_id}"}})
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"trace_id": trace.trace_id, "started": trace.wall_start},
+        }
+
+    def get_summary(self) -> Dict[str, Dict[str, float]]:
+        """Per span name: count, mean, max and last duration in seconds"""
+        with self._lock:
+            return {
+                name: {
+                    "count": stats["count"],
+                    "mean_seconds": stats["total_seconds"] / stats["count"],
+                    "max_seconds": stats["max_seconds"],
+                    "last_seconds": stats["last_seconds"],
+                }
+                for name, stats in self._summary.items()
+            }
+
+
+# Global tracer instance
+tracer = Tracer(
+    max_traces=int(os.environ.get("TRACE_BUFFER", "100")),
+    sample_resources=os.environ.get("TRACE_RESOURCES", "0").lower() in ("1", "true", "yes"),
+)
+
+
+def get_tracer() -> Tracer:
+    """Get the global tracer instance"""
+    return tracer
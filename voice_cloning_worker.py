@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Off-loop execution for the Voice Cloning API
+A dedicated inference thread that owns the model, plus a sized thread pool
+for CPU-bound audio work, so the asyncio event loop never blocks on either
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+_END = object()
+
+
+@dataclass
+class _WorkItem:
+    """One call queued for the inference thread"""
+    fn: Callable
+    loop: asyncio.AbstractEventLoop
+    future: Optional[asyncio.Future] = None
+    items: Optional[asyncio.Queue] = None
+    emit: bool = False
+    # Resolved once fn has returned or raised, however many items are unread
+    finished: Optional[asyncio.Future] = None
+
+
+def _set_result(future: asyncio.Future, result: Any):
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_exception(future: asyncio.Future, exc: BaseException):
+    if not future.done():
+        future.set_exception(exc)
+
+
+def _post(loop: asyncio.AbstractEventLoop, callback: Callable, *args):
+    """Hand a result back to the event loop thread"""
+    try:
+        loop.call_soon_threadsafe(callback, *args)
+    except RuntimeError:
+        # The event loop closed while the job was running
+        pass
+
+
+class InferenceWorker:
+    """
+    Single thread that owns the model and runs inference calls in order
+
+    Calls are queued from the event loop and their results come back as
+    asyncio futures (``submit``) or async iterators (``iterate``). Model
+    loading should go through the worker as well, so that one thread owns
+    the model and its CUDA context for the whole process lifetime.
+    """
+
+    def __init__(self, name: str = "inference-worker"):
+        self.name = name
+        self._jobs: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self.jobs_run = 0
+        self.jobs_failed = 0
+        self.busy_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def capacity(self) -> int:
+        """Number of calls that can run at the same time"""
+        return 1
+
+    @property
+    def healthy(self) -> bool:
+        """The inference thread is up"""
+        return self.running
+
+    def start(self):
+        """Start the worker thread (idempotent)"""
+        if not self.running:
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+            logger.info(f"Inference worker '{self.name}' started")
+
+    def stop(self, timeout: Optional[float] = None):
+        """Finish queued calls and stop the worker thread"""
+        if self.running:
+            self._jobs.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, fn: Callable, *args, **kwargs) -> asyncio.Future:
+        """
+        Queue a call on the inference thread
+
+        Args:
+            fn: Callable to run on the worker thread
+            *args, **kwargs: Arguments for fn
+
+        Returns:
+            Future resolving to the call's return value
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._jobs.put(_WorkItem(functools.partial(fn, *args, **kwargs), loop, future=future))
+        return future
+
+    async def iterate(self, fn: Callable, *args, **kwargs) -> AsyncIterator[Any]:
+        """
+        Run a generator function on the inference thread and stream its items
+
+        Args:
+            fn: Generator function to run on the worker thread
+            *args, **kwargs: Arguments for fn
+
+        Yields:
+            Items produced by the generator, as soon as they are produced
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue()
+        self._jobs.put(_WorkItem(functools.partial(fn, *args, **kwargs), loop, items=items))
+        while True:
+            item = await items.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    async def stream(self, fn: Callable, *args, finished: Optional[asyncio.Future] = None,
+                     **kwargs) -> AsyncIterator[Any]:
+        """
+        Run a callback-style function on the inference thread and stream what it emits
+
+        fn receives an ``emit`` keyword argument; every value passed to it is
+        yielded here as soon as the event loop picks it up. This suits APIs
+        that push results through a callback, such as generate() streamers.
+
+        Args:
+            fn: Callable accepting ``emit``
+            *args, **kwargs: Other arguments for fn
+            finished: Future resolved as soon as fn returns or raises, before
+                a slow consumer has read every value
+
+        Yields:
+            Values passed to emit
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue()
+        self._jobs.put(_WorkItem(functools.partial(fn, *args, **kwargs), loop, items=items, emit=True,
+                                 finished=finished))
+        while True:
+            item = await items.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get worker statistics"""
+        return {
+            "running": self.running,
+            "healthy": self.healthy,
+            "queue_depth": self._jobs.qsize(),
+            "jobs_run": self.jobs_run,
+            "jobs_failed": self.jobs_failed,
+            "busy_seconds": self.busy_seconds,
+        }
+
+    def _run(self):
+        """Worker thread loop"""
+        while True:
+            job = self._jobs.get()
+            if job is _STOP:
+                return
+            if job.future is not None and job.future.cancelled():
+                continue
+
+            started = time.perf_counter()
+            try:
+                if job.items is None:
+                    _post(job.loop, _set_result, job.future, job.fn())
+                elif job.emit:
+                    job.fn(emit=functools.partial(_post, job.loop, job.items.put_nowait))
+                    _post(job.loop, job.items.put_nowait, _END)
+                else:
+                    for item in job.fn():
+                        _post(job.loop, job.items.put_nowait, item)
+                    _post(job.loop, job.items.put_nowait, _END)
+                self.jobs_run += 1
+            except Exception as e:
+                self.jobs_failed += 1
+                logger.error(f"Inference job failed: {e}")
+                if job.items is None:
+                    _post(job.loop, _set_exception, job.future, e)
+                else:
+                    _post(job.loop, job.items.put_nowait, e)
+            finally:
+                self.busy_seconds += time.perf_counter() - started
+                if job.finished is not None:
+                    _post(job.loop, _set_result, job.finished, None)
+
+
+class AudioWorkerPool:
+    """
+    Thread pool for CPU-bound audio work (decoding, silence removal,
+    normalization, encoding), sized by OptimizationConfig.audio_preprocessing_threads
+    """
+
+    def __init__(self, max_workers: int = 2):
+        self.max_workers = max(1, max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="audio")
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn on the pool and await its result (in the caller's context, so trace spans nest)"""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._executor, functools.partial(context.run, fn, *args, **kwargs))
+
+    def shutdown(self):
+        """Stop accepting work and release the threads"""
+        self._executor.shutdown(wait=False)
+
+
+# Global inference worker instance
+inference_worker = InferenceWorker()
+
+
+def get_inference_worker() -> InferenceWorker:
+    """Get the global inference worker instance"""
+    return inference_worker
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+Load generator for the Voice Cloning API
+
+Drives /clone-voice, /clone-voice-stream and /clone (voice_api_complete.py)
+through VoiceCloneClient with either closed-loop traffic (N users sending
+back to back) or open-loop traffic (requests arrive at a fixed rate no
+matter how fast the server answers), using a mix of text lengths and
+voices. Reports latency histograms, streaming time to first audio and
+inter-chunk gaps, playback underruns, error rates and the audio seconds
+produced per wall-clock second: how many streams one pod really holds.
+
+Usage:
+    python voice_load_test.py --users 4 --duration 60
+    python voice_load_test.py --rate 0.5 --duration 120 --endpoints clone-voice-stream,clone-voice \\
+        --voices voices --text-mix short:0.5,medium:0.3,long:0.2 --output load.json
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import random
+import time
+import wave
+from collections import Counter, defaultdict
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import aiohttp
+
+from voice_cloning_client import VoiceCloneClient
+
+SAMPLE_RATE = 24000
+BYTES_PER_SAMPLE = 2  # Streams are 16-bit mono PCM
+WAV_HEADER_BYTES = 44
+ENDPOINTS = ("clone-voice", "clone-voice-stream", "clone")
+
+# Latency histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000)
+
+# Text length classes: upper bound in characters
+LENGTH_CLASSES = {"short": 80, "medium": 300, "long": float("inf")}
+
+DEFAULT_TEXTS = [
+    "Hola, ¿en qué puedo ayudarte?",
+    "Gracias por llamar, un momento por favor.",
+    "Perfecto, lo apunto ahora mismo.",
+    "Tu pedido ha salido esta mañana y llegará mañana antes de las dos de la tarde. "
+    "Te enviaremos un mensaje con el enlace de seguimiento.",
+    "Entiendo lo que me cuentas. Voy a revisar tu cuenta para ver qué ha pasado con el último cargo "
+    "y en cuanto lo tenga te explico las opciones que tenemos.",
+    "Bienvenido al servicio de atención al cliente. Para consultar el estado de un pedido, di pedido. "
+    "Para hablar de facturas o pagos, di facturación. Si tienes un problema técnico con tu conexión, "
+    "di soporte y te pasaremos con un técnico. Recuerda que también puedes gestionar todo esto desde "
+    "la aplicación, donde encontrarás tus facturas de los últimos doce meses, el historial de pedidos "
+    "y un chat disponible las veinticuatro horas del día.",
+    "La radio llegó a los hogares a principios del siglo pasado y en pocos años cambió la forma en que "
+    "la gente recibía las noticias, escuchaba música y seguía los acontecimientos deportivos. Las familias "
+    "se reunían alrededor del aparato por la noche, y los locutores se convirtieron en voces conocidas "
+    "en todo el país. Con la llegada de la televisión muchos pensaron que desaparecería, pero supo "
+    "adaptarse y hoy sigue acompañando a millones de personas en el coche y en el trabajo.",
+]
+
+
+def length_class(text: str) -> str:
+    for name, limit in LENGTH_CLASSES.items():
+        if len(text) <= limit:
+            return name
+    return "long"
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """Linear-interpolated percentile (no numpy on the client side)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def summarize_ms(values: Sequence[float]) -> Dict[str, Optional[float]]:
+    """Count and percentiles of durations given in seconds, in milliseconds"""
+    ms = [v * 1000 for v in values]
+    return {
+        "count": len(ms),
+        "p50_ms": percentile(ms, 50),
+        "p90_ms": percentile(ms, 90),
+        "p95_ms": percentile(ms, 95),
+        "p99_ms": percentile(ms, 99),
+        "max_ms": max(ms) if ms else None,
+    }
+
+
+def histogram(values: Sequence[float]) -> Dict[str, int]:
+    """Per-bucket counts of latencies (seconds) over LATENCY_BUCKETS_MS"""
+    counts = {f"<={bound}ms": 0 for bound in LATENCY_BUCKETS_MS}
+    counts[f">{LATENCY_BUCKETS_MS[-1]}ms"] = 0
+    for value in values:
+        ms = value * 1000
+        bucket = next((f"<={bound}ms" for bound in LATENCY_BUCKETS_MS if ms <= bound),
+                      f">{LATENCY_BUCKETS_MS[-1]}ms")
+        counts[bucket] += 1
+    return counts
+
+
+def wav_duration(data: bytes) -> float:
+    """Duration of a WAV file in memory (0 when it can't be parsed)"""
+    try:
+        with wave.open(io.BytesIO(data), "rb") as f:
+            return f.getnframes() / f.getframerate()
+    except (wave.Error, EOFError):
+        return 0.0
+
+
+@dataclass
+class RequestResult:
+    """Outcome and timings of one request"""
+    endpoint: str
+    length_class: str
+    text_chars: int
+    voice: Optional[str]
+    started_s: float  # Seconds after the test started
+    latency_s: float
+    ok: bool
+    error: Optional[str] = None
+    audio_seconds: float = 0.0
+    ttfb_s: Optional[float] = None  # Streams only: time to the first audio bytes
+    chunk_gaps_s: List[float] = field(default_factory=list)
+    underruns: int = 0  # Times a real-time player would have run out of audio
+
+
+@dataclass
+class Workload:
+    """What each request sends: endpoint, text and voice mix"""
+    endpoints: List[str]
+    texts: Dict[str, List[str]]  # Length class -> texts
+    text_weights: Dict[str, float]
+    voices: List[Optional[str]]
+    temperature: float = 0.7
+    stream_format: str = "pcm"
+    stream_frames: int = 2
+    max_tokens: int = 512
+    seed: int = 0
+
+    def __post_init__(self):
+        self.random = random.Random(self.seed)
+        self.text_weights = {k: w for k, w in self.text_weights.items() if self.texts.get(k) and w > 0}
+        if not self.text_weights:
+            raise ValueError("No texts for the requested length mix")
+
+    def next(self):
+        """(endpoint, length class, text, voice) of the next request"""
+        classes = list(self.text_weights)
+        cls = self.random.choices(classes, weights=[self.text_weights[c] for c in classes])[0]
+        return (self.random.choice(self.endpoints), cls,
+                self.random.choice(self.texts[cls]), self.random.choice(self.voices))
+
+
+class LoadTest:
+    """Sends the workload through VoiceCloneClient and collects RequestResults"""
+
+    def __init__(self, client: VoiceCloneClient, workload: Workload):
+        self.client = client
+        self.workload = workload
+        self.results: List[RequestResult] = []
+        self.dropped = 0  # Open loop: arrivals skipped because max_in_flight was reached
+        self.started = 0.0
+
+    async def _clone_voice(self, text: str, voice: Optional[str], result: RequestResult):
+        response = await self.client.clone_voice(
+            text, voice_name=voice, temperature=self.workload.temperature, chunk_size=None
+        )
+        if not response.get("success"):
+            raise RuntimeError(response.get("error") or response.get("detail") or "request failed")
+        result.audio_seconds = response.get("processing_info", {}).get("total_audio_duration", 0.0)
+
+    async def _clone(self, text: str, voice: Optional[str], result: RequestResult):
+        data = await self.client.clone(text, voice_id=voice, temperature=self.workload.temperature,
+                                       max_tokens=self.workload.max_tokens)
+        result.audio_seconds = wav_duration(data)
+
+    async def _stream(self, text: str, voice: Optional[str], result: RequestResult, started: float):
+        header = WAV_HEADER_BYTES if self.workload.stream_format == "wav" else 0
+        received = 0
+        first_audio = last_read = None
+        async with self.client.open_stream(
+            text, voice_name=voice, temperature=self.workload.temperature, chunk_size=None,
+            stream_format=self.workload.stream_format, stream_frames=self.workload.stream_frames
+        ) as response:
+            response.raise_for_status()
+            async for data in response.content.iter_any():
+                now = time.perf_counter()
+                audio_before = max(received - header, 0) / (SAMPLE_RATE * BYTES_PER_SAMPLE)
+                received += len(data)
+                if received <= header:
+                    continue
+                if first_audio is None:
+                    first_audio = now
+                    result.ttfb_s = now - started
+                else:
+                    result.chunk_gaps_s.append(now - last_read)
+                    # Playback started at first_audio; it stalls if the audio
+                    # received so far is shorter than the time played
+                    if audio_before < now - first_audio:
+                        result.underruns += 1
+                last_read = now
+        if first_audio is None:
+            raise RuntimeError("stream ended without audio")
+        result.audio_seconds = (received - header) / (SAMPLE_RATE * BYTES_PER_SAMPLE)
+
+    async def one_request(self):
+        """Send the workload's next request and record its result"""
+        endpoint, cls, text, voice = self.workload.next()
+        started = time.perf_counter()
+        result = RequestResult(endpoint, cls, len(text), voice, started - self.started, 0.0, False)
+        try:
+            if endpoint == "clone-voice":
+                await self._clone_voice(text, voice, result)
+            elif endpoint == "clone":
+                await self._clone(text, voice, result)
+            else:
+                await self._stream(text, voice, result, started)
+            result.ok = True
+        except aiohttp.ClientResponseError as e:
+            result.error = f"HTTP {e.status}"
+        except asyncio.TimeoutError:
+            result.error = "timeout"
+        except Exception as e:
+            result.error = type(e).__name__ if not str(e) else f"{type(e).__name__}: {str(e)[:80]}"
+        result.latency_s = time.perf_counter() - started
+        self.results.append(result)
+
+    async def closed_loop(self, users: int, duration: float, requests: Optional[int] = None):
+        """users concurrent clients, each sending its next request when the last one finishes"""
+        deadline = self.started + duration
+        issued = 0
+
+        async def user():
+            nonlocal issued
+            while time.perf_counter() < deadline and (requests is None or issued < requests):
+                issued += 1
+                await self.one_request()
+
+        await asyncio.gather(*(user() for _ in range(users)))
+
+    async def open_loop(self, rate: float, duration: float, arrival: str = "poisson",
+                        max_in_flight: int = 256, requests: Optional[int] = None):
+        """Requests arrive at rate per second independently of completions"""
+        deadline = self.started + duration
+        in_flight = set()
+        issued = 0
+        next_arrival = self.started
+        while next_arrival < deadline and (requests is None or issued < requests):
+            await asyncio.sleep(max(next_arrival - time.perf_counter(), 0))
+            if len(in_flight) >= max_in_flight:
+                self.dropped += 1
+            else:
+                task = asyncio.create_task(self.one_request())
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+                issued += 1
+            gap = self.workload.random.expovariate(rate) if arrival == "poisson" else 1 / rate
+            next_arrival += gap
+        if in_flight:
+            await asyncio.gather(*in_flight)
+
+    async def run(self, users: Optional[int] = None, rate: Optional[float] = None, **kwargs) -> float:
+        """Run closed loop (users) or open loop (rate); returns the wall time"""
+        self.started = time.perf_counter()
+        if rate:
+            await self.open_loop(rate, **kwargs)
+        else:
+            kwargs.pop("arrival", None)
+            kwargs.pop("max_in_flight", None)
+            await self.closed_loop(users or 1, **kwargs)
+        return time.perf_counter() - self.started
+
+    def report(self, wall: float) -> Dict[str, object]:
+        """Aggregate the collected results"""
+        ok = [r for r in self.results if r.ok]
+        streams = [r for r in ok if r.endpoint == "clone-voice-stream"]
+        audio_seconds = sum(r.audio_seconds for r in ok)
+
+        by_endpoint = defaultdict(list)
+        by_length = defaultdict(list)
+        for r in ok:
+            by_endpoint[r.endpoint].append(r.latency_s)
+            by_length[r.length_class].append(r.latency_s)
+
+        return {
+            "wall_seconds": wall,
+            "requests": len(self.results),
+            "succeeded": len(ok),
+            "errors": len(self.results) - len(ok),
+            "error_rate": (len(self.results) - len(ok)) / len(self.results) if self.results else 0.0,
+            "errors_by_kind": dict(Counter(r.error for r in self.results if not r.ok)),
+            "dropped_arrivals": self.dropped,
+            "requests_per_second": len(ok) / wall if wall > 0 else 0.0,
+            "audio_seconds": audio_seconds,
+            "audio_seconds_per_wall_second": audio_seconds / wall if wall > 0 else 0.0,
+            "latency": {
+                endpoint: {**summarize_ms(values), "histogram": histogram(values)}
+                for endpoint, values in by_endpoint.items()
+            },
+            "latency_by_length": {cls: summarize_ms(values) for cls, values in by_length.items()},
+            "streaming": {
+                "streams": len(streams),
+                "ttfb": summarize_ms([r.ttfb_s for r in streams if r.ttfb_s is not None]),
+                "chunk_gap": summarize_ms([gap for r in streams for gap in r.chunk_gaps_s]),
+                "streams_with_underrun": sum(1 for r in streams if r.underruns),
+            },
+        }
+
+
+def load_texts(path: Optional[str]) -> Dict[str, List[str]]:
+    """Texts grouped by length class; a file holds one text per paragraph"""
+    if path:
+        with open(path, encoding="utf-8") as f:
+            texts = [" ".join(p.split()) for p in f.read().split("\n\n") if p.strip()]
+    else:
+        texts = DEFAULT_TEXTS
+    grouped = defaultdict(list)
+    for text in texts:
+        grouped[length_class(text)].append(text)
+    return dict(grouped)
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """'short:0.5,medium:0.3,long:0.2' -> weights"""
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition(":")
+        if name not in LENGTH_CLASSES:
+            raise argparse.ArgumentTypeError(f"Unknown length class '{name}' (use {', '.join(LENGTH_CLASSES)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def print_report(report: Dict[str, object]):
+    def ms(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:.0f}"
+
+    print(f"\n📊 {report['requests']} requests in {report['wall_seconds']:.1f}s "
+          f"({report['requests_per_second']:.2f} ok/s), errors {report['errors']} "
+          f"({report['error_rate'] * 100:.1f}%), dropped arrivals {report['dropped_arrivals']}")
+    if report["errors_by_kind"]:
+        for kind, count in report["errors_by_kind"].items():
+            print(f"   ❌ {count} x {kind}")
+    print(f"🎧 {report['audio_seconds']:.1f}s of audio, "
+          f"{report['audio_seconds_per_wall_second']:.2f} audio s per wall s")
+
+    print(f"\n{'latency':<22} {'n':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    rows = list(report["latency"].items()) + [(f"  {k} text", v) for k, v in report["latency_by_length"].items()]
+    streaming = report["streaming"]
+    if streaming["streams"]:
+        rows += [("stream TTFB", streaming["ttfb"]), ("stream chunk gap", streaming["chunk_gap"])]
+    for name, stats in rows:
+        print(f"{name:<22} {stats['count']:>5} {ms(stats['p50_ms']):>8} {ms(stats['p95_ms']):>8} "
+              f"{ms(stats['p99_ms']):>8} {ms(stats['max_ms']):>8}")
+    if streaming["streams"]:
+        print(f"\n🔊 Streams with playback underruns: {streaming['streams_with_underrun']}/{streaming['streams']}")
+
+
+async def main_async(args) -> Dict[str, object]:
+    endpoints = [e.strip().lstrip("/") for e in args.endpoints.split(",")]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        raise SystemExit(f"Unknown endpoints: {', '.join(sorted(unknown))} (use {', '.join(ENDPOINTS)})")
+
+    workload = Workload(
+        endpoints=endpoints,
+        texts=load_texts(args.texts_file),
+        text_weights=args.text_mix,
+        voices=[v.strip() for v in args.voices.split(",")] if args.voices else [None],
+        temperature=args.temperature,
+        stream_format=args.stream_format,
+        stream_frames=args.stream_frames,
+        max_tokens=args.max_tokens,
+        seed=args.seed,
+    )
+
+    mode = f"open loop, {args.rate} req/s ({args.arrival})" if args.rate else f"closed loop, {args.users} users"
+    print(f"🚀 Load test against {args.url}: {mode}, {args.duration:.0f}s, endpoints {', '.join(endpoints)}")
+
+    async with VoiceCloneClient(args.url, timeout=args.timeout) as client:
+        test = LoadTest(client, workload)
+        wall = await test.run(users=args.users, rate=args.rate, duration=args.duration, requests=args.requests,
+                              arrival=args.arrival, max_in_flight=args.max_in_flight)
+
+    report = test.report(wall)
+    report["settings"] = {
+        "url": args.url, "mode": "open" if args.rate else "closed", "users": args.users, "rate": args.rate,
+        "arrival": args.arrival, "duration": args.duration, "endpoints": endpoints,
+        "text_mix": workload.text_weights, "voices": workload.voices, "stream_format": args.stream_format,
+    }
+    if args.output:
+        report["requests_detail"] = [asdict(r) for r in test.results]
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for the Voice Cloning API")
+    parser.add_argument("--url", default="http://localhost:7860", help="API base URL")
+    parser.add_argument("--endpoints", default="clone-voice-stream",
+                        help=f"Comma-separated mix of {', '.join(ENDPOINTS)} (picked uniformly)")
+    traffic = parser.add_mutually_exclusive_group()
+    traffic.add_argument("--users", type=int, default=1, help="Closed loop: concurrent users")
+    traffic.add_argument("--rate", type=float, default=None, help="Open loop: arrivals per second")
+    parser.add_argument("--arrival", choices=["poisson", "uniform"], default="poisson",
+                        help="Open loop inter-arrival distribution")
+    parser.add_argument("--max-in-flight", type=int, default=256,
+                        help="Open loop: arrivals beyond this many pending requests are dropped")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds to send requests for")
+    parser.add_argument("--requests", type=int, default=None, help="Stop after this many requests")
+    parser.add_argument("--text-mix", type=parse_mix, default=parse_mix("short:0.5,medium:0.3,long:0.2"),
+                        help="Length class weights, e.g. short:0.5,medium:0.3,long:0.2")
+    parser.add_argument("--texts-file", default=None, help="Texts to send, one per paragraph")
+    parser.add_argument("--voices", default=None,
+                        help="Comma-separated voice profiles (voice_name / voice_id) to pick from")
+    parser.add_argument("--temperature", type=float, default=0.7, help="Generation temperature")
+    parser.add_argument("--stream-format", choices=["pcm", "wav"], default="pcm", help="Streaming container")
+    parser.add_argument("--stream-frames", type=int, default=2, help="Mimi frames per streamed piece")
+    parser.add_argument("--max-tokens", type=int, default=512, help="max_tokens for /clone")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the workload mix")
+    parser.add_argument("--output", default=None, help="Write the report and per-request results to JSON")
+    args = parser.parse_args()
+
+    print_report(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
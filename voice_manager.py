@@ -7,13 +7,15 @@ Manages voice profiles with audio files and transcriptions
 import os
 import json
 import hashlib
+import threading
 from pathlib import Path
 from typing import Dict, List, Optional, NamedTuple
-import librosa
 import numpy as np
 from dataclasses import dataclass, asdict
 import logging
 
+from voice_cloning.codec_cache import load_reference_pcm
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -95,6 +97,7 @@ class VoiceManager:
                 final_audio_path = str(audio_path.absolute())
             
             # Analyze audio
+            import librosa
             audio_data, sr = librosa.load(final_audio_path, sr=None)
             duration = len(audio_data) / sr
             
@@ -129,6 +132,13 @@ class VoiceManager:
         """Get voice profile by name"""
         return self.profiles.get(name)
     
+    def get_reference_audio(self, name: str, target_sample_rate: int = 24000) -> Optional[np.ndarray]:
+        """Get the normalized reference PCM of a voice (decoded once, then shared)"""
+        profile = self.profiles.get(name)
+        if not profile or not Path(profile.audio_path).exists():
+            return None
+        return load_reference_pcm(profile.audio_path, target_sample_rate)
+    
     def list_voices(self) -> List[str]:
         """List all available voice names"""
         return list(self.profiles.keys())
@@ -214,11 +224,18 @@ class VoiceManager:
                 logger.info(f"  - {path}")
             return False
 
-# Global voice manager instance
-voice_manager = VoiceManager()
+# Global voice manager instance, built on first use (it creates the voices
+# directory and reads the profiles)
+voice_manager: Optional[VoiceManager] = None
+_voice_manager_lock = threading.Lock()
 
 def get_voice_manager() -> VoiceManager:
     """Get the global voice manager instance"""
+    global voice_manager
+    if voice_manager is None:
+        with _voice_manager_lock:
+            if voice_manager is None:
+                voice_manager = VoiceManager()
     return voice_manager
 
 def initialize_voices():